@@ -0,0 +1,214 @@
+"""Microbenchmarks of the Lobby state machine with no-op observers.
+
+python -m benchmarks.bench_lobby --output lobby.json
+python -m benchmarks.bench_lobby --baseline lobby.json
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import defaultdict
+
+from benchmarks.common import Results, argument_parser, finish
+from cardsagainst.deck import Deck, PunchlineCard, SetupCard
+from cardsagainst.lobby import (
+    Finished,
+    Gathering,
+    Judgement,
+    Lobby,
+    LobbyObserver,
+    Player,
+    State,
+    Turns,
+)
+from cardsagainst.settings import LobbySettings
+
+LOBBY_SIZES = (3, 10, 50, 200)
+
+
+def make_decks(
+    players_count: int, hand_size: int
+) -> tuple[Deck[SetupCard], Deck[PunchlineCard]]:
+    setups = Deck(
+        cards=[
+            SetupCard(id=i, text="Setup ____", case="nom", starts_with_punchline=False)
+            for i in range(500)
+        ]
+    )
+    punchlines = Deck(
+        cards=[
+            PunchlineCard(id=i, text=[("punchline", ["nom", "acc"])])
+            for i in range(max(2000, players_count * hand_size * 3))
+        ]
+    )
+    return setups, punchlines
+
+
+def make_lobby(players_count: int) -> tuple[Lobby, list[Player]]:
+    players = [
+        Player(name=f"player {i}", emoji="🍎", token=f"token-{i}")
+        for i in range(players_count)
+    ]
+    lobby = Lobby(owner=players[0], state=Gathering())
+    for player in players:
+        lobby.add_player(player)
+        player.connect(LobbyObserver())
+    return lobby, players
+
+
+def start_game(lobby: Lobby, settings: LobbySettings) -> None:
+    assert lobby.owner
+    setups, punchlines = make_decks(len(lobby.all_players), settings.hand_size)
+    lobby.owner.start_game(settings, setups, punchlines)
+
+
+async def wait_for(lobby: Lobby, *states: type[State]) -> None:
+    for _ in range(100):
+        if isinstance(lobby.state, states):
+            return
+        await asyncio.sleep(0)
+    raise RuntimeError(f"Lobby is stuck in {type(lobby.state).__name__}")
+
+
+class Timings:
+    def __init__(self) -> None:
+        self.seconds: dict[str, float] = defaultdict(float)
+        self.ops: dict[str, int] = defaultdict(int)
+
+    def add(self, name: str, started_at: float, ops: int = 1) -> None:
+        self.seconds[name] += time.perf_counter() - started_at
+        self.ops[name] += ops
+
+    def ops_per_sec(self, name: str) -> float:
+        return self.ops[name] / self.seconds[name]
+
+
+async def play_turn(lobby: Lobby, timings: Timings) -> None:
+    assert isinstance(lobby.state, Turns) and lobby.lead
+    players = list(lobby.players)
+    started_at = time.perf_counter()
+    for player in players:
+        player.make_turn(player.hand[0])
+    timings.add("make_turn", started_at, len(players))
+
+    assert isinstance(lobby.state, Judgement)
+    lead = lobby.lead
+    for card_on_table in lobby.table:
+        lead.open_table_card(card_on_table)
+
+    started_at = time.perf_counter()
+    lead.pick_turn_winner(lobby.table[0].card)
+    timings.add("pick_turn_winner", started_at)
+
+    await wait_for(lobby, Turns, Finished)
+
+
+async def bench_turns(players_count: int, duration: float, results: Results) -> None:
+    lobby, _ = make_lobby(players_count)
+    lobby.is_game_endless = True
+    start_game(lobby, LobbySettings(winning_score=1, start_turn_delay=0))
+
+    timings = Timings()
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        await play_turn(lobby, timings)
+
+    for name in ("make_turn", "pick_turn_winner"):
+        results.add(f"{name}[players={players_count}]", timings.ops_per_sec(name))
+
+
+async def bench_refresh_hand(
+    players_count: int, duration: float, results: Results
+) -> None:
+    lobby, players = make_lobby(players_count)
+    start_game(lobby, LobbySettings(winning_score=1))
+    player = players[-1]
+    player.score = 10**9
+
+    timings = Timings()
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        started_at = time.perf_counter()
+        for _ in range(100):
+            player.refresh_hand()
+        timings.add("refresh_hand", started_at, 100)
+
+    results.add(
+        f"refresh_hand[players={players_count}]",
+        timings.ops_per_sec("refresh_hand"),
+    )
+
+
+async def bench_reconnect(
+    players_count: int, duration: float, results: Results
+) -> None:
+    lobby, players = make_lobby(players_count)
+    start_game(lobby, LobbySettings(winning_score=1))
+    player = players[-1]
+    observer = LobbyObserver()
+
+    timings = Timings()
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        started_at = time.perf_counter()
+        for _ in range(100):
+            player.disconnect()
+            player.connect(observer)
+        timings.add("connect_disconnect", started_at, 100)
+
+    results.add(
+        f"connect_disconnect[players={players_count}]",
+        timings.ops_per_sec("connect_disconnect"),
+    )
+
+
+async def bench_games(players_count: int, duration: float, results: Results) -> None:
+    settings = LobbySettings(winning_score=3, start_turn_delay=0, finish_delay=0)
+    timings = Timings()
+    games = turns = 0
+
+    started_at = time.perf_counter()
+    deadline = started_at + duration
+    while time.perf_counter() < deadline:
+        lobby, _ = make_lobby(players_count)
+        start_game(lobby, settings)
+        while not isinstance(lobby.state, Finished):
+            await play_turn(lobby, timings)
+            turns += 1
+        games += 1
+    elapsed = time.perf_counter() - started_at
+
+    results.add(f"games[players={players_count}]", games / elapsed)
+    results.add(f"game_turns[players={players_count}]", turns / elapsed)
+
+
+async def run(sizes: tuple[int, ...], duration: float) -> Results:
+    results = Results("lobby", extra={"duration": duration})
+    for players_count in sizes:
+        await bench_turns(players_count, duration, results)
+        await bench_refresh_hand(players_count, duration, results)
+        await bench_reconnect(players_count, duration, results)
+        await bench_games(players_count, duration, results)
+    return results
+
+
+def main() -> None:
+    parser = argument_parser(__doc__ or "")
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=LOBBY_SIZES,
+        help="Lobby sizes in players",
+    )
+    parser.add_argument(
+        "--duration", type=float, default=1.0, help="Seconds per benchmark"
+    )
+    args = parser.parse_args()
+    results = asyncio.run(run(tuple(args.sizes), args.duration))
+    finish(results, args)
+
+
+if __name__ == "__main__":
+    main()
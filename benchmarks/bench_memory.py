@@ -0,0 +1,217 @@
+"""Memory taken by lobbies in every state, measured with tracemalloc.
+
+Each lobby deals its decks from one shared catalog, built before measuring
+like the one a worker loads on startup, and gets a RemotePlayer per player
+with one welcome snapshot queued, and players removed into the grave. Results are players
+and lobbies per GiB, so the usual --baseline check catches growth, and
+--max-player-bytes/--max-lobby-bytes fail the run over a fixed budget.
+
+    python -m benchmarks.bench_memory --lobbies 200 --players 8
+"""
+
+from __future__ import annotations
+
+import asyncio
+import gc
+import sys
+import tracemalloc
+import types
+from collections import Counter
+from collections.abc import Iterable
+
+from benchmarks.common import Results, argument_parser, finish
+from cardsagainst.lobby import (
+    Finished,
+    Gathering,
+    Judgement,
+    Lobby,
+    Player,
+    State,
+    Turns,
+)
+from cardsagainst.settings import LobbySettings
+from cardsagainst_backend.accounting import LobbyStats
+from cardsagainst_backend.catalog import Catalog
+from cardsagainst_backend.integration import RemotePlayer
+from cardsagainst_backend.memory_dao import MemoryCardsDAO
+
+GIB = 1024**3
+STATES: tuple[type[State], ...] = (Gathering, Turns, Judgement, Finished)
+# Shared by everything, not owned by any lobby
+NOT_OWNED = (type, types.ModuleType, types.FunctionType, asyncio.AbstractEventLoop)
+
+
+async def build_lobby(
+    catalog: Catalog,
+    state: type[State],
+    players_count: int,
+    grave_count: int,
+    hand_size: int,
+) -> tuple[Lobby, list[RemotePlayer]]:
+    players = [
+        Player(name=f"player {i}", emoji="🍎", token=f"token-{i}")
+        for i in range(players_count + grave_count)
+    ]
+    lobby = Lobby(owner=players[0], state=Gathering())
+    stats = LobbyStats()
+    lobby.monitor = stats
+    remote_players = []
+    for player in players:
+        lobby.add_player(player)
+        remote_player = RemotePlayer(
+            websocket=None,  # type: ignore[arg-type]
+            lobby=lobby,
+            lobby_token="lobby",
+            player=player,
+            stats=stats,
+        )
+        player.connect(remote_player)
+        remote_players.append(remote_player)
+
+    for player in players[players_count:]:
+        player.disconnect()
+        lobby.remove_player(player)
+    remote_players = remote_players[:players_count]
+
+    if state is not Gathering:
+        setups, punchlines = catalog.deal()
+        settings = LobbySettings(winning_score=1, finish_delay=0, hand_size=hand_size)
+        players[0].start_game(settings, setups, punchlines)
+    if state in (Judgement, Finished):
+        for player in lobby.players:
+            player.make_turn(player.hand[0])
+    if state is Finished:
+        assert lobby.lead
+        for card_on_table in lobby.table:
+            lobby.lead.open_table_card(card_on_table)
+        lobby.lead.pick_turn_winner(lobby.table[0].card)
+        while not isinstance(lobby.state, Finished):
+            await asyncio.sleep(0)
+    assert isinstance(lobby.state, state)
+
+    # A connection normally has little in flight, keep one snapshot each
+    for remote_player in remote_players:
+        remote_player.drop_queue()
+        remote_player.welcome()
+    return lobby, remote_players
+
+
+async def settle() -> None:
+    """Let cancelled timers finish, so lobbies they hold are freed."""
+    for _ in range(3):
+        await asyncio.sleep(0)
+    gc.collect()
+
+
+def sizes_by_type(roots: Iterable[object]) -> Counter[str]:
+    """Shallow sizes of everything reachable from roots, by type."""
+    seen: set[int] = set()
+    sizes: Counter[str] = Counter()
+    stack = list(roots)
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, NOT_OWNED):
+            continue
+        seen.add(id(obj))
+        sizes[type(obj).__name__] += sys.getsizeof(obj)
+        stack.extend(gc.get_referents(obj))
+    return sizes
+
+
+async def measure_state(
+    catalog: Catalog,
+    state: type[State],
+    lobbies_count: int,
+    players_count: int,
+    grave_count: int,
+    hand_size: int,
+) -> tuple[int, Counter[str], list[tuple[str, int]]]:
+    await settle()
+    before = tracemalloc.take_snapshot()
+    built = [
+        await build_lobby(catalog, state, players_count, grave_count, hand_size)
+        for _ in range(lobbies_count)
+    ]
+    await settle()
+    after = tracemalloc.take_snapshot()
+
+    stats = after.compare_to(before, "lineno")
+    total = sum(stat.size_diff for stat in stats)
+    sites = [
+        (f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}", stat.size_diff)
+        for stat in stats[:8]
+    ]
+    types_ = sizes_by_type(obj for lobby, remotes in built for obj in (lobby, *remotes))
+    for lobby, _ in built:
+        if isinstance(lobby.state, Turns):
+            lobby.state.timer.cancel()
+    return total, types_, sites
+
+
+async def run(args) -> tuple[Results, list[str]]:
+    results = Results(
+        "memory",
+        extra={
+            "lobbies": args.lobbies,
+            "players": args.players,
+            "grave": args.grave,
+            "bytes": {},
+        },
+    )
+    over_budget = []
+    catalog = await Catalog.load(
+        MemoryCardsDAO(500, max(2000, args.players * args.hand_size * 3))
+    )
+    tracemalloc.start()
+    for state in STATES:
+        total, types_, sites = await measure_state(
+            catalog, state, args.lobbies, args.players, args.grave, args.hand_size
+        )
+        name = state.__name__
+        lobby_bytes = total / args.lobbies
+        player_bytes = lobby_bytes / args.players
+        results.extra["bytes"][name] = {
+            "per_lobby": lobby_bytes,
+            "per_player": player_bytes,
+            "by_type": {
+                key: size / args.lobbies for key, size in types_.most_common(15)
+            },
+            "by_line": {site: size / args.lobbies for site, size in sites},
+        }
+        results.add(f"lobbies_per_gib[{name}]", GIB / lobby_bytes)
+        results.add(f"players_per_gib[{name}]", GIB / player_bytes)
+        print(
+            f"{name}: {lobby_bytes:,.0f} bytes per lobby,"
+            f" {player_bytes:,.0f} per player"
+        )
+        for key, size in types_.most_common(8):
+            print(f"    {key:<30} {size / args.lobbies:>12,.0f}")
+
+        if args.max_lobby_bytes and lobby_bytes > args.max_lobby_bytes:
+            over_budget.append(f"{name}: {lobby_bytes:,.0f} bytes per lobby")
+        if args.max_player_bytes and player_bytes > args.max_player_bytes:
+            over_budget.append(f"{name}: {player_bytes:,.0f} bytes per player")
+    tracemalloc.stop()
+    return results, over_budget
+
+
+def main() -> None:
+    parser = argument_parser(__doc__ or "")
+    parser.add_argument("--lobbies", type=int, default=100)
+    parser.add_argument("--players", type=int, default=8)
+    parser.add_argument("--grave", type=int, default=2, help="Removed players")
+    parser.add_argument("--hand-size", type=int, default=10)
+    # About 1.5 times what 8 player lobbies take, 0 disables a budget
+    parser.add_argument("--max-lobby-bytes", type=float, default=200_000)
+    parser.add_argument("--max-player-bytes", type=float, default=32_000)
+    args = parser.parse_args()
+
+    results, over_budget = asyncio.run(run(args))
+    if over_budget:
+        print("Over budget:", *over_budget, sep="\n  ", file=sys.stderr)
+        sys.exit(1)
+    finish(results, args)
+
+
+if __name__ == "__main__":
+    main()
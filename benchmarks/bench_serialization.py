@@ -0,0 +1,294 @@
+"""Time and size of outbound events and inbound command validation.
+
+Every event is encoded the way RemotePlayer does it, with pydantic models,
+and by alternative encoders from plain dicts, so wire format changes can be
+judged on numbers. Sizes are reported in bytes per event.
+
+    python -m benchmarks.bench_serialization --output serialization.json
+"""
+
+from __future__ import annotations
+
+import asyncio
+import importlib
+import json
+from collections.abc import Callable
+from types import ModuleType
+from typing import Any
+
+from benchmarks.bench_lobby import make_lobby, start_game
+from benchmarks.common import Results, argument_parser, finish, ops_per_sec
+from cardsagainst.deck import PunchlineCard, SetupCard
+from cardsagainst.lobby import Lobby, Player
+from cardsagainst.settings import LobbySettings
+from cardsagainst_backend.accounting import LobbyStats
+from cardsagainst_backend.integration import (
+    Event,
+    GameStartedData,
+    HandRefreshData,
+    MakeTurnData,
+    PunchlineData,
+    RemotePlayer,
+    SetupData,
+    TurnStartedData,
+)
+
+orjson: ModuleType | None
+try:
+    orjson = importlib.import_module("orjson")
+except ImportError:
+    orjson = None
+
+LOBBY_SIZES = (3, 10, 50)
+
+
+def punchline_dict(card: PunchlineCard) -> dict[str, Any]:
+    return {"id": card.id, "text": card.text}
+
+
+def setup_dict(setup: SetupCard) -> dict[str, Any]:
+    return {
+        "id": setup.id,
+        "text": setup.text,
+        "case": setup.case,
+        "startsWithPunchline": setup.starts_with_punchline,
+    }
+
+
+def lobby_state_dict(lobby: Lobby, player: Player) -> dict[str, Any]:
+    """Same JSON as `RemotePlayer._lobby_state`, without the models."""
+    selected_card = lobby.card_on_table_of(player)
+    return {
+        "state": type(lobby.state).__name__.lower(),
+        "players": [
+            {
+                "uuid": pl.uuid,
+                "name": pl.name,
+                "emoji": pl.emoji,
+                "state": "pending",
+                "score": pl.score,
+                "isConnected": pl.is_connected,
+            }
+            for pl in lobby.all_players
+        ],
+        "table": [
+            {
+                "card": punchline_dict(card_on_table.card)
+                if card_on_table.is_open
+                else None,
+                "isPicked": lobby.is_card_picked(card_on_table),
+                "author": card_on_table.player.name
+                if lobby.is_card_picked(card_on_table)
+                else None,
+            }
+            for card_on_table in lobby.table
+        ],
+        "hand": [punchline_dict(card) for card in player.hand],
+        "setup": setup_dict(setup) if (setup := lobby.setup) else None,
+        "timeout": lobby.game.settings.turn_duration if lobby.game else None,
+        "leadUuid": lobby.lead.uuid if lobby.lead else None,
+        "ownerUuid": lobby.owner.uuid if lobby.owner else None,
+        "selfUuid": player.uuid,
+        "turnCount": lobby.turn_count,
+        "selectedCard": punchline_dict(selected_card.card) if selected_card else None,
+    }
+
+
+def dict_encoders(build: Callable[[], dict[str, Any]]) -> dict[str, Callable[[], Any]]:
+    encoders: dict[str, Callable[[], Any]] = {
+        "dict+json": lambda: json.dumps(
+            build(), separators=(",", ":"), ensure_ascii=False
+        ),
+    }
+    if orjson:
+        encoders["dict+orjson"] = lambda: orjson.dumps(build())
+    return encoders
+
+
+def bench_encoders(
+    results: Results,
+    name: str,
+    encoders: dict[str, Callable[[], Any]],
+    duration: float,
+) -> None:
+    sizes = results.extra.setdefault("bytes", {})
+    for encoder, encode in encoders.items():
+        key = f"{name}[{encoder}]"
+        data = encode()
+        sizes[key] = len(data.encode() if isinstance(data, str) else data)
+        results.add(key, ops_per_sec(encode, duration))
+
+
+def playing_lobby(players_count: int) -> tuple[Lobby, Player]:
+    """Lobby in judgement with every card on the table open."""
+    lobby, players = make_lobby(players_count)
+    start_game(lobby, LobbySettings(winning_score=10))
+    for player in lobby.players:
+        player.make_turn(player.hand[0])
+    assert lobby.lead
+    for card_on_table in lobby.table:
+        lobby.lead.open_table_card(card_on_table)
+    return lobby, players[-1]
+
+
+def bench_lobby_state(players_count: int, duration: float, results: Results) -> None:
+    lobby, player = playing_lobby(players_count)
+    remote_player = RemotePlayer(
+        websocket=None,  # type: ignore[arg-type]
+        lobby=lobby,
+        lobby_token="lobby",
+        player=player,
+        stats=LobbyStats(),
+    )
+
+    def pydantic() -> str:
+        return Event(
+            id=1, type="welcome", data=remote_player._lobby_state()
+        ).model_dump_json(by_alias=True)
+
+    def build() -> dict[str, Any]:
+        return {"id": 1, "type": "welcome", "data": lobby_state_dict(lobby, player)}
+
+    assert json.loads(pydantic()) == json.loads(json.dumps(build()))
+    bench_encoders(
+        results,
+        f"welcome[players={players_count}]",
+        {"pydantic": pydantic, **dict_encoders(build)},
+        duration,
+    )
+
+
+def bench_events(duration: float, results: Results) -> None:
+    lobby, player = playing_lobby(3)
+    assert lobby.lead and lobby.setup
+    lead, setup, card = lobby.lead, lobby.setup, player.hand[0]
+    hand = player.hand
+
+    def turn_started() -> str:
+        return Event(
+            id=1,
+            type="turnStarted",
+            data=TurnStartedData(
+                setup=SetupData.from_setup(setup),
+                turn_duration=60,
+                lead_uuid=lead.uuid,
+                turn_count=1,
+                card=PunchlineData.from_card(card),
+            ),
+        ).model_dump_json(by_alias=True)
+
+    def turn_started_dict() -> dict[str, Any]:
+        return {
+            "id": 1,
+            "type": "turnStarted",
+            "data": {
+                "setup": setup_dict(setup),
+                "turnDuration": 60,
+                "leadUuid": lead.uuid,
+                "turnCount": 1,
+                "card": punchline_dict(card),
+            },
+        }
+
+    def game_started() -> str:
+        return Event(
+            id=1,
+            type="gameStarted",
+            data=GameStartedData(hand=[PunchlineData.from_card(c) for c in hand]),
+        ).model_dump_json(by_alias=True)
+
+    def game_started_dict() -> dict[str, Any]:
+        return {
+            "id": 1,
+            "type": "gameStarted",
+            "data": {"hand": [punchline_dict(c) for c in hand]},
+        }
+
+    def hand_refreshed() -> str:
+        return Event(
+            id=1,
+            type="handRefreshed",
+            data=HandRefreshData(hand=[PunchlineData.from_card(c) for c in hand]),
+        ).model_dump_json(by_alias=True)
+
+    def hand_refreshed_dict() -> dict[str, Any]:
+        return {
+            "id": 1,
+            "type": "handRefreshed",
+            "data": {"hand": [punchline_dict(c) for c in hand]},
+        }
+
+    for name, pydantic, build in (
+        ("turnStarted", turn_started, turn_started_dict),
+        ("gameStarted", game_started, game_started_dict),
+        ("handRefreshed", hand_refreshed, hand_refreshed_dict),
+    ):
+        assert json.loads(pydantic()) == json.loads(json.dumps(build()))
+        bench_encoders(
+            results, name, {"pydantic": pydantic, **dict_encoders(build)}, duration
+        )
+
+
+def bench_make_turn_validation(duration: float, results: Results) -> None:
+    message = '{"id":1,"type":"makeTurn","data":{"id":42}}'
+
+    def pydantic() -> int:
+        # RemotePlayer receives JSON already parsed by starlette
+        return Event[MakeTurnData].model_validate(json.loads(message)).data.id
+
+    def pydantic_json() -> int:
+        return Event[MakeTurnData].model_validate_json(message).data.id
+
+    def json_manual() -> int:
+        card_id = json.loads(message)["data"]["id"]
+        if not isinstance(card_id, int):
+            raise TypeError(card_id)
+        return card_id
+
+    decoders: dict[str, Callable[[], int]] = {
+        "json+pydantic": pydantic,
+        "pydantic_json": pydantic_json,
+        "json+manual": json_manual,
+    }
+    if orjson:
+
+        def orjson_manual() -> int:
+            card_id = orjson.loads(message)["data"]["id"]
+            if not isinstance(card_id, int):
+                raise TypeError(card_id)
+            return card_id
+
+        decoders["orjson+manual"] = orjson_manual
+
+    for decoder, decode in decoders.items():
+        assert decode() == 42
+        results.add(f"makeTurn_validate[{decoder}]", ops_per_sec(decode, duration))
+
+
+async def run(duration: float) -> Results:
+    # Lobbies start turn timers, so they need a running loop
+    results = Results("serialization", extra={"duration": duration})
+    for players_count in LOBBY_SIZES:
+        bench_lobby_state(players_count, duration, results)
+    bench_events(duration, results)
+    bench_make_turn_validation(duration, results)
+    return results
+
+
+def main() -> None:
+    parser = argument_parser(__doc__ or "")
+    parser.add_argument(
+        "--duration", type=float, default=0.5, help="Seconds per benchmark"
+    )
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.duration))
+
+    print("Bytes per event:")
+    for key, size in results.extra["bytes"].items():
+        print(f"{key:<50} {size:>16,}")
+    finish(results, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+
+@dataclass
+class Results:
+    """Named benchmark numbers where higher is better, e.g. ops/sec."""
+
+    name: str
+    values: dict[str, float] = field(default_factory=dict)
+    extra: dict[str, Any] = field(default_factory=dict)
+
+    def add(self, key: str, value: float) -> None:
+        self.values[key] = value
+        print(f"{key:<50} {value:>16,.1f}")
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            "benchmark": self.name,
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "values": self.values,
+            **self.extra,
+        }
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def ops_per_sec(func: Callable[[], object], duration: float) -> float:
+    """Calls `func` in batches until `duration` seconds have passed."""
+    ops, batch = 0, 1
+    started_at = time.perf_counter()
+    while (elapsed := time.perf_counter() - started_at) < duration:
+        for _ in range(batch):
+            func()
+        ops += batch
+        batch = min(batch * 2, 1024)
+    return ops / elapsed
+
+
+async def async_ops_per_sec(
+    func: Callable[[], Awaitable[object]], duration: float
+) -> float:
+    """Awaits `func` one call at a time until `duration` seconds have passed."""
+    ops = 0
+    started_at = time.perf_counter()
+    while (elapsed := time.perf_counter() - started_at) < duration:
+        await func()
+        ops += 1
+    return ops / elapsed
+
+
+def regressions(
+    values: dict[str, float], baseline: dict[str, float], tolerance: float
+) -> list[str]:
+    return [
+        f"{key}: {values[key]:,.1f} < {baseline[key]:,.1f} (-{tolerance:.0%})"
+        for key in values.keys() & baseline.keys()
+        if values[key] < baseline[key] * (1 - tolerance)
+    ]
+
+
+def argument_parser(description: str) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--output", type=Path, help="Save results as JSON")
+    parser.add_argument(
+        "--baseline", type=Path, help="Results JSON of a previous run to compare"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Allowed slowdown against the baseline, 0.2 means 20%%",
+    )
+    return parser
+
+
+def finish(results: Results, args: argparse.Namespace) -> None:
+    """Save results and exit with 1 on regressions against the baseline."""
+    if args.output:
+        args.output.write_text(json.dumps(results.to_json(), indent=2))
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())["values"]
+        if failed := regressions(results.values, baseline, args.tolerance):
+            print("Regressions:", *failed, sep="\n  ", file=sys.stderr)
+            sys.exit(1)
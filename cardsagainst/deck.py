@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import random
 from dataclasses import dataclass
-from typing import TypeVar, Generic
+from typing import Generic, TypeVar
 
 
 @dataclass
@@ -23,11 +23,16 @@ AnyCard = TypeVar("AnyCard", bound=SetupCard | PunchlineCard)
 
 
 class Deck(Generic[AnyCard]):
-    def __init__(self, cards: list[AnyCard]) -> None:
+    def __init__(
+        self, cards: list[AnyCard], mapping: dict[int, AnyCard] | None = None
+    ) -> None:
         self.cards = cards
         self._dump: list[AnyCard] = []
         self._shuffle()
-        self.mapping = {card.id: card for card in cards}
+        # Decks of one catalog can share it, it is never changed
+        self.mapping = (
+            mapping if mapping is not None else {card.id: card for card in cards}
+        )
 
     def get_card_by_uuid(self, card_id):
         return self.mapping[card_id]
@@ -1,29 +1,37 @@
 from __future__ import annotations
 
 
-class CardNotInPlayerHandError(Exception):
+class CardsAgainstError(Exception):
+    """Base of the errors a lobby raises for a command it rejects"""
+
+
+class CardNotInPlayerHandError(CardsAgainstError):
+    pass
+
+
+class PlayerNotLeadError(CardsAgainstError):
     pass
 
 
-class PlayerNotLeadError(Exception):
+class PlayerNotOwnerError(CardsAgainstError):
     pass
 
 
-class PlayerNotOwnerError(Exception):
+class NotAllCardsOpenedError(CardsAgainstError):
     pass
 
 
-class NotAllCardsOpenedError(Exception):
+class UnknownPlayerError(CardsAgainstError):
     pass
 
 
-class UnknownPlayerError(Exception):
+class PlayerAlreadyReadyError(CardsAgainstError):
     pass
 
 
-class PlayerAlreadyReadyError(Exception):
+class ScoreTooLowError(CardsAgainstError):
     pass
 
 
-class ScoreTooLowError(Exception):
+class UnexpectedStateError(CardsAgainstError):
     pass
@@ -1,27 +1,55 @@
 from __future__ import annotations
 
 import asyncio
+import logging
 import random
 from asyncio import Task
-from uuid import uuid4, UUID
+from uuid import UUID, uuid4
 
-from cardsagainst.deck import SetupCard, PunchlineCard, Deck, AnyCard
+from cardsagainst.deck import Deck, PunchlineCard, SetupCard
 from cardsagainst.exceptions import (
     CardNotInPlayerHandError,
-    PlayerNotLeadError,
-    PlayerNotOwnerError,
     NotAllCardsOpenedError,
-    UnknownPlayerError,
     PlayerAlreadyReadyError,
+    PlayerNotLeadError,
+    PlayerNotOwnerError,
     ScoreTooLowError,
+    UnexpectedStateError,
+    UnknownPlayerError,
 )
 from cardsagainst.game import Game, GameStarted
 from cardsagainst.settings import LobbySettings
 
+logger = logging.getLogger(__name__)
+
+
+class LobbyMonitor:
+    """Lobby-wide hooks for infrastructure, unlike per-player observers"""
+
+    def state_changed(self, old_state: State, new_state: State) -> None:
+        pass
+
+    def timer_fired(self, name: str) -> None:
+        """Called right before a delayed transition happens"""
+
+
+class LobbyMonitors(LobbyMonitor):
+    def __init__(self, *monitors: LobbyMonitor) -> None:
+        self.monitors = monitors
+
+    def state_changed(self, old_state: State, new_state: State) -> None:
+        for monitor in self.monitors:
+            monitor.state_changed(old_state, new_state)
+
+    def timer_fired(self, name: str) -> None:
+        for monitor in self.monitors:
+            monitor.timer_fired(name)
+
 
 class Lobby:
     game: Game | None = None
     lead: Player | None = None
+    monitor: LobbyMonitor = LobbyMonitor()
     # TODO: Move to Game
     is_game_endless: bool = False
     turn_count = 0
@@ -66,8 +94,9 @@ class Lobby:
                 return
 
     def transit_to(self, new_state: State) -> None:
-        self.state = new_state
+        old_state, self.state = self.state, new_state
         self.state.lobby = self
+        self.monitor.state_changed(old_state, new_state)
 
     def change_lead(self) -> None:
         # TODO: можем на дисконектнутого смениться?
@@ -87,6 +116,7 @@ class Lobby:
             assert self.game, "Turn starts when game already started"
             if turn_duration := self.game.settings.turn_duration:
                 await asyncio.sleep(turn_duration)
+                self.monitor.timer_fired("end_turn")
                 self.state.end_turn()
 
         self.transit_to(Turns(new_setup, asyncio.create_task(turn_timer())))
@@ -140,6 +170,7 @@ class Lobby:
     def disconnect(self, player: Player) -> None:
         for pl in self.all_players_except(player):
             pl.observer.player_disconnected(player)
+        self.state.disconnect_player(player)
 
     def add_player(self, player: Player):
         self.players.append(player)
@@ -164,7 +195,7 @@ class Lobby:
         self.grave.add(player)
         for pl in self.all_players_except(player):
             pl.observer.player_left(player)
-        print(f"Removed. self.lead={self.lead}, self.players={self.players}")
+        logger.debug("Removed %s, lead=%s players=%s", player, self.lead, self.players)
         self.state.remove_player(player)
 
     def is_card_picked(self, card_on_table):
@@ -306,13 +337,16 @@ class State:
     def remove_player(self, player: Player) -> None:
         pass
 
+    def disconnect_player(self, player: Player) -> None:
+        pass
+
     def make_turn(self, player: Player, card: PunchlineCard) -> None:
-        raise Exception(
+        raise UnexpectedStateError(
             f"method `make_turn` not expected in state {type(self).__name__}"
         )
 
     def open_table_card(self, player: Player, card_on_table: CardOnTable) -> None:
-        raise Exception(
+        raise UnexpectedStateError(
             f"method `open_punchline_card` not expected in state {type(self).__name__}"
         )
 
@@ -323,32 +357,32 @@ class State:
         setups: Deck[SetupCard],
         punchlines: Deck[PunchlineCard],
     ) -> GameStarted:
-        raise Exception(
+        raise UnexpectedStateError(
             f"method `start_game` not expected in state {type(self).__name__}"
         )
 
     def start_turn(self):
-        raise Exception(
+        raise UnexpectedStateError(
             f"method `start_turn` not expected in state {type(self).__name__}"
         )
 
     def pick_turn_winner(self, player: Player, card: PunchlineCard):
-        raise Exception(
+        raise UnexpectedStateError(
             f"method `pick_turn_winner` not expected in state {type(self).__name__}"
         )
 
     def continue_game(self, player: Player) -> None:
-        raise Exception(
+        raise UnexpectedStateError(
             f"method `continue_game` not expected in state {type(self).__name__}"
         )
 
     def end_turn(self):
-        raise Exception(
+        raise UnexpectedStateError(
             f"method `end_turn` not expected in state {type(self).__name__}"
         )
 
     def refresh_hand(self, player: Player):
-        raise Exception(
+        raise UnexpectedStateError(
             f"method `refresh_hand` not expected in state {type(self).__name__}"
         )
 
@@ -383,6 +417,11 @@ class Turns(State):
     def remove_player(self, player: Player) -> None:
         self.try_end_turn()
 
+    def disconnect_player(self, player: Player) -> None:
+        # Nobody left to wait for, but also nothing to judge yet
+        if self.lobby.table:
+            self.try_end_turn()
+
     def make_turn(self, player: Player, card: PunchlineCard) -> None:
         self.pick_card(player, card)
         self.try_end_turn()
@@ -492,6 +531,7 @@ class Judgement(State):
         async def finish_game(winner: Player):
             assert self.lobby.game, "Turn starts when game already started"
             await asyncio.sleep(self.lobby.game.settings.finish_delay)
+            self.lobby.monitor.timer_fired("finish_game")
             self.finish_game(winner)
 
         if not self.lobby.is_game_endless:
@@ -502,6 +542,7 @@ class Judgement(State):
 
         async def start_turn():
             await asyncio.sleep(self.lobby.game.settings.start_turn_delay)
+            self.lobby.monitor.timer_fired("start_turn")
             self.start_turn()
 
         asyncio.create_task(start_turn())
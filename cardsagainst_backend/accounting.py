@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any
+
+from cardsagainst.lobby import Lobby, LobbyMonitor, State
+from cardsagainst_backend import metrics
+
+# Rough sizes measured with tracemalloc: a player with its connection and
+# queue. Card objects belong to the shared catalog, a game's decks only
+# hold a list slot per card
+PLAYER_BYTES = 4096
+CARD_REFERENCE_BYTES = 8
+LOBBY_BYTES = 2048
+
+
+class LobbyStats(LobbyMonitor):
+    """Resource counters of one lobby, updated as things happen.
+
+    Nothing here walks the lobby objects, so reading stats of every lobby
+    stays cheap no matter how long the games are.
+    """
+
+    def __init__(self) -> None:
+        self.created_at = time.time()
+        self.commands = 0
+        self.cpu_time = 0.0
+        self.outbound_events = 0
+        self.outbound_bytes = 0
+        self.queue_depth = 0
+        self.queued_bytes = 0
+        self.connected = 0
+        self.closed = False
+
+    def state_changed(self, old_state: State, new_state: State) -> None:
+        if self.closed:
+            return
+        metrics.lobbies.dec(type(old_state).__name__)
+        metrics.lobbies.inc(type(new_state).__name__)
+
+    def close(self, state: State) -> None:
+        # Timers of a deleted lobby may still fire, they are not counted
+        self.closed = True
+        metrics.lobbies.dec(type(state).__name__)
+
+    @contextmanager
+    def command(self) -> Iterator[None]:
+        # Includes CPU of other tasks if the command awaits in between
+        started_at = time.thread_time()
+        try:
+            yield
+        finally:
+            self.commands += 1
+            self.cpu_time += time.thread_time() - started_at
+
+    def memory_estimate(self, lobby: Lobby) -> int:
+        players = len(lobby.players) + len(lobby.grave) + bool(lobby.lead)
+        cards = 0
+        if game := lobby.game:
+            cards = sum(
+                len(deck.cards) + len(deck._dump)
+                for deck in (game.setups, game.punchlines)
+            )
+        return (
+            LOBBY_BYTES
+            + players * PLAYER_BYTES
+            + cards * CARD_REFERENCE_BYTES
+            + self.queued_bytes
+        )
+
+    def as_dict(self, lobby: Lobby) -> dict[str, Any]:
+        return {
+            "state": type(lobby.state).__name__,
+            "players": len(lobby.players) + bool(lobby.lead),
+            "connected": self.connected,
+            "turn_count": lobby.turn_count,
+            "is_game_endless": lobby.is_game_endless,
+            "age": time.time() - self.created_at,
+            "commands": self.commands,
+            "cpu_time": self.cpu_time,
+            "outbound_events": self.outbound_events,
+            "outbound_bytes": self.outbound_bytes,
+            "queue_depth": self.queue_depth,
+            "queued_bytes": self.queued_bytes,
+            "memory_estimate": self.memory_estimate(lobby),
+        }
@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import csv
+import datetime
+import io
+import json
+import secrets
+from collections.abc import AsyncIterator
+from enum import StrEnum
+from typing import Annotated, Any
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
+
+from cardsagainst_backend import profiling
+from cardsagainst_backend.catalog import Catalog, catalogs
+from cardsagainst_backend.config import config
+from cardsagainst_backend.dao import ExportFilters
+from cardsagainst_backend.dependencies import (
+    CardsDAODependency,
+    GameStatsDAODependency,
+)
+from cardsagainst_backend.integration import lobbies, lobby_stats
+from cardsagainst_backend.models import GameEvent, GameStats
+from cardsagainst_backend.snapshot import SnapshotError
+from cardsagainst_backend.tracing import tracer
+from cardsagainst_backend.watchdog import watchdog
+
+
+def verify_admin(
+    authorization: Annotated[str | None, Header()] = None,
+) -> None:
+    if not config.admin_token:
+        raise HTTPException(status_code=404)
+
+    expected = f"Bearer {config.admin_token}"
+    if not authorization or not secrets.compare_digest(authorization, expected):
+        raise HTTPException(status_code=401)
+
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(verify_admin)])
+
+
+class ExportTable(StrEnum):
+    EVENTS = "events"
+    STATS = "stats"
+
+
+class ExportFormat(StrEnum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
+class ProfileMode(StrEnum):
+    SAMPLE = "sample"
+    CPROFILE = "cprofile"
+    PSTATS = "pstats"
+
+
+@router.post("/profile")
+async def profile(
+    seconds: Annotated[float, Query(gt=0)],
+    mode: ProfileMode = ProfileMode.SAMPLE,
+    lobby_token: Annotated[str | None, Query(alias="lobbyToken")] = None,
+    sort: str = "cumulative",
+    limit: int = 100,
+    interval: Annotated[float, Query(gt=0)] = 0.005,
+) -> Response:
+    if seconds > config.admin_profile_max_seconds:
+        raise HTTPException(status_code=400, detail="Profiling is too long")
+    if profiling.active_session:
+        raise HTTPException(status_code=409, detail="Already profiling")
+    if lobby_token and lobby_token not in lobbies:
+        raise HTTPException(status_code=404, detail="Unknown lobby")
+
+    session: profiling.ProfileSession
+    if mode is ProfileMode.SAMPLE:
+        session = profiling.SamplingSession(lobby_token, interval=interval)
+    else:
+        session = profiling.CProfileSession(lobby_token, sort=sort, limit=limit)
+
+    await profiling.run(session, seconds)
+    if not session.has_samples():
+        raise HTTPException(status_code=409, detail="No samples, nothing ran")
+
+    if isinstance(session, profiling.CProfileSession) and mode is ProfileMode.PSTATS:
+        return Response(
+            session.dump(),
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": 'attachment; filename="profile.pstats"'},
+        )
+    return PlainTextResponse(session.result())
+
+
+@router.get("/traces")
+def traces(limit: int = 100) -> list[dict[str, Any]]:
+    return list(tracer.ring)[-limit:]
+
+
+@router.get("/traces/{trace_id}")
+def trace(trace_id: str) -> dict[str, Any]:
+    if not (data := tracer.find(trace_id)):
+        raise HTTPException(status_code=404)
+    return data
+
+
+@router.get("/slow-callbacks")
+def slow_callbacks() -> list[dict[str, Any]]:
+    return watchdog.worst_offenders()
+
+
+@router.get("/lobbies")
+def lobbies_stats(sort: str = "cpu_time", limit: int = 100) -> list[dict[str, Any]]:
+    result = [
+        {"lobby_token": lobby_token, **lobby_stats[lobby_token].as_dict(lobby)}
+        for lobby_token, lobby in lobbies.items()
+    ]
+    if result and sort not in result[0]:
+        raise HTTPException(status_code=400, detail=f"Unknown sort key {sort}")
+    result.sort(key=lambda item: item[sort], reverse=True)
+    return result[:limit]
+
+
+@router.get("/catalog")
+def catalog() -> dict[str, Any]:
+    return catalogs.as_dict()
+
+
+@router.post("/catalog/reload")
+async def reload_catalog(
+    cards_dao: CardsDAODependency, snapshot: str | None = None
+) -> dict[str, Any]:
+    """New games get the reloaded cards, running games keep theirs."""
+    if snapshot:
+        try:
+            loaded = await Catalog.load_snapshot(snapshot)
+        except (OSError, SnapshotError) as error:
+            raise HTTPException(status_code=400, detail=str(error)) from error
+    else:
+        loaded = await Catalog.load(cards_dao)
+    catalogs.swap(loaded)
+    return catalogs.as_dict()
+
+
+@router.get("/stats/export")
+def export_stats(
+    game_stats_dao: GameStatsDAODependency,
+    table: ExportTable = ExportTable.EVENTS,
+    format: ExportFormat = ExportFormat.NDJSON,
+    since: datetime.datetime | None = None,
+    until: datetime.datetime | None = None,
+    kind: str | None = None,
+    winning_score: Annotated[int | None, Query(alias="winningScore")] = None,
+    turn_duration: Annotated[int | None, Query(alias="turnDuration")] = None,
+    after_id: Annotated[int, Query(alias="afterId", ge=0)] = 0,
+    limit: Annotated[int | None, Query(gt=0)] = None,
+) -> StreamingResponse:
+    """Streams rows in id order, pass the last id as `afterId` to resume."""
+    events = table is ExportTable.EVENTS
+    if not events and (since or until or kind):
+        raise HTTPException(
+            status_code=400, detail="Stats rows have no date or kind, use events"
+        )
+    pages = game_stats_dao.export(
+        events,
+        ExportFilters(since, until, kind, winning_score, turn_duration),
+        after_id=after_id,
+        limit=limit,
+        page_size=config.stats_export_page_size,
+    )
+    columns = list((GameEvent if events else GameStats).__table__.columns.keys())
+
+    async def ndjson() -> AsyncIterator[str]:
+        async for rows in pages:
+            yield "".join(
+                json.dumps(row, default=datetime.datetime.isoformat) + "\n"
+                for row in rows
+            )
+
+    async def csv_rows() -> AsyncIterator[str]:
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, columns)
+        writer.writeheader()
+        async for rows in pages:
+            writer.writerows(rows)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+
+    filename = f"{table}.{format}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if format is ExportFormat.CSV:
+        return StreamingResponse(csv_rows(), media_type="text/csv", headers=headers)
+    return StreamingResponse(
+        ndjson(), media_type="application/x-ndjson", headers=headers
+    )
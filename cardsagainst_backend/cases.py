@@ -0,0 +1,12 @@
+from enum import StrEnum
+
+
+class CardTextCase(StrEnum):
+    """Grammatical cases of card texts, shared by the API and the importer"""
+
+    NOM = "nom"
+    GEN = "gen"
+    DAT = "dat"
+    ACC = "acc"
+    INST = "inst"
+    PREP = "prep"
@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import weakref
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from typing import Any, ClassVar
+
+from cardsagainst.deck import Deck, PunchlineCard, SetupCard
+from cardsagainst.game import Game
+from cardsagainst_backend import metrics
+from cardsagainst_backend.dao import CardsDAO, DeckCards
+from cardsagainst_backend.snapshot import Snapshot
+
+logger = logging.getLogger(__name__)
+
+
+class UnknownDeckError(KeyError):
+    pass
+
+
+class DeckTooSmallError(ValueError):
+    pass
+
+
+@dataclass
+class DeckView:
+    """Cards of one or more decks, shared by the games dealt from them."""
+
+    setups: tuple[SetupCard, ...]
+    punchlines: tuple[PunchlineCard, ...]
+    setups_mapping: dict[int, SetupCard]
+    punchlines_mapping: dict[int, PunchlineCard]
+
+
+def _view(
+    setups: dict[int, SetupCard], punchlines: dict[int, PunchlineCard]
+) -> DeckView:
+    return DeckView(
+        tuple(setups.values()), tuple(punchlines.values()), setups, punchlines
+    )
+
+
+def _digest(
+    setups: list[SetupCard],
+    punchlines: list[PunchlineCard],
+    decks: dict[str, DeckCards],
+) -> str:
+    # Same cards, same version, so reloading an unchanged table is a no-op
+    return hashlib.sha1(repr((setups, punchlines, decks)).encode()).hexdigest()
+
+
+@dataclass(eq=False)
+class Catalog:
+    """One version of all cards, shared by the games dealt from it.
+
+    Every deck is a precomputed view over the catalog cards, and so is
+    every combination of decks a lobby asked for, so dealing a game only
+    copies a list of references for the decks to shuffle.
+    """
+
+    version: str
+    setups: list[SetupCard]
+    punchlines: list[PunchlineCard]
+    decks: dict[str, DeckCards] = field(default_factory=dict)
+
+    MAX_VIEWS: ClassVar[int] = 1024
+
+    def __post_init__(self) -> None:
+        setups = {card.id: card for card in self.setups}
+        punchlines = {card.id: card for card in self.punchlines}
+        self._views: dict[frozenset[str], DeckView] = {
+            frozenset(): _view(setups, punchlines)
+        }
+        for deck_id, (setup_ids, punchline_ids) in self.decks.items():
+            self._views[frozenset((deck_id,))] = _view(
+                {card_id: setups[card_id] for card_id in setup_ids},
+                {card_id: punchlines[card_id] for card_id in punchline_ids},
+            )
+
+    @classmethod
+    async def load(cls, cards_dao: CardsDAO) -> Catalog:
+        setups = sorted((await cards_dao.get_setups()).cards, key=lambda c: c.id)
+        punchlines = sorted(
+            (await cards_dao.get_punchlines()).cards, key=lambda c: c.id
+        )
+        decks = {
+            deck_id: (sorted(setup_ids), sorted(punchline_ids))
+            for deck_id, (setup_ids, punchline_ids) in sorted(
+                (await cards_dao.get_decks()).items()
+            )
+        }
+        # Hashing every card takes a while for big tables, games go on meanwhile
+        digest = await asyncio.to_thread(_digest, setups, punchlines, decks)
+        return cls(f"db-{digest[:12]}", setups, punchlines, decks)
+
+    @classmethod
+    async def load_snapshot(cls, path: str) -> Catalog:
+        # Decoding takes a while for big files, games go on meanwhile
+        snapshot = await asyncio.to_thread(Snapshot, path)
+        return cls(
+            snapshot.version, snapshot.setups, snapshot.punchlines, snapshot.decks
+        )
+
+    def view(self, deck_ids: Iterable[str] = ()) -> DeckView:
+        """Cards of all the decks together, all cards without deck ids"""
+        key = frozenset(deck_ids)
+        if (view := self._views.get(key)) is not None:
+            return view
+        if unknown := key - self.decks.keys():
+            raise UnknownDeckError(", ".join(sorted(unknown)))
+        parts = [self._views[frozenset((deck_id,))] for deck_id in sorted(key)]
+        setups: dict[int, SetupCard] = {}
+        punchlines: dict[int, PunchlineCard] = {}
+        for part in parts:
+            setups |= part.setups_mapping
+            punchlines |= part.punchlines_mapping
+        if len(self._views) >= self.MAX_VIEWS:
+            # Single decks stay, combinations are cheap to build again
+            self._views = {
+                ids: view for ids, view in self._views.items() if len(ids) < 2
+            }
+        view = self._views[key] = _view(setups, punchlines)
+        return view
+
+    def deal(
+        self, deck_ids: Iterable[str] = (), punchlines_needed: int = 0
+    ) -> tuple[Deck[SetupCard], Deck[PunchlineCard]]:
+        """Decks for a game, with a setup and punchlines for every hand"""
+        view = self.view(deck_ids)
+        if not view.setups or len(view.punchlines) < punchlines_needed:
+            raise DeckTooSmallError(
+                f"setups={len(view.setups)} punchlines={len(view.punchlines)}"
+            )
+        return (
+            Deck(cards=list(view.setups), mapping=view.setups_mapping),
+            Deck(cards=list(view.punchlines), mapping=view.punchlines_mapping),
+        )
+
+
+class Catalogs:
+    """Catalog versions, new games are dealt from the current one.
+
+    Swapping only changes what the next game gets. Every game keeps its
+    catalog alive through a weak mapping, so an old version is freed once
+    the last game dealt from it is gone.
+    """
+
+    def __init__(self) -> None:
+        self._current: Catalog | None = None
+        self._games: weakref.WeakKeyDictionary[Game, Catalog] = (
+            weakref.WeakKeyDictionary()
+        )
+        self._live: weakref.WeakSet[Catalog] = weakref.WeakSet()
+
+    @property
+    def current(self) -> Catalog:
+        assert self._current, "Catalog is loaded on startup"
+        return self._current
+
+    def swap(self, catalog: Catalog) -> None:
+        if self._current and self._current.version == catalog.version:
+            logger.info("Catalog is up to date, version=%s", catalog.version)
+            return
+        self._current = catalog
+        self._live.add(catalog)
+        metrics.catalog_versions.inc()
+        weakref.finalize(catalog, metrics.catalog_versions.dec)
+        logger.warning(
+            "Catalog swapped, version=%s setups=%s punchlines=%s",
+            catalog.version,
+            len(catalog.setups),
+            len(catalog.punchlines),
+        )
+
+    def attach(self, game: Game, catalog: Catalog) -> None:
+        self._games[game] = catalog
+
+    def as_dict(self) -> dict[str, Any]:
+        games: dict[str, int] = {catalog.version: 0 for catalog in self._live}
+        for catalog in self._games.values():
+            games[catalog.version] += 1
+        return {
+            "current": self._current.version if self._current else None,
+            "decks": sorted(self._current.decks) if self._current else [],
+            "games": games,
+        }
+
+
+catalogs = Catalogs()
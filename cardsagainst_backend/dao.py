@@ -1,21 +1,90 @@
-from sqlalchemy import select, insert
+from __future__ import annotations
+
+import asyncio
+import datetime
+import json
+import logging
+import os
+import shutil
+import time
+from asyncio import Task
+from collections.abc import AsyncIterator, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any
+
+from sqlalchemy import insert, select
 from sqlalchemy.ext.asyncio import async_sessionmaker
 
-from cardsagainst.deck import PunchlineCard, Deck, SetupCard
-from cardsagainst.game import GameStarted
-from cardsagainst.lobby import Lobby
-from cardsagainst_backend.models import GameStats, Punchline, Setup
+from cardsagainst.deck import Deck, PunchlineCard, SetupCard
+from cardsagainst.lobby import (
+    Finished,
+    Gathering,
+    Judgement,
+    Lobby,
+    LobbyMonitor,
+    State,
+    Turns,
+)
+from cardsagainst_backend import metrics
+from cardsagainst_backend.logs import dao_call_var
+from cardsagainst_backend.models import (
+    Changelog,
+    DeckPunchline,
+    DeckSetup,
+    GameEvent,
+    GameStats,
+    Punchline,
+    Setup,
+)
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def dao_call(name: str) -> Iterator[None]:
+    """Times a DAO call and names it for the slow query log"""
+    token = dao_call_var.set(name)
+    try:
+        with metrics.dao_seconds.time(name):
+            yield
+    finally:
+        dao_call_var.reset(token)
+
+
+# version, text, date
+ChangelogRecord = tuple[str, str, datetime.date]
+# setup ids, punchline ids
+DeckCards = tuple[list[int], list[int]]
+
+
+@dataclass
+class ExportFilters:
+    """Rows to export, `kind` and the dates only apply to game events"""
+
+    since: datetime.datetime | None = None
+    until: datetime.datetime | None = None
+    kind: str | None = None
+    winning_score: int | None = None
+    turn_duration: int | None = None
 
 
 class CardsDAO:
     def __init__(self, async_session: async_sessionmaker):
         self.async_session = async_session
 
-    async def get_setups(self, deck_id: str) -> Deck[SetupCard]:
+    async def get_setups(self, deck_id: str | None = None) -> Deck[SetupCard]:
+        """Cards of the deck, or all of them without `deck_id`"""
+        with dao_call("CardsDAO.get_setups"):
+            return await self._get_setups(deck_id)
+
+    async def _get_setups(self, deck_id: str | None) -> Deck[SetupCard]:
+        query = select(Setup)
+        if deck_id is not None:
+            query = query.join(DeckSetup).where(DeckSetup.deck_id == deck_id)
         async with self.async_session() as session:
-            result = await session.execute(select(Setup))
+            result = await session.execute(query)
 
-            # TODO: Use deck_id
             return Deck(
                 cards=[
                     SetupCard(
@@ -28,11 +97,18 @@ class CardsDAO:
                 ]
             )
 
-    async def get_punchlines(self, deck_id: str) -> Deck[PunchlineCard]:
+    async def get_punchlines(self, deck_id: str | None = None) -> Deck[PunchlineCard]:
+        """Cards of the deck, or all of them without `deck_id`"""
+        with dao_call("CardsDAO.get_punchlines"):
+            return await self._get_punchlines(deck_id)
+
+    async def _get_punchlines(self, deck_id: str | None) -> Deck[PunchlineCard]:
+        query = select(Punchline)
+        if deck_id is not None:
+            query = query.join(DeckPunchline).where(DeckPunchline.deck_id == deck_id)
         async with self.async_session() as session:
-            result = await session.execute(select(Punchline))
+            result = await session.execute(query)
 
-            # TODO: Use deck_id
             return Deck(
                 cards=[
                     PunchlineCard(
@@ -43,16 +119,329 @@ class CardsDAO:
                 ]
             )
 
+    async def get_decks(self) -> dict[str, DeckCards]:
+        """Card ids of every deck, by deck id"""
+        with dao_call("CardsDAO.get_decks"):
+            return await self._get_decks()
+
+    async def _get_decks(self) -> dict[str, DeckCards]:
+        decks: dict[str, DeckCards] = {}
+        async with self.async_session() as session:
+            for deck_id, setup_id in await session.execute(
+                select(DeckSetup.deck_id, DeckSetup.setup_id)
+            ):
+                decks.setdefault(deck_id, ([], []))[0].append(setup_id)
+            for deck_id, punchline_id in await session.execute(
+                select(DeckPunchline.deck_id, DeckPunchline.punchline_id)
+            ):
+                decks.setdefault(deck_id, ([], []))[1].append(punchline_id)
+        return decks
+
+
+class ChangelogDAO:
+    """Changelog kept in memory, its rows only change on deploy.
+
+    `run` polls the latest row id and reloads the table when it changes,
+    so requests are answered without touching the database.
+    """
+
+    def __init__(self, async_session: async_sessionmaker, poll_interval: float = 60):
+        self.async_session = async_session
+        self.poll_interval = poll_interval
+        self.last_id: int | None = None
+        self._records: list[ChangelogRecord] = []
+        self._after: dict[str, list[ChangelogRecord]] = {}
+
+    @property
+    def current_version(self) -> str:
+        return self._records[-1][0] if self._records else ""
+
+    @property
+    def etag(self) -> str:
+        return f'"changelog-{self.last_id}"'
+
+    async def get_changelog(self, version: str) -> list[ChangelogRecord]:
+        """Records newer than the last one of `version`"""
+        if self.last_id is None:
+            await self.refresh()
+        if (records := self._after.get(version)) is not None:
+            return records
+        for index in range(len(self._records) - 1, -1, -1):
+            if self._records[index][0] == version:
+                records = self._after[version] = self._records[index + 1 :]
+                return records
+        # Unknown versions are not cached, any client may send them
+        return []
+
+    async def refresh(self) -> None:
+        with dao_call("ChangelogDAO.get_last_id"):
+            last_id = await self._get_last_id()
+        if last_id == self.last_id:
+            return
+        with dao_call("ChangelogDAO.get_records"):
+            records = await self._get_records()
+        self._records, self._after, self.last_id = records, {}, last_id
+        logger.info("Changelog loaded, current_version=%s", self.current_version)
+
+    async def _get_last_id(self) -> int:
+        async with self.async_session() as session:
+            result = await session.execute(
+                select(Changelog.id).order_by(Changelog.id.desc()).limit(1)
+            )
+            return result.scalar() or 0
+
+    async def _get_records(self) -> list[ChangelogRecord]:
+        async with self.async_session() as session:
+            result = await session.execute(
+                select(Changelog.version, Changelog.text, Changelog.date).order_by(
+                    Changelog.id
+                )
+            )
+            return [(version, text, date) for version, text, date in result.all()]
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Changelog refresh failed")
+
 
 class GameStatsDAO:
-    def __init__(self, async_session: async_sessionmaker):
+    """Game records written behind, in multi-row batches.
+
+    Lobbies report through `monitor`, which only appends rows to a buffer,
+    so no command waits for the database. The buffer is inserted once it
+    holds `batch_size` rows or every `flush_interval`. Rows that fail to
+    insert go to `spill_file` and are retried after the next insert.
+    """
+
+    def __init__(
+        self,
+        async_session: async_sessionmaker,
+        batch_size: int = 500,
+        flush_interval: float = 5,
+        spill_file: str = "",
+    ):
         self.async_session = async_session
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spill_file = spill_file
+        self._rows: list[dict[str, Any]] = []
+        self._lock = asyncio.Lock()
+        self._flush_task: Task | None = None
+        self._closing = asyncio.Event()
+        self._spill_offset = 0
+
+    def monitor(self) -> GameStatsMonitor:
+        return GameStatsMonitor(self)
 
-    async def insert(self, event: GameStarted) -> None:
+    def add(self, row: dict[str, Any]) -> None:
+        self._rows.append(row)
+        if len(self._rows) >= self.batch_size and not (
+            self._flush_task and not self._flush_task.done()
+        ):
+            self._flush_task = asyncio.create_task(self.flush())
+
+    async def flush(self) -> None:
+        async with self._lock:
+            rows, self._rows = self._rows, []
+            try:
+                inserted = not rows or await self._try_insert(rows)
+            except BaseException:
+                # Cancelled mid insert, these rows are nowhere else
+                self._spill(rows)
+                raise
+            if not inserted:
+                await asyncio.to_thread(self._spill, rows)
+                return
+            await self._retry_spill()
+
+    async def _try_insert(self, rows: list[dict[str, Any]]) -> bool:
+        try:
+            with dao_call("GameStatsDAO.insert"):
+                await self._insert(rows)
+        except Exception:
+            logger.exception("Game stats insert failed, rows=%s", len(rows))
+            return False
+        metrics.game_stats_rows.inc("inserted", amount=len(rows))
+        return True
+
+    async def _insert(self, rows: list[dict[str, Any]]) -> None:
         async with self.async_session() as session:
-            query = insert(GameStats).values(
-                winning_score=event.game.settings.winning_score,
-                turn_duration=event.game.settings.turn_duration,
+            if started := [row for row in rows if row["kind"] == "started"]:
+                await session.execute(
+                    insert(GameStats),
+                    [
+                        {
+                            "winning_score": row["winning_score"],
+                            "turn_duration": row["turn_duration"],
+                        }
+                        for row in started
+                    ],
+                )
+            await session.execute(
+                insert(GameEvent),
+                [
+                    {
+                        **row,
+                        "created_at": datetime.datetime.fromtimestamp(
+                            row["created_at"], datetime.UTC
+                        ),
+                    }
+                    for row in rows
+                ],
             )
-            await session.execute(query)
             await session.commit()
+
+    async def _retry_spill(self) -> None:
+        """Inserts spilled rows a batch at a time, the file is read off the loop.
+
+        `_spill_offset` is how far the file is inserted, the file is removed
+        once all of it is, and new rows may be appended meanwhile.
+        """
+        if not self.spill_file:
+            return
+        while True:
+            rows, offset = await asyncio.to_thread(self._read_spill)
+            if not rows:
+                break
+            if not await self._try_insert(rows):
+                return
+            self._spill_offset = offset
+        if self._spill_offset:
+            await asyncio.to_thread(os.remove, self.spill_file)
+            self._spill_offset = 0
+
+    def _read_spill(self) -> tuple[list[dict[str, Any]], int]:
+        """Up to `batch_size` rows after `_spill_offset`, and the offset after them"""
+        if not os.path.exists(self.spill_file):
+            return [], self._spill_offset
+        rows: list[dict[str, Any]] = []
+        with open(self.spill_file, "rb") as file:
+            file.seek(self._spill_offset)
+            while len(rows) < self.batch_size and (line := file.readline()):
+                rows.append(json.loads(line))
+            return rows, file.tell()
+
+    def _compact_spill(self) -> None:
+        """Drops inserted rows from the file, so a restart does not repeat them"""
+        if not self._spill_offset or not os.path.exists(self.spill_file):
+            return
+        compacted = self.spill_file + ".tmp"
+        with open(self.spill_file, "rb") as source, open(compacted, "wb") as target:
+            source.seek(self._spill_offset)
+            shutil.copyfileobj(source, target)
+        os.replace(compacted, self.spill_file)
+        self._spill_offset = 0
+
+    def _spill(self, rows: list[dict[str, Any]]) -> None:
+        if not self.spill_file:
+            metrics.game_stats_rows.inc("dropped", amount=len(rows))
+            return
+        with open(self.spill_file, "a", encoding="utf-8") as file:
+            file.writelines(json.dumps(row) + "\n" for row in rows)
+        metrics.game_stats_rows.inc("spilled", amount=len(rows))
+
+    async def run(self) -> None:
+        # Stops on close rather than on cancel, so no flush is cut short
+        while not self._closing.is_set():
+            try:
+                await asyncio.wait_for(self._closing.wait(), self.flush_interval)
+            except TimeoutError:
+                await self.flush()
+
+    async def close(self) -> None:
+        self._closing.set()
+        if self._flush_task:
+            await self._flush_task
+        await self.flush()
+        await asyncio.to_thread(self._compact_spill)
+
+    async def export(
+        self,
+        events: bool,
+        filters: ExportFilters,
+        after_id: int = 0,
+        limit: int | None = None,
+        page_size: int = 1000,
+    ) -> AsyncIterator[list[dict[str, Any]]]:
+        """Pages of game events or stats rows in id order, after `after_id`.
+
+        Every page is a query of its own that starts where the last one
+        ended, so no connection is held between pages and memory does not
+        grow with the table.
+        """
+        while limit is None or limit > 0:
+            size = page_size if limit is None else min(page_size, limit)
+            with dao_call("GameStatsDAO.export"):
+                rows = await self._get_page(events, filters, after_id, size)
+            if rows:
+                yield rows
+            if len(rows) < size:
+                return
+            after_id = rows[-1]["id"]
+            if limit is not None:
+                limit -= len(rows)
+
+    async def _get_page(
+        self, events: bool, filters: ExportFilters, after_id: int, size: int
+    ) -> list[dict[str, Any]]:
+        table = (GameEvent if events else GameStats).__table__
+        query = select(table).where(table.c.id > after_id)
+        for name in ("kind", "winning_score", "turn_duration"):
+            if (value := getattr(filters, name)) is not None:
+                query = query.where(table.c[name] == value)
+        if filters.since:
+            query = query.where(table.c.created_at >= filters.since)
+        if filters.until:
+            query = query.where(table.c.created_at < filters.until)
+        async with self.async_session() as session:
+            result = await session.stream(query.order_by(table.c.id).limit(size))
+            return [dict(row) async for row in result.mappings()]
+
+
+class GameStatsMonitor(LobbyMonitor):
+    """Turns lobby transitions into game stats rows."""
+
+    def __init__(self, dao: GameStatsDAO) -> None:
+        self.dao = dao
+        self.started_at = 0.0
+
+    def state_changed(self, old_state: State, new_state: State) -> None:
+        lobby = new_state.lobby
+        if isinstance(old_state, Gathering) and isinstance(new_state, Turns):
+            self.started_at = time.time()
+            self._add(lobby, "started")
+        if isinstance(old_state, Judgement) and old_state.winner:
+            self._add(lobby, "turn_ended", winner_score=old_state.winner.score)
+        if isinstance(new_state, Finished):
+            self._add(
+                lobby,
+                "finished",
+                winner_score=new_state.winner.score,
+                duration=time.time() - self.started_at,
+            )
+
+    def _add(
+        self,
+        lobby: Lobby,
+        kind: str,
+        winner_score: int | None = None,
+        duration: float | None = None,
+    ) -> None:
+        assert lobby.game, "Stats are written for started games only"
+        self.dao.add(
+            {
+                "game_id": lobby.game.id,
+                "kind": kind,
+                "created_at": time.time(),
+                "players": len(lobby.players) + bool(lobby.lead),
+                "turn_count": lobby.turn_count,
+                "winning_score": lobby.game.settings.winning_score,
+                "turn_duration": lobby.game.settings.turn_duration,
+                "winner_score": winner_score,
+                "duration": duration,
+            }
+        )
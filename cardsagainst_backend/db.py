@@ -1,13 +1,86 @@
+from __future__ import annotations
+
+import logging
+import time
+from typing import Any
+
+from sqlalchemy import Engine, event, make_url
 from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, StaticPool
 
+from cardsagainst_backend import metrics
 from cardsagainst_backend.config import config
-from cardsagainst_backend.models import metadata
+from cardsagainst_backend.logs import dao_call_var
+
+logger = logging.getLogger(__name__)
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool that exports how long and how many wait for a connection"""
+
+    def _do_get(self):
+        metrics.db_pool_waiting.inc()
+        started_at = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            metrics.db_pool_waiting.dec()
+            metrics.db_pool_checkout_seconds.observe(time.perf_counter() - started_at)
 
 
 def create_engine() -> AsyncEngine:
-    return create_async_engine(config.db.url)
+    db = config.db
+    url = make_url(db.url)
+    options: dict[str, Any]
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        # Every new connection would open its own empty database
+        options = {"poolclass": StaticPool}
+    else:
+        options = {
+            "poolclass": InstrumentedPool,
+            "pool_size": db.pool_size,
+            "max_overflow": db.max_overflow,
+            "pool_timeout": db.pool_timeout,
+            "pool_recycle": db.pool_recycle,
+            "pool_pre_ping": db.pool_pre_ping,
+        }
+    if url.get_backend_name() == "postgresql":
+        options["connect_args"] = {
+            # asyncpg's own cache and the one SQLAlchemy keeps on top of it
+            "statement_cache_size": db.statement_cache_size,
+            "prepared_statement_cache_size": db.statement_cache_size,
+        }
+    engine = create_async_engine(url, **options)
+    instrument(engine.sync_engine, db.slow_query_threshold)
+    return engine
+
+
+def instrument(engine: Engine, slow_query_threshold: float) -> None:
+    @event.listens_for(engine.pool, "checkout")
+    def checkout(*args: object) -> None:
+        metrics.db_pool_in_use.inc()
+
+    @event.listens_for(engine.pool, "checkin")
+    def checkin(*args: object) -> None:
+        metrics.db_pool_in_use.dec()
+
+    if not slow_query_threshold:
+        return
 
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, *args: object) -> None:
+        conn.info["query_started_at"] = time.perf_counter()
 
-async def create_tables_if_not_exist(engine: AsyncEngine) -> None:
-    async with engine.begin() as conn:
-        await conn.run_sync(metadata.create_all)
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement: str, *args: object) -> None:
+        duration = time.perf_counter() - conn.info.pop("query_started_at")
+        if duration < slow_query_threshold:
+            return
+        dao_call = dao_call_var.get() or "unknown"
+        metrics.slow_queries.inc(dao_call)
+        logger.warning(
+            "Slow query, dao=%s seconds=%.3f statement=%s",
+            dao_call,
+            duration,
+            " ".join(statement.split())[:500],
+        )
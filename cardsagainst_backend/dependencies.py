@@ -1,14 +1,28 @@
 from __future__ import annotations
 
-import logging
+import asyncio
+from collections.abc import AsyncGenerator, Callable
 from contextlib import asynccontextmanager
-from typing import Annotated, AsyncGenerator, TypeAlias
+from typing import Annotated, TypeAlias
 
 from fastapi import Depends, FastAPI
 from sqlalchemy.ext.asyncio import async_sessionmaker
 
-from cardsagainst_backend.dao import GameStatsDAO, CardsDAO
-from cardsagainst_backend.db import create_tables_if_not_exist, create_engine
+from cardsagainst_backend.catalog import Catalog, catalogs
+from cardsagainst_backend.config import config
+from cardsagainst_backend.dao import CardsDAO, ChangelogDAO, GameStatsDAO
+from cardsagainst_backend.db import create_engine
+from cardsagainst_backend.heartbeat import heartbeat
+from cardsagainst_backend.logs import setup_logging
+from cardsagainst_backend.memory_dao import (
+    MemoryCardsDAO,
+    MemoryChangelogDAO,
+    MemoryGameStatsDAO,
+)
+from cardsagainst_backend.migrations import migrate
+from cardsagainst_backend.recorder import recorder
+from cardsagainst_backend.removals import pending_removals
+from cardsagainst_backend.watchdog import watchdog
 
 
 def cards_dao_dependency() -> CardsDAO:
@@ -21,6 +35,11 @@ def game_stats_dao_dependency() -> GameStatsDAO:
     raise NotImplementedError
 
 
+def changelog_dao_dependency() -> ChangelogDAO:
+    # Will be injected on startup
+    raise NotImplementedError
+
+
 def session_dependency() -> async_sessionmaker:
     # Will be injected on startup
     raise NotImplementedError
@@ -30,25 +49,97 @@ CardsDAODependency: TypeAlias = Annotated[CardsDAO, Depends(cards_dao_dependency
 GameStatsDAODependency: TypeAlias = Annotated[
     GameStatsDAO, Depends(game_stats_dao_dependency)
 ]
+ChangelogDAODependency: TypeAlias = Annotated[
+    ChangelogDAO, Depends(changelog_dao_dependency)
+]
 SessionDependency: TypeAlias = Annotated[
     async_sessionmaker, Depends(session_dependency)
 ]
 
 
 @asynccontextmanager
-async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
-    engine = create_engine()
-    logging.getLogger(__name__).warning("Creating tables if not exist...")
-    await create_tables_if_not_exist(engine)
+async def run_services() -> AsyncGenerator[None, None]:
+    """Logging and background tasks, independent of the storage"""
+    log_listener = setup_logging()
+    heartbeat_task = None
+    if heartbeat.enabled:
+        heartbeat_task = asyncio.create_task(heartbeat.run())
+    reaper_task = asyncio.create_task(pending_removals.run())
+    recorder_task = asyncio.create_task(recorder.run())
+    if watchdog.threshold:
+        watchdog.install()
+
+    yield
 
-    async_session = async_sessionmaker(engine)
-    cards_dao = CardsDAO(async_session)
-    game_stats_dao = GameStatsDAO(async_session)
+    if heartbeat_task:
+        heartbeat_task.cancel()
+    reaper_task.cancel()
+    recorder_task.cancel()
+    recorder.close()
+    watchdog.uninstall()
+    log_listener.stop()
 
-    app.dependency_overrides = {
-        session_dependency: lambda: async_session,
+
+@asynccontextmanager
+async def open_storage() -> AsyncGenerator[dict[Callable, Callable], None]:
+    """DAOs of the configured storage, as dependency overrides.
+
+    `storage = "database"` uses `db.url`, Postgres or SQLite, and
+    `storage = "memory"` needs no external service at all. Either way
+    the first catalog comes from `catalog_snapshot` when it is set.
+    """
+    engine = None
+    overrides: dict[Callable, Callable] = {}
+    cards_dao: CardsDAO
+    game_stats_dao: GameStatsDAO
+    changelog_dao: ChangelogDAO
+    if config.storage == "memory":
+        cards_dao = MemoryCardsDAO(
+            config.memory_setups, config.memory_punchlines, config.memory_decks
+        )
+        game_stats_dao = MemoryGameStatsDAO()
+        changelog_dao = MemoryChangelogDAO()
+    else:
+        engine = create_engine()
+        await migrate(engine)
+
+        async_session = async_sessionmaker(engine)
+        cards_dao = CardsDAO(async_session)
+        game_stats_dao = GameStatsDAO(
+            async_session,
+            batch_size=config.stats_batch_size,
+            flush_interval=config.stats_flush_interval,
+            spill_file=config.stats_spill_file,
+        )
+        changelog_dao = ChangelogDAO(
+            async_session, poll_interval=config.changelog_poll_interval
+        )
+        overrides[session_dependency] = lambda: async_session
+
+    if config.catalog_snapshot:
+        catalogs.swap(await Catalog.load_snapshot(config.catalog_snapshot))
+    else:
+        catalogs.swap(await Catalog.load(cards_dao))
+    await changelog_dao.refresh()
+    game_stats_task = asyncio.create_task(game_stats_dao.run())
+    changelog_task = asyncio.create_task(changelog_dao.run())
+
+    yield {
+        **overrides,
         cards_dao_dependency: lambda: cards_dao,
         game_stats_dao_dependency: lambda: game_stats_dao,
+        changelog_dao_dependency: lambda: changelog_dao,
     }
 
-    yield
+    changelog_task.cancel()
+    await game_stats_dao.close()
+    await game_stats_task
+    if engine:
+        await engine.dispose()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
+    async with run_services(), open_storage() as overrides:
+        app.dependency_overrides = overrides
+        yield
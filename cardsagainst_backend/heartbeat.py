@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING
+
+from cardsagainst_backend.config import config
+
+if TYPE_CHECKING:
+    from cardsagainst_backend.integration import RemotePlayer
+
+
+class Heartbeat:
+    """Pings all watched connections from one shared timer.
+
+    Every beat each connection either gets a ping or, if it has missed
+    `missed_limit` beats in a row, is expired. Any inbound message, "pong"
+    included, counts as an answer, so only clients that answer pings may
+    idle; an interval of 0 disables the heartbeat.
+    """
+
+    def __init__(self, interval: float, missed_limit: int) -> None:
+        self.interval = interval
+        self.missed_limit = missed_limit
+        self._remote_players: set[RemotePlayer] = set()
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval > 0
+
+    def watch(self, remote_player: RemotePlayer) -> None:
+        if self.enabled:
+            self._remote_players.add(remote_player)
+
+    def unwatch(self, remote_player: RemotePlayer) -> None:
+        self._remote_players.discard(remote_player)
+
+    def beat(self) -> None:
+        for remote_player in list(self._remote_players):
+            if remote_player.missed_beats >= self.missed_limit:
+                self.unwatch(remote_player)
+                remote_player.expire()
+            else:
+                remote_player.missed_beats += 1
+                remote_player.ping()
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            self.beat()
+
+
+heartbeat = Heartbeat(
+    interval=config.heartbeat_interval,
+    missed_limit=config.heartbeat_missed_limit,
+)
@@ -0,0 +1,305 @@
+"""Bulk import of cards from CSV or NDJSON files into db.url.
+
+    python -m cardsagainst_backend.importer setups setups.csv
+    python -m cardsagainst_backend.importer punchlines pack.ndjson --upsert --deck pack
+
+Setups have `text`, `variant` and `starts_with_punchline`, punchlines have
+`variants`, a JSON list of [text, [cases]] pairs, and both may have an
+`id`. Rows with an id replace the card with `--upsert`, rows without one
+get a new id. `--deck` adds every imported card to that deck.
+
+Files are read, validated and sent row by row. Postgres gets a single
+binary COPY into a temporary table, other databases get batched inserts.
+Everything happens in one transaction, an invalid row imports nothing.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import csv
+import json
+import time
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from itertools import islice
+from pathlib import Path
+from typing import Any
+
+from pydantic import BaseModel, ValidationError, field_validator
+from sqlalchemy import func, insert, select
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from cardsagainst_backend.cases import CardTextCase
+from cardsagainst_backend.models import (
+    CardDeck,
+    DeckPunchline,
+    DeckSetup,
+    Punchline,
+    Setup,
+)
+
+
+class CardImportError(Exception):
+    pass
+
+
+class SetupRow(BaseModel):
+    id: int | None = None
+    text: str
+    variant: CardTextCase
+    starts_with_punchline: bool
+
+
+class PunchlineRow(BaseModel):
+    id: int | None = None
+    variants: list[tuple[str, list[CardTextCase]]]
+
+    @field_validator("variants", mode="before")
+    @classmethod
+    def parse_json(cls, value: Any) -> Any:
+        # CSV cells are strings
+        return json.loads(value) if isinstance(value, str) else value
+
+
+@dataclass
+class Kind:
+    row: type[SetupRow | PunchlineRow]
+    model: type[Setup | Punchline]
+    deck_model: type[DeckSetup | DeckPunchline]
+    deck_column: str
+    # name and Postgres type of every column but id
+    columns: dict[str, str]
+
+    @property
+    def table(self) -> str:
+        return self.model.__tablename__
+
+
+KINDS = {
+    "setups": Kind(
+        SetupRow,
+        Setup,
+        DeckSetup,
+        "setup_id",
+        {"text": "text", "variant": "text", "starts_with_punchline": "boolean"},
+    ),
+    "punchlines": Kind(
+        PunchlineRow, Punchline, DeckPunchline, "punchline_id", {"variants": "jsonb"}
+    ),
+}
+
+
+def read_rows(path: Path) -> Iterator[dict[str, Any]]:
+    with path.open(newline="", encoding="utf-8") as file:
+        if path.suffix == ".csv":
+            for row in csv.DictReader(file):
+                yield {key: value for key, value in row.items() if value != ""}
+        else:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def validate(kind: Kind, path: Path) -> Iterator[tuple[Any, ...]]:
+    """(id, *columns) of every row of the file"""
+    for number, raw in enumerate(read_rows(path), 1):
+        try:
+            row = kind.row.model_validate(raw)
+        except (ValidationError, ValueError) as error:
+            raise CardImportError(f"{path}, row {number}: {error}") from error
+        values = row.model_dump(mode="json")
+        yield (values["id"], *(values[column] for column in kind.columns))
+
+
+class CountedRows:
+    def __init__(self, rows: Iterable[tuple[Any, ...]]) -> None:
+        self.rows = rows
+        self.count = 0
+
+    def __iter__(self) -> Iterator[tuple[Any, ...]]:
+        for row in self.rows:
+            self.count += 1
+            yield row
+
+
+async def copy_import(
+    connection: AsyncConnection,
+    kind: Kind,
+    rows: Iterable[tuple[Any, ...]],
+    upsert: bool,
+    deck: str | None,
+) -> None:
+    staging = f"import_{kind.table}"
+    columns = ", ".join(kind.columns)
+    # Through SQLAlchemy, so its transaction has begun for the driver calls
+    await connection.exec_driver_sql(
+        f"CREATE TEMPORARY TABLE {staging} (id integer, "
+        + ", ".join(f"{name} {type_}" for name, type_ in kind.columns.items())
+        + ") ON COMMIT DROP"
+    )
+    driver = (await connection.get_raw_connection()).driver_connection
+    assert driver, "Connection is open for the transaction"
+    # asyncpg takes jsonb as text
+    json_columns = [
+        index
+        for index, type_ in enumerate(kind.columns.values(), 1)
+        if type_ == "jsonb"
+    ]
+    await driver.copy_records_to_table(
+        staging,
+        records=(
+            tuple(
+                json.dumps(value, ensure_ascii=False)
+                if index in json_columns
+                else value
+                for index, value in enumerate(row)
+            )
+            for row in rows
+        ),
+        columns=["id", *kind.columns],
+    )
+
+    conflict = ""
+    if upsert:
+        conflict = "ON CONFLICT (id) DO UPDATE SET " + ", ".join(
+            f"{name} = excluded.{name}" for name in kind.columns
+        )
+    with_ids = (
+        f"INSERT INTO {kind.table} (id, {columns}) SELECT id, {columns}"
+        f" FROM {staging} WHERE id IS NOT NULL {conflict}"
+    )
+    without_ids = (
+        f"INSERT INTO {kind.table} ({columns}) SELECT {columns}"
+        f" FROM {staging} WHERE id IS NULL"
+    )
+    for statement in (with_ids, without_ids):
+        if deck:
+            await driver.execute(
+                f"WITH inserted AS ({statement} RETURNING id)"
+                f" INSERT INTO {kind.deck_model.__tablename__}"
+                f" (deck_id, {kind.deck_column}) SELECT $1, id FROM inserted"
+                " ON CONFLICT DO NOTHING",
+                deck,
+            )
+        else:
+            await driver.execute(statement)
+        if statement is with_ids:
+            # Explicit ids do not move the sequence, new ids would clash
+            await driver.execute(
+                f"SELECT setval(pg_get_serial_sequence('{kind.table}', 'id'),"
+                f" max(id)) FROM {kind.table} HAVING max(id) IS NOT NULL"
+            )
+
+
+async def batch_import(
+    connection: AsyncConnection,
+    kind: Kind,
+    rows: Iterable[tuple[Any, ...]],
+    upsert: bool,
+    deck: str | None,
+    batch_size: int,
+) -> None:
+    iterator = iter(rows)
+    while batch := list(islice(iterator, batch_size)):
+        with_ids = [
+            {"id": card_id, **dict(zip(kind.columns, values))}
+            for card_id, *values in batch
+            if card_id is not None
+        ]
+        without_ids = [
+            dict(zip(kind.columns, values))
+            for card_id, *values in batch
+            if card_id is None
+        ]
+        for params in (with_ids, without_ids):
+            if not params:
+                continue
+            statement = sqlite.insert(kind.model)
+            if upsert:
+                statement = statement.on_conflict_do_update(
+                    index_elements=["id"],
+                    set_={name: statement.excluded[name] for name in kind.columns},
+                )
+            if not deck:
+                await connection.execute(statement, params)
+                continue
+            result = await connection.execute(
+                statement.returning(kind.model.id), params
+            )
+            await connection.execute(
+                sqlite.insert(kind.deck_model).on_conflict_do_nothing(),
+                [
+                    {"deck_id": deck, kind.deck_column: card_id}
+                    for card_id in result.scalars()
+                ],
+            )
+
+
+async def import_cards(
+    engine: AsyncEngine,
+    kind_name: str,
+    path: Path,
+    upsert: bool = False,
+    deck: str | None = None,
+    batch_size: int = 1000,
+) -> int:
+    """Imports the file in one transaction, returns the number of cards"""
+    kind = KINDS[kind_name]
+    rows = CountedRows(validate(kind, path))
+    backend = engine.dialect.name
+    if backend not in ("postgresql", "sqlite"):
+        raise CardImportError(f"Import into {backend} is not supported")
+    async with engine.begin() as connection:
+        if deck:
+            exists = await connection.scalar(
+                select(func.count()).where(CardDeck.id == deck)
+            )
+            if not exists:
+                await connection.execute(insert(CardDeck).values(id=deck, name=deck))
+        if backend == "postgresql":
+            await copy_import(connection, kind, rows, upsert, deck)
+        else:
+            await batch_import(connection, kind, rows, upsert, deck, batch_size)
+    return rows.count
+
+
+async def run(args: argparse.Namespace) -> None:
+    from cardsagainst_backend.db import create_engine
+
+    engine = create_engine()
+    started_at = time.perf_counter()
+    try:
+        count = await import_cards(
+            engine, args.kind, args.path, args.upsert, args.deck, args.batch_size
+        )
+    finally:
+        await engine.dispose()
+    elapsed = time.perf_counter() - started_at
+    print(
+        f"{args.path}: {count:,} {args.kind} in {elapsed:.2f}s,"
+        f" {count / elapsed:,.0f} rows/s"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("kind", choices=KINDS)
+    parser.add_argument("path", type=Path, help=".csv, anything else is NDJSON")
+    parser.add_argument("--upsert", action="store_true", help="Replace cards by id")
+    parser.add_argument("--deck", help="Add the cards to this deck")
+    parser.add_argument(
+        "--batch-size", type=int, default=1000, help="Rows per insert without COPY"
+    )
+    args = parser.parse_args()
+    try:
+        asyncio.run(run(args))
+    except CardImportError as error:
+        parser.exit(1, f"{error}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,37 +2,70 @@ from __future__ import annotations
 
 import asyncio
 import datetime
-import traceback
+import logging
+import time
 from asyncio import Task
+from collections.abc import MutableMapping
+from contextlib import suppress
 from enum import StrEnum
-from typing import Generic, MutableMapping, TypeVar
+from typing import Annotated, Generic, TypeVar
 from uuid import uuid4
 from weakref import WeakValueDictionary
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Header, HTTPException, Query, Response
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel, ConfigDict
 from pydantic.alias_generators import to_camel
-from sqlalchemy import select
 from starlette.websockets import WebSocket, WebSocketDisconnect
-from typing_extensions import Annotated
 
 from cardsagainst.deck import PunchlineCard, SetupCard
 from cardsagainst.exceptions import UnknownPlayerError
-from cardsagainst.lobby import CardOnTable, Gathering, Lobby, LobbyObserver, Player
+from cardsagainst.lobby import (
+    CardOnTable,
+    Gathering,
+    Lobby,
+    LobbyMonitor,
+    LobbyMonitors,
+    LobbyObserver,
+    Player,
+)
 from cardsagainst.settings import LobbySettings
+from cardsagainst_backend import metrics, profiling
+from cardsagainst_backend.accounting import LobbyStats
+from cardsagainst_backend.cases import CardTextCase
+from cardsagainst_backend.catalog import (
+    DeckTooSmallError,
+    UnknownDeckError,
+    catalogs,
+)
 from cardsagainst_backend.config import config
-from cardsagainst_backend.dao import CardsDAO, GameStatsDAO
 from cardsagainst_backend.dependencies import (
-    CardsDAODependency,
+    ChangelogDAODependency,
     GameStatsDAODependency,
-    SessionDependency,
 )
-from cardsagainst_backend.models import Changelog
+from cardsagainst_backend.heartbeat import heartbeat
+from cardsagainst_backend.logs import (
+    command_var,
+    events_logger,
+    lobby_token_var,
+    player_uuid_var,
+)
+from cardsagainst_backend.recorder import recorder
+from cardsagainst_backend.removals import pending_removals
+from cardsagainst_backend.tracing import (
+    TimerContext,
+    Trace,
+    current_trace,
+    span,
+    tracer,
+)
+
+logger = logging.getLogger(__name__)
 
 observers: list[LobbyObserver] = []
 player_by_token: MutableMapping[str, Player] = WeakValueDictionary()
 lobbies: dict[str, Lobby] = {}
-remove_player_tasks: dict[str, Task] = {}
+lobby_stats: dict[str, LobbyStats] = {}
 
 router = APIRouter()
 
@@ -115,40 +148,138 @@ class PlayerScoreChangedData(ApiModel):
     score: int
 
 
+COMMANDS = frozenset(
+    {
+        "startGame",
+        "refreshHand",
+        "makeTurn",
+        "openTableCard",
+        "pickTurnWinner",
+        "continueGame",
+        "pong",
+    }
+)
+
+
 class RemotePlayer(LobbyObserver):
-    def __init__(self, websocket: WebSocket, lobby: Lobby, player: Player) -> None:
+    def __init__(
+        self,
+        websocket: WebSocket,
+        lobby: Lobby,
+        lobby_token: str,
+        player: Player,
+        stats: LobbyStats,
+    ) -> None:
         self.lobby = lobby
+        self.stats = stats
         self.websocket = websocket
         self.player = player
-        self._queue: asyncio.Queue[Event | NullDataEvent] = asyncio.Queue()
+        self.lobby_token = lobby_token
+        # Events are serialized once on enqueue, None asks for a fresh snapshot.
+        # Frames queued by a traced command carry the trace and enqueue time.
+        self._queue: asyncio.Queue[tuple[str | None, Trace | None, float]] = (
+            asyncio.Queue()
+        )
+        self._snapshot_pending = False
+        self.queued_bytes = 0
+        self.sent_bytes = 0
+        self.send_latency = 0.0
+        self.max_send_latency = 0.0
+        self.is_slow = False
+        self.missed_beats = 0
+        self.receive_events_task: Task | None = None
+
+    def ping(self) -> None:
+        # Pings bypass the snapshot-only mode, they are tiny
+        metrics.outbound_events.inc("ping")
+        self._enqueue(NullDataEvent(id=1, type="ping").model_dump_json())
+
+    def expire(self) -> None:
+        if self.receive_events_task:
+            self.receive_events_task.cancel()
+
+    def _put(self, event: Event | NullDataEvent) -> None:
+        metrics.outbound_events.inc(event.type)
+        if self.is_slow:
+            self._request_snapshot()
+            return
+
+        with span(f"serialize {event.type}"):
+            data = event.model_dump_json(by_alias=True)
+        self._enqueue(data)
+        if self.queued_bytes > config.slow_consumer_queued_bytes:
+            self._downgrade()
+
+    def _enqueue(self, data: str | None) -> None:
+        size = len(data) if data else 0
+        self.queued_bytes += size
+        self.stats.queue_depth += 1
+        self.stats.queued_bytes += size
+        metrics.queued_events.inc()
+        metrics.queued_bytes.inc(amount=size)
+        if (trace := current_trace.get()) and trace.hold():
+            self._queue.put_nowait((data, trace, time.perf_counter()))
+        else:
+            self._queue.put_nowait((data, None, 0))
+
+    def _dequeued(self, data: str | None) -> None:
+        size = len(data) if data else 0
+        self.queued_bytes -= size
+        self.stats.queue_depth -= 1
+        self.stats.queued_bytes -= size
+        metrics.queued_events.dec()
+        metrics.queued_bytes.dec(amount=size)
+
+    def drop_queue(self) -> None:
+        while not self._queue.empty():
+            data, trace, _ = self._queue.get_nowait()
+            self._dequeued(data)
+            if trace:
+                trace.release()
+        self._snapshot_pending = False
+
+    def _request_snapshot(self) -> None:
+        if not self._snapshot_pending:
+            self._snapshot_pending = True
+            self._enqueue(None)
+
+    def _downgrade(self) -> None:
+        """Drop queued events and switch to snapshot-only updates."""
+        self.is_slow = True
+        self.drop_queue()
+        self._request_snapshot()
+        metrics.slow_consumers.inc("downgraded")
+        logger.warning(
+            "Slow consumer downgraded to snapshots: lobby=%s player=%s "
+            "send_latency=%.3f max_send_latency=%.3f sent_bytes=%s",
+            self.lobby_token,
+            self.player.uuid,
+            self.send_latency,
+            self.max_send_latency,
+            self.sent_bytes,
+        )
 
     def owner_changed(self, player: Player):
-        self._queue.put_nowait(
-            Event(id=1, type="ownerChanged", data=PlayerIdData(uuid=player.uuid))
-        )
+        self._put(Event(id=1, type="ownerChanged", data=PlayerIdData(uuid=player.uuid)))
 
     def player_joined(self, player: Player):
-        self._queue.put_nowait(
-            Event(id=1, type="playerJoined", data=PlayerData.from_player(player))
-        )
+        self._put(Event(id=1, type="playerJoined", data=PlayerData.from_player(player)))
 
     def player_left(self, player: Player):
-        self._queue.put_nowait(
-            Event(id=1, type="playerLeft", data=PlayerIdData(uuid=player.uuid))
-        )
+        self._put(Event(id=1, type="playerLeft", data=PlayerIdData(uuid=player.uuid)))
 
     def player_connected(self, player: Player):
-        self._queue.put_nowait(
+        self._put(
             Event(id=2, type="playerConnected", data=PlayerIdData(uuid=player.uuid))
         )
 
     def player_disconnected(self, player: Player):
-        self._queue.put_nowait(
+        self._put(
             Event(id=1, type="playerDisconnected", data=PlayerIdData(uuid=player.uuid))
         )
 
     def game_started(self):
-        self._queue.put_nowait(
+        self._put(
             Event(
                 id=1,
                 type="gameStarted",
@@ -166,7 +297,7 @@ class RemotePlayer(LobbyObserver):
         turn_count: int,
         card: PunchlineCard | None = None,
     ):
-        self._queue.put_nowait(
+        self._put(
             Event(
                 id=1,
                 type="turnStarted",
@@ -181,12 +312,10 @@ class RemotePlayer(LobbyObserver):
         )
 
     def player_ready(self, player: Player):
-        self._queue.put_nowait(
-            Event(id=1, type="playerReady", data=PlayerIdData(uuid=player.uuid))
-        )
+        self._put(Event(id=1, type="playerReady", data=PlayerIdData(uuid=player.uuid)))
 
     def table_card_opened(self, card_on_table: CardOnTable):
-        self._queue.put_nowait(
+        self._put(
             Event(
                 id=1,
                 type="tableCardOpened",
@@ -198,7 +327,7 @@ class RemotePlayer(LobbyObserver):
         )
 
     def turn_ended(self, winner: Player, card: PunchlineCard):
-        self._queue.put_nowait(
+        self._put(
             Event(
                 id=1,
                 type="turnEnded",
@@ -209,10 +338,10 @@ class RemotePlayer(LobbyObserver):
         )
 
     def all_players_ready(self):
-        self._queue.put_nowait(NullDataEvent(id=1, type="allPlayersReady"))
+        self._put(NullDataEvent(id=1, type="allPlayersReady"))
 
     def game_finished(self, winner: Player):
-        self._queue.put_nowait(
+        self._put(
             Event(
                 id=1,
                 type="gameFinished",
@@ -221,57 +350,48 @@ class RemotePlayer(LobbyObserver):
         )
 
     def welcome(self):
+        self._put(Event(id=1, type="welcome", data=self._lobby_state()))
+
+    def _lobby_state(self) -> LobbyState:
         selected_card = self.lobby.card_on_table_of(self.player)
-        self._queue.put_nowait(
-            Event(
-                id=1,
-                type="welcome",
-                data=LobbyState(
-                    state=GameState(type(self.lobby.state).__name__.lower()),
-                    turn_count=self.lobby.turn_count,
-                    players=[
-                        PlayerData.from_player(player)
-                        for player in self.lobby.all_players
-                    ],
-                    table=[
-                        CardOnTableData(
-                            card=PunchlineData.from_card(card_on_table.card)
-                            if card_on_table.is_open
-                            else None,
-                            is_picked=self.lobby.is_card_picked(card_on_table),
-                            author=(
-                                card_on_table.player.name
-                                if self.lobby.is_card_picked(card_on_table)
-                                else None
-                            ),
-                        )
-                        for card_on_table in self.lobby.table
-                    ],
-                    hand=[PunchlineData.from_card(item) for item in self.player.hand],
-                    setup=(
-                        SetupData.from_setup(setup)
-                        if (setup := self.lobby.setup)
-                        else None
-                    ),
-                    timeout=(
-                        self.lobby.game.settings.turn_duration
-                        if self.lobby.game
+        return LobbyState(
+            state=GameState(type(self.lobby.state).__name__.lower()),
+            turn_count=self.lobby.turn_count,
+            players=[
+                PlayerData.from_player(player) for player in self.lobby.all_players
+            ],
+            table=[
+                CardOnTableData(
+                    card=PunchlineData.from_card(card_on_table.card)
+                    if card_on_table.is_open
+                    else None,
+                    is_picked=self.lobby.is_card_picked(card_on_table),
+                    author=(
+                        card_on_table.player.name
+                        if self.lobby.is_card_picked(card_on_table)
                         else None
                     ),
-                    lead_uuid=self.lobby.lead.uuid if self.lobby.lead else None,
-                    owner_uuid=self.lobby.owner.uuid,
-                    self_uuid=self.player.uuid,
-                    selected_card=(
-                        PunchlineData.from_card(selected_card.card)
-                        if selected_card
-                        else None
-                    ),
-                ),
-            )
+                )
+                for card_on_table in self.lobby.table
+            ],
+            hand=[PunchlineData.from_card(item) for item in self.player.hand],
+            setup=(
+                SetupData.from_setup(setup) if (setup := self.lobby.setup) else None
+            ),
+            timeout=(
+                self.lobby.game.settings.turn_duration if self.lobby.game else None
+            ),
+            lead_uuid=self.lobby.lead.uuid if self.lobby.lead else None,
+            # No owner while no player is connected
+            owner_uuid=self.lobby.owner.uuid if self.lobby.owner else None,
+            self_uuid=self.player.uuid,
+            selected_card=(
+                PunchlineData.from_card(selected_card.card) if selected_card else None
+            ),
         )
 
     def hand_refreshed(self, new_hand: list[PunchlineCard]) -> None:
-        self._queue.put_nowait(
+        self._put(
             Event(
                 id=1,
                 type="handRefreshed",
@@ -282,7 +402,7 @@ class RemotePlayer(LobbyObserver):
         )
 
     def player_score_changed(self, player: Player) -> None:
-        self._queue.put_nowait(
+        self._put(
             Event(
                 id=1,
                 type="playerScoreChanged",
@@ -295,54 +415,196 @@ class RemotePlayer(LobbyObserver):
 
     async def send_events(self):
         while True:
-            event = await self._queue.get()
-            data = event.model_dump(by_alias=True)
-            print(f"Event: {data}")
-            await self.websocket.send_json(data)
+            data, trace, queued_at = await self._queue.get()
+            self._dequeued(data)
+            if data is None:
+                self._snapshot_pending = False
+                data = Event(
+                    id=1, type="welcome", data=self._lobby_state()
+                ).model_dump_json(by_alias=True)
+            events_logger.debug("Outbound event: %s", data)
+
+            started_at = time.perf_counter()
+            try:
+                await asyncio.wait_for(
+                    self.websocket.send_text(data),
+                    timeout=config.slow_consumer_send_timeout,
+                )
+            except TimeoutError:
+                metrics.slow_consumers.inc("closed")
+                logger.warning(
+                    "Slow consumer closed: lobby=%s player=%s queued_bytes=%s",
+                    self.lobby_token,
+                    self.player.uuid,
+                    self.queued_bytes,
+                )
+                self.expire()
+                return
+            finally:
+                if trace:
+                    finished_at = time.perf_counter()
+                    uuid = self.player.uuid
+                    trace.add_span(f"queue_wait {uuid}", queued_at, started_at)
+                    trace.add_span(f"send {uuid}", started_at, finished_at)
+                    trace.release()
+            self._track_send(time.perf_counter() - started_at, len(data))
+
+    def _track_send(self, latency: float, size: int) -> None:
+        metrics.send_seconds.observe(latency)
+        self.sent_bytes += size
+        self.stats.outbound_events += 1
+        self.stats.outbound_bytes += size
+        self.send_latency += (latency - self.send_latency) * 0.2
+        self.max_send_latency = max(self.max_send_latency, latency)
+
+        threshold = config.slow_consumer_send_latency
+        if not self.is_slow and self.send_latency > threshold:
+            self._downgrade()
+        elif (
+            self.is_slow
+            and not self._snapshot_pending
+            and self.send_latency < threshold / 2
+        ):
+            self.is_slow = False
+            logger.warning(
+                "Slow consumer recovered: lobby=%s player=%s send_latency=%.3f",
+                self.lobby_token,
+                self.player.uuid,
+                self.send_latency,
+            )
 
-    async def handle_event(
-        self, json_data: dict, cards_dao: CardsDAO, game_stats_dao: GameStatsDAO
-    ) -> None:
-        match json_data["type"]:
+    async def receive_events(self) -> None:
+        while True:
+            try:
+                json_data = await self.websocket.receive_json()
+                self.missed_beats = 0
+                events_logger.debug("Inbound event: %s", json_data)
+                with tracer.trace(str(json_data.get("type"))):
+                    await self.handle_event(json_data)
+            except WebSocketDisconnect:
+                return
+            except Exception as exception:
+                await self.websocket.send_json(
+                    {"type": "error", "data": exception.__class__.__name__}
+                )
+                logger.exception("Unexpected error")
+
+    async def handle_event(self, json_data: dict) -> None:
+        command = json_data["type"]
+        if command not in COMMANDS:
+            metrics.inbound_commands.inc("unknown")
+            return
+
+        metrics.inbound_commands.inc(command)
+        if command != "pong":
+            recorder.seed(self.lobby_token, "command", self.player.uuid, json_data)
+        token = command_var.set(command)
+        try:
+            with (
+                metrics.handle_event_seconds.time(command),
+                self.stats.command(),
+                profiling.profile_command(self.lobby_token),
+            ):
+                await self._handle_command(command, json_data)
+        finally:
+            command_var.reset(token)
+
+    async def _handle_command(self, command: str, json_data: dict) -> None:
+        match command:
             case "startGame":
-                start_game_event = Event[StartGameData].model_validate(json_data)
-                game_started = self.player.start_game(
-                    settings=LobbySettings(
-                        turn_duration=start_game_event.data.turn_duration,
-                        winning_score=(
-                            start_game_event.data.winning_score or config.winning_score
-                        ),
+                with span("validate"):
+                    start_game_event = Event[StartGameData].model_validate(json_data)
+                settings = LobbySettings(
+                    turn_duration=start_game_event.data.turn_duration,
+                    winning_score=(
+                        start_game_event.data.winning_score or config.winning_score
                     ),
-                    setups=await cards_dao.get_setups(deck_id="one"),
-                    punchlines=await cards_dao.get_punchlines(deck_id="one"),
                 )
-                await game_stats_dao.insert(game_started)
-                print(f"Game started! {game_started}")
+                with span("load_decks"):
+                    # Both decks from one version, even if it is swapped meanwhile
+                    catalog = catalogs.current
+                    try:
+                        setups, punchlines = catalog.deal(
+                            start_game_event.data.deck_ids,
+                            settings.hand_size * len(self.lobby.all_players),
+                        )
+                    except UnknownDeckError as error:
+                        logger.warning("Unknown deck, deck_ids=%s", error)
+                        await self.websocket.send_json(
+                            {
+                                "type": "error",
+                                "data": {
+                                    "status": 404,
+                                    "message": f"Deck not found: {error.args[0]}",
+                                },
+                            }
+                        )
+                        return
+                    except DeckTooSmallError as error:
+                        logger.warning(
+                            "Decks too small, deck_ids=%s %s",
+                            start_game_event.data.deck_ids,
+                            error,
+                        )
+                        await self.websocket.send_json(
+                            {
+                                "type": "error",
+                                "data": {
+                                    "status": 400,
+                                    "message": f"Not enough cards: {error}",
+                                },
+                            }
+                        )
+                        return
+                recorder.seed(
+                    self.lobby_token,
+                    "decks",
+                    [card.id for card in setups.cards],
+                    [card.id for card in punchlines.cards],
+                )
+                with span("transition"):
+                    game_started = self.player.start_game(
+                        settings=settings,
+                        setups=setups,
+                        punchlines=punchlines,
+                    )
+                catalogs.attach(game_started.game, catalog)
+                logger.info(
+                    "Game started, game_id=%s catalog=%s",
+                    game_started.game.id,
+                    catalog.version,
+                )
 
             case "refreshHand":
-                self.player.refresh_hand()
+                with span("transition"):
+                    self.player.refresh_hand()
             case "makeTurn":
-                make_turn_event = Event[MakeTurnData].model_validate(json_data)
+                with span("validate"):
+                    make_turn_event = Event[MakeTurnData].model_validate(json_data)
                 try:
                     assert self.lobby.game, "Game should be started to make turn"
                     card = self.lobby.game.punchlines.get_card_by_uuid(
                         int(make_turn_event.data.id)
                     )
                 except KeyError:
-                    print("unknown card")
+                    logger.warning("Unknown card, id=%s", make_turn_event.data.id)
                     return
-                self.player.make_turn(card)
+                with span("transition"):
+                    self.player.make_turn(card)
             case "openTableCard":
-                open_table_card_event = Event[OpenTableCardData].model_validate(
-                    json_data
-                )
-                self.player.open_table_card(
-                    self.lobby.table[open_table_card_event.data.index]
-                )
+                with span("validate"):
+                    open_table_card_event = Event[OpenTableCardData].model_validate(
+                        json_data
+                    )
+                with span("transition"):
+                    self.player.open_table_card(
+                        self.lobby.table[open_table_card_event.data.index]
+                    )
             case "pickTurnWinner":
-                pick_turn_winner_event = Event[PickTurnWinnerData].model_validate(
-                    json_data
-                )
+                with span("validate"):
+                    pick_turn_winner_event = Event[PickTurnWinnerData].model_validate(
+                        json_data
+                    )
                 try:
                     assert self.lobby.game, "Game should be started to pick turn winner"
                     card = self.lobby.game.punchlines.get_card_by_uuid(
@@ -350,9 +612,13 @@ class RemotePlayer(LobbyObserver):
                     )
                 except KeyError:
                     return
-                self.player.pick_turn_winner(card)
+                with span("transition"):
+                    self.player.pick_turn_winner(card)
             case "continueGame":
-                self.player.continue_game()
+                with span("transition"):
+                    self.player.continue_game()
+            case "pong":
+                pass
 
 
 class ConnectRequest(BaseModel):
@@ -369,15 +635,6 @@ class PlayerState(StrEnum):
     PENDING = "pending"
 
 
-class CardTextCase(StrEnum):
-    NOM = "nom"
-    GEN = "gen"
-    DAT = "dat"
-    ACC = "acc"
-    INST = "inst"
-    PREP = "prep"
-
-
 class GameState(StrEnum):
     GATHERING = "gathering"
     TURNS = "turns"
@@ -430,7 +687,8 @@ class NullDataEvent(ApiModel):
 class StartGameData(ApiModel):
     turn_duration: int | None = None
     winning_score: int | None = None
-    # deck_id: str | None
+    # Every card of the catalog when empty
+    deck_ids: list[str] = []
 
 
 class MakeTurnData(ApiModel):
@@ -461,7 +719,7 @@ class LobbyState(ApiModel):
     setup: SetupData | None
     timeout: int | None
     lead_uuid: str | None
-    owner_uuid: str
+    owner_uuid: str | None
     self_uuid: str | None
     turn_count: int | None
     selected_card: PunchlineData | None = None
@@ -478,6 +736,7 @@ async def connect(
     *,
     lobby_token: Annotated[str | None, Query(alias="lobbyToken")] = None,
     connect_request: ConnectRequest,
+    game_stats_dao: GameStatsDAODependency,
 ) -> ConnectResponse:
     player = Player(
         name=connect_request.name,
@@ -494,16 +753,26 @@ async def connect(
             owner=player,
             state=Gathering(),
         )
+        stats = LobbyStats()
+        metrics.lobbies.inc(type(lobby.state).__name__)
         lobby_token = uuid4().hex[:8]
+        monitors: list[LobbyMonitor] = [
+            TimerContext(),
+            stats,
+            game_stats_dao.monitor(),
+        ]
+        if recorder.enabled:
+            monitors.append(recorder.monitor(lobby_token))
+        lobby.monitor = LobbyMonitors(*monitors)
         lobbies[lobby_token] = lobby
-        print(f"Lobby created. lobbies={lobbies}")
+        lobby_stats[lobby_token] = stats
+        logger.info("Lobby created, lobby_token=%s", lobby_token)
 
+    recorder.record(lobby_token, "join", player.uuid, player.name, player.emoji)
     lobby.add_player(player)
 
     player_by_token[player.token] = player
-    remove_player_tasks[player.token] = asyncio.create_task(
-        run_remove_player(lobby, player, lobby_token, player.token)
-    )
+    schedule_remove_player(lobby, player, lobby_token)
     return ConnectResponse(
         host=config.ws_url,
         player_token=player.token,
@@ -516,10 +785,8 @@ async def websocket_endpoint(
     websocket: WebSocket,
     player_token: Annotated[str, Query(alias="playerToken")],
     lobby_token: Annotated[str, Query(alias="lobbyToken")],
-    cards_dao: CardsDAODependency,
-    game_stats_dao: GameStatsDAODependency,
 ):
-    print("accepted")
+    lobby_token_var.set(lobby_token)
     await websocket.accept()
     try:
         lobby = lobbies[lobby_token]
@@ -532,7 +799,18 @@ async def websocket_endpoint(
 
     try:
         player = player_by_token[player_token]
-        remote_player = RemotePlayer(websocket=websocket, lobby=lobby, player=player)
+        player_uuid_var.set(player.uuid)
+        if isinstance(player.observer, RemotePlayer):
+            # Reconnect means the previous connection is dead
+            player.observer.expire()
+        remote_player = RemotePlayer(
+            websocket=websocket,
+            lobby=lobby,
+            lobby_token=lobby_token,
+            player=player,
+            stats=lobby_stats[lobby_token],
+        )
+        recorder.seed(lobby_token, "connect", player.uuid)
         player.connect(remote_player)
     except (KeyError, UnknownPlayerError):
         await websocket.send_json(
@@ -541,82 +819,82 @@ async def websocket_endpoint(
         await websocket.close()
         return
 
-    if player_token in remove_player_tasks:
-        task = remove_player_tasks.pop(player_token)
-        task.cancel()
+    pending_removals.cancel(player_token)
+    metrics.connected_players.inc()
+    remote_player.stats.connected += 1
 
     send_events_task = asyncio.create_task(remote_player.send_events())
-
-    while True:
-        try:
-            json_data = await websocket.receive_json()
-            print(f"Received event: {json_data}")
-            await remote_player.handle_event(
-                json_data, cards_dao=cards_dao, game_stats_dao=game_stats_dao
-            )
-        except WebSocketDisconnect:
-            send_events_task.cancel()
-            player.disconnect()
-            print("before remove")
-            remove_player_tasks[player_token] = asyncio.create_task(
-                run_remove_player(lobby, player, lobby_token, player_token)
-            )
-            break
-        except Exception as exception:
-            await websocket.send_json(
-                {"type": "error", "data": exception.__class__.__name__}
-            )
-            print(f"Unexpected error: {traceback.format_exc()}")
+    receive_events_task = asyncio.create_task(remote_player.receive_events())
+    remote_player.receive_events_task = receive_events_task
+    heartbeat.watch(remote_player)
+    try:
+        await asyncio.wait([receive_events_task])
+    finally:
+        heartbeat.unwatch(remote_player)
+        send_events_task.cancel()
+        receive_events_task.cancel()
+        remote_player.drop_queue()
+        metrics.connected_players.dec()
+        remote_player.stats.connected -= 1
+
+    # Player may have already reconnected with another websocket
+    if player.observer is remote_player:
+        recorder.seed(lobby_token, "disconnect", player.uuid)
+        player.disconnect()
+        schedule_remove_player(lobby, player, lobby_token)
+
+    if receive_events_task.cancelled():
+        with suppress(RuntimeError):
+            await websocket.close()
+
+
+def schedule_remove_player(lobby: Lobby, player: Player, lobby_token: str) -> None:
+    logger.info(
+        "Player removal scheduled, lobby_token=%s player_uuid=%s",
+        lobby_token,
+        player.uuid,
+    )
+    pending_removals.schedule(
+        player.token, lambda: remove_player(lobby, player, lobby_token)
+    )
 
 
-async def run_remove_player(lobby, player, lobby_token, player_token):
-    print(f"Player removal scheduled, player_token={player_token}")
-    await asyncio.sleep(config.player_removal_delay)
+def remove_player(lobby: Lobby, player: Player, lobby_token: str) -> None:
+    recorder.seed(lobby_token, "remove", player.uuid)
     lobby.remove_player(player)
     if not lobby.all_players:
         del lobbies[lobby_token]
-        print(f"Lobby deleted. lobbies={lobbies}")
+        lobby_stats.pop(lobby_token).close(lobby.state)
+        logger.info("Lobby deleted, lobby_token=%s", lobby_token)
 
 
-@router.get("/changelog")
+@router.get("/changelog", response_model=ChangelogResponse)
 async def changelog(
-    async_session: SessionDependency,
+    changelog_dao: ChangelogDAODependency,
     version: Annotated[str | None, Query(alias="version")] = None,
-):
-    async with async_session() as session:
-        version_query = select(Changelog.version).order_by(Changelog.id.desc()).limit(1)
-        result = await session.execute(version_query)
-        current_version = result.first()[0]
-
-    if not version:
-        return ChangelogResponse(
-            changelog=[],
-            current_version=current_version,
-        )
-
-    subquery_clause = (
-        select(Changelog.id)
-        .where(Changelog.version == version)
-        .order_by(Changelog.id.desc())
-        .limit(1)
-    )
-    subquery = subquery_clause.subquery()
-
-    query = select(Changelog.version, Changelog.text, Changelog.date).where(
-        Changelog.id > subquery.c.id
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> Response:
+    records = await changelog_dao.get_changelog(version) if version else []
+    headers = {"ETag": changelog_dao.etag, "Cache-Control": "no-cache"}
+    if if_none_match and changelog_dao.etag in if_none_match:
+        return Response(status_code=304, headers=headers)
+
+    return Response(
+        ChangelogResponse(
+            changelog=[
+                ChangelogData(version=record_version, text=text, date=date)
+                for record_version, text, date in records
+            ],
+            current_version=changelog_dao.current_version,
+        ).model_dump_json(by_alias=True),
+        media_type="application/json",
+        headers=headers,
     )
 
-    async with async_session() as session:
-        result = await session.execute(query)
-    records = result.all()
 
-    return ChangelogResponse(
-        changelog=[
-            ChangelogData(version=record[0], text=record[1], date=record[2])
-            for record in records
-        ],
-        current_version=current_version,
-    )
+@router.get("/metrics")
+def metrics_endpoint() -> PlainTextResponse:
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 
 @router.get("/")
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import json
+import logging
+import queue
+import random
+import sys
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+
+from cardsagainst_backend.config import config
+
+lobby_token_var: ContextVar[str | None] = ContextVar("lobby_token", default=None)
+player_uuid_var: ContextVar[str | None] = ContextVar("player_uuid", default=None)
+command_var: ContextVar[str | None] = ContextVar("command", default=None)
+# DAO method running the current query, for the slow query log
+dao_call_var: ContextVar[str | None] = ContextVar("dao_call", default=None)
+
+# Per-event debug logs, sampled by `log_event_sample_rate`
+events_logger = logging.getLogger("cardsagainst_backend.events")
+# Finished traces, written to `trace_file` only
+spans_logger = logging.getLogger("cardsagainst_backend.spans")
+
+
+class ContextFilter(logging.Filter):
+    """Stamps records with the lobby and player of the current task."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.lobby_token = lobby_token_var.get()
+        record.player_uuid = player_uuid_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    def __init__(self, rate: float) -> None:
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno > logging.DEBUG or random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "lobby_token": getattr(record, "lobby_token", None),
+            "player_uuid": getattr(record, "player_uuid", None),
+        }
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False)
+
+
+def setup_logging() -> QueueListener:
+    """Route all records through a queue to a writer thread.
+
+    The event loop only formats the message and puts the record on the
+    queue, stdout is written by the listener thread.
+    """
+    log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(config.log_level)
+
+    events_logger.filters = [SamplingFilter(config.log_event_sample_rate)]
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter())
+    stream_handler.addFilter(lambda record: record.name != spans_logger.name)
+    handlers: list[logging.Handler] = [stream_handler]
+
+    if config.trace_file:
+        spans_logger.setLevel(logging.INFO)
+        file_handler = logging.FileHandler(config.trace_file)
+        file_handler.addFilter(logging.Filter(spans_logger.name))
+        handlers.append(file_handler)
+
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
@@ -3,6 +3,7 @@ from __future__ import annotations
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from cardsagainst_backend.admin import router as admin_router
 from cardsagainst_backend.dependencies import (
     lifespan,
 )
@@ -19,3 +20,4 @@ app.add_middleware(
 )
 
 app.include_router(router)
+app.include_router(admin_router)
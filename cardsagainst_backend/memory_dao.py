@@ -0,0 +1,125 @@
+"""DAOs without a database, for laptops, CI, load tests and benchmarks."""
+
+from __future__ import annotations
+
+import datetime
+from itertools import islice
+from typing import Any
+
+from cardsagainst.deck import Deck, PunchlineCard, SetupCard
+from cardsagainst_backend.dao import (
+    CardsDAO,
+    ChangelogDAO,
+    ChangelogRecord,
+    DeckCards,
+    ExportFilters,
+    GameStatsDAO,
+)
+
+
+class MemoryCardsDAO(CardsDAO):
+    """Generated cards, loaded into the catalog like the database ones.
+
+    Cards are dealt round robin into `decks_count` decks, "deck-0" and on.
+    """
+
+    def __init__(
+        self, setups_count: int, punchlines_count: int, decks_count: int = 0
+    ) -> None:
+        self.setups = [
+            SetupCard(
+                id=i,
+                text=f"Setup {i} ____",
+                case="nom",
+                starts_with_punchline=False,
+            )
+            for i in range(setups_count)
+        ]
+        self.punchlines = [
+            PunchlineCard(
+                id=i,
+                text=[(f"punchline {i}", ["nom", "gen", "dat", "acc", "inst", "prep"])],
+            )
+            for i in range(punchlines_count)
+        ]
+        self.decks: dict[str, DeckCards] = {
+            f"deck-{deck}": (
+                list(range(deck, setups_count, decks_count)),
+                list(range(deck, punchlines_count, decks_count)),
+            )
+            for deck in range(decks_count)
+        }
+
+    async def _get_setups(self, deck_id: str | None) -> Deck[SetupCard]:
+        if deck_id is None:
+            return Deck(cards=list(self.setups))
+        setup_ids = self.decks.get(deck_id, ([], []))[0]
+        return Deck(cards=[self.setups[i] for i in setup_ids])
+
+    async def _get_punchlines(self, deck_id: str | None) -> Deck[PunchlineCard]:
+        if deck_id is None:
+            return Deck(cards=list(self.punchlines))
+        punchline_ids = self.decks.get(deck_id, ([], []))[1]
+        return Deck(cards=[self.punchlines[i] for i in punchline_ids])
+
+    async def _get_decks(self) -> dict[str, DeckCards]:
+        return self.decks
+
+
+class MemoryGameStatsDAO(GameStatsDAO):
+    def __init__(self) -> None:
+        super().__init__(async_session=None)  # type: ignore[arg-type]
+        self.rows: list[dict[str, Any]] = []
+
+    @property
+    def games_started(self) -> int:
+        return sum(row["kind"] == "started" for row in self.rows)
+
+    async def _insert(self, rows: list[dict[str, Any]]) -> None:
+        self.rows.extend(rows)
+
+    async def _get_page(
+        self, events: bool, filters: ExportFilters, after_id: int, size: int
+    ) -> list[dict[str, Any]]:
+        # Ids are positions in `rows`, stats rows are the started events
+        page: list[dict[str, Any]] = []
+        for row_id, row in enumerate(islice(self.rows, after_id, None), after_id + 1):
+            created_at = datetime.datetime.fromtimestamp(
+                row["created_at"], datetime.UTC
+            )
+            if events:
+                record = {"id": row_id, **row, "created_at": created_at}
+            elif row["kind"] == "started":
+                record = {
+                    "id": row_id,
+                    "winning_score": row["winning_score"],
+                    "turn_duration": row["turn_duration"],
+                }
+            else:
+                continue
+            if (
+                (filters.since and created_at < filters.since)
+                or (filters.until and created_at >= filters.until)
+                or any(
+                    (value := getattr(filters, name)) is not None
+                    and record.get(name) != value
+                    for name in ("kind", "winning_score", "turn_duration")
+                )
+            ):
+                continue
+            page.append(record)
+            if len(page) == size:
+                break
+        return page
+
+
+class MemoryChangelogDAO(ChangelogDAO):
+    def __init__(self, records: list[ChangelogRecord] | None = None) -> None:
+        super().__init__(async_session=None)  # type: ignore[arg-type]
+        self.records = records or []
+
+    async def _get_last_id(self) -> int:
+        return len(self.records)
+
+    async def _get_records(self) -> list[ChangelogRecord]:
+        return list(self.records)
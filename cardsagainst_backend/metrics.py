@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import time
+from bisect import bisect_left
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: tuple[str, ...] = ()
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        registry.append(self)
+
+    def _labels(self, labels: tuple[str, ...], extra: str = "") -> str:
+        pairs = [
+            f'{name}="{_escape(value)}"'
+            for name, value in zip(self.labelnames, labels, strict=True)
+        ]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        return "\n".join(
+            [
+                f"# HELP {self.name} {self.documentation}",
+                f"# TYPE {self.name} {self.type}",
+                *self.samples(),
+            ]
+        )
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: tuple[str, ...] = ()
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def get(self, *labels: str) -> float:
+        return self.values.get(labels, 0)
+
+    def samples(self) -> Iterator[str]:
+        for labels, value in self.values.items():
+            yield f"{self.name}{self._labels(labels)} {value}"
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels: str) -> None:
+        self.values[labels] = value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = buckets
+        self.values: dict[tuple[str, ...], HistogramValue] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        if (histogram_value := self.values.get(labels)) is None:
+            histogram_value = self.values[labels] = HistogramValue(len(self.buckets))
+        histogram_value.counts[bisect_left(self.buckets, value)] += 1
+        histogram_value.total += value
+
+    @contextmanager
+    def time(self, *labels: str) -> Iterator[None]:
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started_at, *labels)
+
+    def samples(self) -> Iterator[str]:
+        for labels, histogram_value in self.values.items():
+            cumulative = 0
+            bounds = (*self.buckets, "+Inf")
+            for bound, count in zip(bounds, histogram_value.counts, strict=True):
+                cumulative += count
+                le = self._labels(labels, f'le="{bound}"')
+                yield f"{self.name}_bucket{le} {cumulative}"
+            yield f"{self.name}_sum{self._labels(labels)} {histogram_value.total}"
+            yield f"{self.name}_count{self._labels(labels)} {cumulative}"
+
+
+class HistogramValue:
+    __slots__ = ("counts", "total")
+
+    def __init__(self, buckets_count: int) -> None:
+        # The last count is the +Inf bucket
+        self.counts = [0] * (buckets_count + 1)
+        self.total = 0.0
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def render() -> str:
+    return "\n".join(metric.render() for metric in registry) + "\n"
+
+
+registry: list[Metric] = []
+
+lobbies = Gauge("cardsagainst_lobbies", "Lobbies by state", ("state",))
+connected_players = Gauge(
+    "cardsagainst_connected_players", "Players with an open websocket"
+)
+queued_events = Gauge(
+    "cardsagainst_queued_events", "Outbound events waiting to be sent"
+)
+queued_bytes = Gauge(
+    "cardsagainst_queued_bytes", "Serialized size of outbound events waiting"
+)
+inbound_commands = Counter(
+    "cardsagainst_inbound_commands_total", "Received commands", ("type",)
+)
+outbound_events = Counter(
+    "cardsagainst_outbound_events_total", "Queued outbound events", ("type",)
+)
+handle_event_seconds = Histogram(
+    "cardsagainst_handle_event_seconds", "Command handling latency", ("type",)
+)
+dao_seconds = Histogram("cardsagainst_dao_seconds", "DAO call latency", ("call",))
+send_seconds = Histogram("cardsagainst_send_seconds", "Websocket send latency")
+slow_callbacks = Counter(
+    "cardsagainst_slow_callbacks_total",
+    "Event loop steps longer than slow_callback_threshold",
+    ("command",),
+)
+slow_callback_seconds = Histogram(
+    "cardsagainst_slow_callback_seconds",
+    "Duration of slow event loop steps",
+    ("command",),
+)
+slow_consumers = Counter(
+    "cardsagainst_slow_consumers_total",
+    "Websockets downgraded to snapshots or closed as slow",
+    ("action",),
+)
+game_stats_rows = Counter(
+    "cardsagainst_game_stats_rows_total",
+    "Game stats rows inserted, spilled to file or dropped",
+    ("result",),
+)
+db_pool_checkout_seconds = Histogram(
+    "cardsagainst_db_pool_checkout_seconds", "Wait for a pooled connection"
+)
+db_pool_in_use = Gauge("cardsagainst_db_pool_in_use", "Pooled connections checked out")
+db_pool_waiting = Gauge(
+    "cardsagainst_db_pool_waiting", "Requests waiting for a pooled connection"
+)
+slow_queries = Counter(
+    "cardsagainst_slow_queries_total",
+    "Queries longer than db.slow_query_threshold",
+    ("dao",),
+)
+catalog_versions = Gauge(
+    "cardsagainst_catalog_versions", "Catalog versions still held by running games"
+)
@@ -0,0 +1,170 @@
+"""Versioned schema migrations, applied on startup.
+
+    python -m cardsagainst_backend.migrations
+
+`schema_version` holds the number of migrations applied, so a current
+schema costs one query on startup and no DDL at all. Migrations are plain
+DDL, frozen once released: a model change needs a new migration, not an
+edit. The first one is the schema databases were created with before this
+runner, so it and every later one skip what already exists.
+
+Column types that differ between Postgres and SQLite are `{placeholders}`
+filled from `TYPES`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+
+from sqlalchemy import delete, insert, select, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from cardsagainst_backend.models import SchemaVersion
+
+logger = logging.getLogger(__name__)
+
+TYPES = {
+    "postgresql": {
+        "serial": "SERIAL",
+        "json": "JSONB",
+        "timestamp": "TIMESTAMP WITH TIME ZONE",
+    },
+    "sqlite": {"serial": "INTEGER", "json": "JSON", "timestamp": "DATETIME"},
+}
+
+SCHEMA_VERSION = (
+    "CREATE TABLE IF NOT EXISTS schema_version"
+    " (version INTEGER NOT NULL, PRIMARY KEY (version))"
+)
+
+MIGRATIONS: list[list[str]] = [
+    # Cards, decks, changelog and game stats
+    [
+        """CREATE TABLE IF NOT EXISTS changelog (
+            id {serial} NOT NULL,
+            version TEXT NOT NULL,
+            date DATE NOT NULL,
+            text TEXT NOT NULL,
+            PRIMARY KEY (id)
+        )""",
+        """CREATE TABLE IF NOT EXISTS decks (
+            id TEXT NOT NULL,
+            name TEXT NOT NULL,
+            PRIMARY KEY (id)
+        )""",
+        """CREATE TABLE IF NOT EXISTS game_events (
+            id {serial} NOT NULL,
+            game_id TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            created_at {timestamp} NOT NULL,
+            players INTEGER NOT NULL,
+            turn_count INTEGER NOT NULL,
+            winning_score INTEGER,
+            turn_duration INTEGER,
+            winner_score INTEGER,
+            duration FLOAT,
+            PRIMARY KEY (id)
+        )""",
+        """CREATE TABLE IF NOT EXISTS punchlines (
+            id {serial} NOT NULL,
+            variants {json} NOT NULL,
+            PRIMARY KEY (id)
+        )""",
+        """CREATE TABLE IF NOT EXISTS setups (
+            id {serial} NOT NULL,
+            variant TEXT NOT NULL,
+            starts_with_punchline BOOLEAN NOT NULL,
+            text TEXT NOT NULL,
+            PRIMARY KEY (id)
+        )""",
+        """CREATE TABLE IF NOT EXISTS stats (
+            id {serial} NOT NULL,
+            winning_score INTEGER NOT NULL,
+            turn_duration INTEGER,
+            PRIMARY KEY (id)
+        )""",
+        """CREATE TABLE IF NOT EXISTS deck_punchlines (
+            deck_id TEXT NOT NULL,
+            punchline_id INTEGER NOT NULL,
+            PRIMARY KEY (deck_id, punchline_id),
+            FOREIGN KEY (deck_id) REFERENCES decks (id),
+            FOREIGN KEY (punchline_id) REFERENCES punchlines (id)
+        )""",
+        """CREATE TABLE IF NOT EXISTS deck_setups (
+            deck_id TEXT NOT NULL,
+            setup_id INTEGER NOT NULL,
+            PRIMARY KEY (deck_id, setup_id),
+            FOREIGN KEY (deck_id) REFERENCES decks (id),
+            FOREIGN KEY (setup_id) REFERENCES setups (id)
+        )""",
+    ],
+    # Changelog versions, a game's events and the decks of a card
+    [
+        """CREATE INDEX IF NOT EXISTS ix_changelog_version
+            ON changelog (version)""",
+        """CREATE INDEX IF NOT EXISTS ix_game_events_game_id
+            ON game_events (game_id)""",
+        """CREATE INDEX IF NOT EXISTS ix_deck_setups_setup_id
+            ON deck_setups (setup_id)""",
+        """CREATE INDEX IF NOT EXISTS ix_deck_punchlines_punchline_id
+            ON deck_punchlines (punchline_id)""",
+    ],
+    # Date ranges of the stats export
+    [
+        """CREATE INDEX IF NOT EXISTS ix_game_events_created_at
+            ON game_events (created_at)""",
+    ],
+]
+
+
+async def get_version(engine: AsyncEngine) -> int:
+    async with engine.connect() as conn:
+        try:
+            return await conn.scalar(select(SchemaVersion.version)) or 0
+        except DBAPIError:
+            # No table before the first migration
+            return 0
+
+
+async def migrate(engine: AsyncEngine) -> int:
+    """Applies pending migrations, returns how many"""
+    if await get_version(engine) >= len(MIGRATIONS):
+        return 0
+    if engine.dialect.name not in TYPES:
+        raise RuntimeError(f"Migrations do not support {engine.dialect.name}")
+
+    async with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            # Workers starting together wait here for the first one
+            await conn.execute(
+                text("SELECT pg_advisory_xact_lock(hashtext('migrate'))")
+            )
+        await conn.exec_driver_sql(SCHEMA_VERSION)
+        version = await conn.scalar(select(SchemaVersion.version)) or 0
+        pending = MIGRATIONS[version:]
+        if not pending:
+            return 0
+        logger.warning("Migrating schema, from=%s to=%s", version, len(MIGRATIONS))
+        types = TYPES[conn.dialect.name]
+        for statements in pending:
+            for statement in statements:
+                await conn.exec_driver_sql(statement.format(**types))
+        await conn.execute(delete(SchemaVersion))
+        await conn.execute(insert(SchemaVersion).values(version=len(MIGRATIONS)))
+    return len(pending)
+
+
+async def main() -> None:
+    from cardsagainst_backend.db import create_engine
+
+    engine = create_engine()
+    applied = await migrate(engine)
+    version = await get_version(engine)
+    await engine.dispose()
+    print(f"Schema version {version}, {applied} migrations applied")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
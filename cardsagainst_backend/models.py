@@ -1,6 +1,6 @@
 import datetime
 
-from sqlalchemy import Text, Boolean, Date
+from sqlalchemy import JSON, Boolean, Date, DateTime, ForeignKey, Text
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.asyncio import AsyncAttrs
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
@@ -17,7 +17,9 @@ class Punchline(Base):
     __tablename__ = "punchlines"
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    variants: Mapped[list[tuple[str, list[str]]]] = mapped_column(JSONB, nullable=False)
+    variants: Mapped[list[tuple[str, list[str]]]] = mapped_column(
+        JSON().with_variant(JSONB(), "postgresql"), nullable=False
+    )
 
 
 class Setup(Base):
@@ -29,11 +31,36 @@ class Setup(Base):
     text: Mapped[str] = mapped_column(Text, nullable=False)
 
 
+class CardDeck(Base):
+    __tablename__ = "decks"
+
+    id: Mapped[str] = mapped_column(Text, primary_key=True)
+    name: Mapped[str] = mapped_column(Text, nullable=False)
+
+
+class DeckSetup(Base):
+    __tablename__ = "deck_setups"
+
+    deck_id: Mapped[str] = mapped_column(ForeignKey("decks.id"), primary_key=True)
+    setup_id: Mapped[int] = mapped_column(
+        ForeignKey("setups.id"), primary_key=True, index=True
+    )
+
+
+class DeckPunchline(Base):
+    __tablename__ = "deck_punchlines"
+
+    deck_id: Mapped[str] = mapped_column(ForeignKey("decks.id"), primary_key=True)
+    punchline_id: Mapped[int] = mapped_column(
+        ForeignKey("punchlines.id"), primary_key=True, index=True
+    )
+
+
 class Changelog(Base):
     __tablename__ = "changelog"
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    version: Mapped[str] = mapped_column(Text, nullable=False)
+    version: Mapped[str] = mapped_column(Text, nullable=False, index=True)
     date: Mapped[datetime.date] = mapped_column(Date, nullable=False)
     text: Mapped[str] = mapped_column(Text, nullable=False)
 
@@ -44,3 +71,26 @@ class GameStats(Base):
     id: Mapped[int] = mapped_column(primary_key=True)
     winning_score: Mapped[int] = mapped_column(nullable=False)
     turn_duration: Mapped[int] = mapped_column(nullable=True)
+
+
+class GameEvent(Base):
+    __tablename__ = "game_events"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    game_id: Mapped[str] = mapped_column(Text, nullable=False, index=True)
+    kind: Mapped[str] = mapped_column(Text, nullable=False)
+    created_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, index=True
+    )
+    players: Mapped[int] = mapped_column(nullable=False)
+    turn_count: Mapped[int] = mapped_column(nullable=False)
+    winning_score: Mapped[int] = mapped_column(nullable=True)
+    turn_duration: Mapped[int] = mapped_column(nullable=True)
+    winner_score: Mapped[int] = mapped_column(nullable=True)
+    duration: Mapped[float] = mapped_column(nullable=True)
+
+
+class SchemaVersion(Base):
+    __tablename__ = "schema_version"
+
+    version: Mapped[int] = mapped_column(primary_key=True)
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import asyncio
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
+from types import FrameType
+
+
+class ProfileSession:
+    """One profiling run over the live event loop.
+
+    Without `lobby_token` everything running on the loop is profiled.
+    With it only commands of that lobby are, see `profile_command`.
+    """
+
+    def __init__(self, lobby_token: str | None) -> None:
+        self.lobby_token = lobby_token
+        self._commands = 0
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+    def command_started(self) -> None:
+        self._commands += 1
+
+    def command_finished(self) -> None:
+        self._commands -= 1
+
+    def has_samples(self) -> bool:
+        raise NotImplementedError
+
+    def result(self) -> str:
+        raise NotImplementedError
+
+
+class CProfileSession(ProfileSession):
+    def __init__(self, lobby_token: str | None, sort: str, limit: int) -> None:
+        super().__init__(lobby_token)
+        self.profile = cProfile.Profile()
+        self.sort = sort
+        self.limit = limit
+
+    def start(self) -> None:
+        if not self.lobby_token:
+            self.profile.enable()
+
+    def stop(self) -> None:
+        if not self.lobby_token:
+            self.profile.disable()
+
+    def command_started(self) -> None:
+        if not self._commands:
+            self.profile.enable()
+        super().command_started()
+
+    def command_finished(self) -> None:
+        super().command_finished()
+        if not self._commands:
+            self.profile.disable()
+
+    def has_samples(self) -> bool:
+        # Stats of a profile that never ran cannot be built
+        return bool(self.profile.getstats())
+
+    def result(self) -> str:
+        if not self.has_samples():
+            return ""
+        stream = io.StringIO()
+        stats = pstats.Stats(self.profile, stream=stream)
+        stats.sort_stats(self.sort).print_stats(self.limit)
+        return stream.getvalue()
+
+    def dump(self) -> bytes:
+        """Marshalled stats, loadable with `pstats.Stats` or snakeviz"""
+        if not self.has_samples():
+            return marshal.dumps({})
+        return marshal.dumps(pstats.Stats(self.profile).stats)  # type: ignore[attr-defined]
+
+
+class SamplingSession(ProfileSession):
+    """Samples the event loop thread stack from a side thread.
+
+    The result is in the collapsed-stack format of flamegraph.pl.
+    """
+
+    def __init__(self, lobby_token: str | None, interval: float) -> None:
+        super().__init__(lobby_token)
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self._loop_thread_id = threading.get_ident()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            if self.lobby_token and not self._commands:
+                continue
+            if frame := sys._current_frames().get(self._loop_thread_id):
+                self.stacks[collapse_stack(frame)] += 1
+
+    def has_samples(self) -> bool:
+        return bool(self.stacks)
+
+    def result(self) -> str:
+        return "".join(
+            f"{stack} {count}\n" for stack, count in self.stacks.most_common()
+        )
+
+
+def collapse_stack(frame: FrameType | None) -> str:
+    names = []
+    while frame:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_qualname}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+active_session: ProfileSession | None = None
+
+
+async def run(session: ProfileSession, seconds: float) -> None:
+    global active_session
+    active_session = session
+    session.start()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        session.stop()
+        active_session = None
+
+
+@contextmanager
+def profile_command(lobby_token: str) -> Iterator[None]:
+    session = active_session
+    if not session or session.lobby_token != lobby_token:
+        yield
+        return
+
+    session.command_started()
+    try:
+        yield
+    finally:
+        session.command_finished()
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import secrets
+import threading
+import time
+from typing import IO, Any
+
+from cardsagainst.lobby import LobbyMonitor
+from cardsagainst_backend.config import config
+
+
+class Recorder:
+    """Append-only log of everything that drives lobbies, for replays.
+
+    Every line is a JSON array `[time, lobby_token, kind, *fields]`. Players
+    are referred to by uuid, tokens are never written. Entries that may
+    change the lobby state carry a seed for the global `random`, seeded
+    right before the transition, so a replay deals and shuffles the same.
+    """
+
+    def __init__(self, path: str, flush_interval: float) -> None:
+        self.path = path
+        self.flush_interval = flush_interval
+        self._buffer: list[str] = []
+        self._file: IO[str] | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def record(self, lobby_token: str, kind: str, *fields: Any) -> None:
+        if not self.path:
+            return
+        self._buffer.append(
+            json.dumps(
+                [round(time.time(), 4), lobby_token, kind, *fields],
+                separators=(",", ":"),
+                ensure_ascii=False,
+            )
+        )
+
+    def seed(self, lobby_token: str, kind: str, *fields: Any) -> None:
+        if not self.path:
+            return
+        seed = secrets.randbits(32)
+        random.seed(seed)
+        self.record(lobby_token, kind, seed, *fields)
+
+    def monitor(self, lobby_token: str) -> RecordingMonitor:
+        return RecordingMonitor(self, lobby_token)
+
+    def flush(self) -> None:
+        lines, self._buffer = self._buffer, []
+        self._write(lines)
+
+    def _write(self, lines: list[str]) -> None:
+        if not lines:
+            return
+        # A cancelled run() may still be writing in its thread
+        with self._lock:
+            if not self._file:
+                self._file = open(self.path, "a", encoding="utf-8")  # noqa: SIM115
+            self._file.write("\n".join(lines) + "\n")
+            self._file.flush()
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            # The loop only swaps the buffer, a slow disk stalls the thread
+            lines, self._buffer = self._buffer, []
+            await asyncio.to_thread(self._write, lines)
+
+
+class RecordingMonitor(LobbyMonitor):
+    def __init__(self, recorder: Recorder, lobby_token: str) -> None:
+        self.recorder = recorder
+        self.lobby_token = lobby_token
+
+    def timer_fired(self, name: str) -> None:
+        self.recorder.seed(self.lobby_token, "timer", name)
+
+
+recorder = Recorder(
+    path=config.record_file,
+    flush_interval=config.record_flush_interval,
+)
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import logging
+from collections.abc import Callable
+from contextlib import suppress
+from dataclasses import dataclass, field
+
+from cardsagainst_backend.config import config
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(order=True)
+class PendingRemoval:
+    deadline: float
+    seq: int
+    token: str = field(compare=False)
+    callback: Callable[[], None] | None = field(compare=False)
+
+
+class PendingRemovals:
+    """Delayed player removals kept in one deadline heap.
+
+    A single reaper coroutine sleeps until the earliest deadline and runs
+    every removal that is due in one batch. Cancelling only forgets the
+    token, the stale heap entry is skipped when it comes up.
+    """
+
+    def __init__(self, delay: float) -> None:
+        self.delay = delay
+        self._heap: list[PendingRemoval] = []
+        self._pending: dict[str, PendingRemoval] = {}
+        self._seq = 0
+        # Created by run(), inside the loop it wakes up
+        self._wakeup: asyncio.Event | None = None
+
+    def __contains__(self, token: str) -> bool:
+        return token in self._pending
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def schedule(self, token: str, callback: Callable[[], None]) -> None:
+        self.cancel(token)
+        self._seq += 1
+        removal = PendingRemoval(
+            deadline=asyncio.get_running_loop().time() + self.delay,
+            seq=self._seq,
+            token=token,
+            callback=callback,
+        )
+        self._pending[token] = removal
+        heapq.heappush(self._heap, removal)
+        if self._heap[0] is removal and self._wakeup:
+            self._wakeup.set()
+
+    def cancel(self, token: str) -> None:
+        if removal := self._pending.pop(token, None):
+            # Let the lobby and player go before the deadline comes up
+            removal.callback = None
+            if len(self._heap) > 2 * len(self._pending) + 64:
+                self._compact()
+
+    def _compact(self) -> None:
+        self._heap = [removal for removal in self._heap if removal.callback]
+        heapq.heapify(self._heap)
+
+    def reap(self, now: float) -> None:
+        while self._heap and self._heap[0].deadline <= now:
+            removal = heapq.heappop(self._heap)
+            if not (callback := removal.callback):
+                continue
+
+            del self._pending[removal.token]
+            removal.callback = None
+            try:
+                callback()
+            except Exception:
+                logger.exception("Player removal failed, token=%s", removal.token)
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        self._wakeup = wakeup = asyncio.Event()
+        while True:
+            wakeup.clear()
+            timeout = self._heap[0].deadline - loop.time() if self._heap else None
+            if timeout is None or timeout > 0:
+                with suppress(TimeoutError):
+                    await asyncio.wait_for(wakeup.wait(), timeout)
+            self.reap(loop.time())
+
+
+pending_removals = PendingRemovals(delay=config.player_removal_delay)
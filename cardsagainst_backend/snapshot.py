@@ -0,0 +1,322 @@
+"""Binary cache of the card catalog, loaded instead of querying the database.
+
+    python -m cardsagainst_backend.snapshot export catalog.bin --version 2024-06
+    python -m cardsagainst_backend.snapshot info catalog.bin
+
+The file is a header followed by little-endian uint32 tables, each padded
+to 4 bytes, so they are decoded straight from a memory map of the file:
+
+    strings      offsets (count + 1) and UTF-8 data of every distinct string
+    case lists   offsets (count + 1) into case ids, string indexes
+    variants     (text string, case list) pairs of punchline texts
+    setups       (id, text string, case string, starts_with_punchline)
+    punchlines   (id, first variant, variants count)
+    decks        (id string, end of its setup ids, end of its punchline ids)
+    deck cards   setup ids, then punchline ids of every deck
+
+Equal strings and equal case lists are stored once, and decoded into one
+shared object each. Every card is decoded on load and the mapping is
+closed, so each worker holds its own card objects, as it would after the
+queries, and the file only saves their round trips and row parsing.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import mmap
+import os
+import struct
+import sys
+from array import array
+from contextlib import suppress
+from itertools import pairwise
+from pathlib import Path
+
+from cardsagainst.deck import PunchlineCard, SetupCard
+from cardsagainst_backend.dao import CardsDAO, DeckCards
+
+MAGIC = b"CACS"
+FORMAT_VERSION = 2
+# magic, format version, catalog version string, then the counts of strings,
+# case lists, case ids, variants, setups, punchlines, decks, deck setup ids
+# and deck punchline ids
+HEADER = struct.Struct("<4sHxxIIIIIIIIII")
+SETUP = struct.Struct("<IIII")
+PUNCHLINE = struct.Struct("<III")
+DECK = struct.Struct("<III")
+
+
+class SnapshotError(Exception):
+    pass
+
+
+class _Strings:
+    def __init__(self) -> None:
+        self.indexes: dict[str, int] = {}
+
+    def add(self, value: str) -> int:
+        return self.indexes.setdefault(value, len(self.indexes))
+
+
+def _table(values: list[int]) -> bytes:
+    table = array("I", values)
+    if sys.byteorder != "little":
+        table.byteswap()
+    return table.tobytes()
+
+
+def _pad(data: bytes) -> bytes:
+    return data + b"\0" * (-len(data) % 4)
+
+
+def write_snapshot(
+    path: str | Path,
+    version: str,
+    setups: list[SetupCard],
+    punchlines: list[PunchlineCard],
+    decks: dict[str, DeckCards] | None = None,
+) -> None:
+    """Writes next to `path` and renames, mapped readers keep the old file."""
+    decks = decks or {}
+    strings = _Strings()
+    case_lists: dict[tuple[str, ...], int] = {}
+    case_ids: list[int] = []
+    case_offsets = [0]
+    variants: list[int] = []
+    setup_records = b"".join(
+        SETUP.pack(
+            setup.id,
+            strings.add(setup.text),
+            strings.add(setup.case),
+            setup.starts_with_punchline,
+        )
+        for setup in setups
+    )
+    punchline_records = []
+    for punchline in punchlines:
+        first_variant = len(variants) // 2
+        for text, cases in punchline.text:
+            key = tuple(cases)
+            if key not in case_lists:
+                case_lists[key] = len(case_lists)
+                case_ids.extend(strings.add(case) for case in key)
+                case_offsets.append(len(case_ids))
+            variants += (strings.add(text), case_lists[key])
+        punchline_records.append(
+            PUNCHLINE.pack(punchline.id, first_variant, len(punchline.text))
+        )
+    deck_setup_ids: list[int] = []
+    deck_punchline_ids: list[int] = []
+    deck_records = []
+    for deck_id, (setup_ids, punchline_ids) in decks.items():
+        deck_setup_ids += setup_ids
+        deck_punchline_ids += punchline_ids
+        deck_records.append(
+            DECK.pack(
+                strings.add(deck_id), len(deck_setup_ids), len(deck_punchline_ids)
+            )
+        )
+    version_index = strings.add(version)
+
+    encoded = [value.encode() for value in strings.indexes]
+    string_offsets = [0]
+    for data in encoded:
+        string_offsets.append(string_offsets[-1] + len(data))
+
+    sections = [
+        HEADER.pack(
+            MAGIC,
+            FORMAT_VERSION,
+            version_index,
+            len(encoded),
+            len(case_lists),
+            len(case_ids),
+            len(variants) // 2,
+            len(setups),
+            len(punchlines),
+            len(decks),
+            len(deck_setup_ids),
+            len(deck_punchline_ids),
+        ),
+        _table(string_offsets),
+        _pad(b"".join(encoded)),
+        _table(case_offsets),
+        _table(case_ids),
+        _table(variants),
+        setup_records,
+        b"".join(punchline_records),
+        b"".join(deck_records),
+        _table(deck_setup_ids),
+        _table(deck_punchline_ids),
+    ]
+    temporary = Path(f"{path}.tmp")
+    with temporary.open("wb") as file:
+        file.writelines(sections)
+    os.replace(temporary, path)
+
+
+class Snapshot:
+    """Cards of a snapshot file, decoded once and shared by the worker's games.
+
+    Cards are never changed by the domain, decks only reorder their own
+    lists of them.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = str(path)
+        with open(self.path, "rb") as file:
+            try:
+                mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as error:
+                raise SnapshotError(f"Empty snapshot {self.path}") from error
+        try:
+            self._parse(memoryview(mapping))
+        except (struct.error, ValueError, TypeError, IndexError) as error:
+            raise SnapshotError(f"Invalid snapshot {self.path}") from error
+        finally:
+            # Views held by a traceback keep the mapping until it is collected
+            with suppress(BufferError):
+                mapping.close()
+
+    def _parse(self, view: memoryview) -> None:
+        (
+            magic,
+            format_version,
+            version_index,
+            strings_count,
+            case_lists_count,
+            case_ids_count,
+            variants_count,
+            setups_count,
+            punchlines_count,
+            decks_count,
+            deck_setup_ids_count,
+            deck_punchline_ids_count,
+        ) = HEADER.unpack_from(view)
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported format {magic!r} {format_version}")
+
+        offset = HEADER.size
+
+        def uint32s(count: int) -> memoryview | array:
+            nonlocal offset
+            data = view[offset : offset + count * 4]
+            offset += count * 4
+            if sys.byteorder == "little":
+                return data.cast("I")
+            table = array("I", data)
+            table.byteswap()
+            return table
+
+        string_offsets = uint32s(strings_count + 1)
+        string_data = view[offset : offset + string_offsets[-1]]
+        offset += string_offsets[-1] + (-string_offsets[-1] % 4)
+        strings = [
+            sys.intern(str(string_data[start:end], "utf-8"))
+            for start, end in pairwise(string_offsets)
+        ]
+        self.version = strings[version_index]
+
+        case_offsets = uint32s(case_lists_count + 1)
+        case_ids = uint32s(case_ids_count)
+        case_lists = [
+            [strings[case_ids[i]] for i in range(start, end)]
+            for start, end in pairwise(case_offsets)
+        ]
+        variants = uint32s(variants_count * 2)
+
+        self.setups = [
+            SetupCard(
+                id=card_id,
+                text=strings[text],
+                case=strings[case],
+                starts_with_punchline=bool(starts_with_punchline),
+            )
+            for card_id, text, case, starts_with_punchline in SETUP.iter_unpack(
+                view[offset : offset + setups_count * SETUP.size]
+            )
+        ]
+        offset += setups_count * SETUP.size
+
+        self.punchlines = [
+            PunchlineCard(
+                id=card_id,
+                text=[
+                    (strings[variants[2 * i]], case_lists[variants[2 * i + 1]])
+                    for i in range(first, first + count)
+                ],
+            )
+            for card_id, first, count in PUNCHLINE.iter_unpack(
+                view[offset : offset + punchlines_count * PUNCHLINE.size]
+            )
+        ]
+        offset += punchlines_count * PUNCHLINE.size
+
+        deck_records = list(
+            DECK.iter_unpack(view[offset : offset + decks_count * DECK.size])
+        )
+        offset += decks_count * DECK.size
+        deck_setup_ids = uint32s(deck_setup_ids_count).tolist()
+        deck_punchline_ids = uint32s(deck_punchline_ids_count).tolist()
+        self.decks: dict[str, DeckCards] = {}
+        setups_start = punchlines_start = 0
+        for deck_id, setups_end, punchlines_end in deck_records:
+            self.decks[strings[deck_id]] = (
+                deck_setup_ids[setups_start:setups_end],
+                deck_punchline_ids[punchlines_start:punchlines_end],
+            )
+            setups_start, punchlines_start = setups_end, punchlines_end
+        # Views must go before the mapping can be closed
+        del string_offsets, string_data, case_offsets, case_ids, variants
+        view.release()
+
+
+async def export(path: Path, version: str) -> None:
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    from cardsagainst_backend.db import create_engine
+
+    engine = create_engine()
+    cards_dao = CardsDAO(async_sessionmaker(engine))
+    setups = await cards_dao.get_setups()
+    punchlines = await cards_dao.get_punchlines()
+    decks = await cards_dao.get_decks()
+    await engine.dispose()
+    # Decks come shuffled, the file is easier to diff in id order
+    write_snapshot(
+        path,
+        version,
+        sorted(setups.cards, key=lambda card: card.id),
+        sorted(punchlines.cards, key=lambda card: card.id),
+        {
+            deck_id: (sorted(setup_ids), sorted(punchline_ids))
+            for deck_id, (setup_ids, punchline_ids) in sorted(decks.items())
+        },
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="Write db.url cards to a file")
+    export_parser.add_argument("path", type=Path)
+    export_parser.add_argument("--version", required=True)
+    info_parser = commands.add_parser("info", help="Print what a file holds")
+    info_parser.add_argument("path", type=Path)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        asyncio.run(export(args.path, args.version))
+    snapshot = Snapshot(args.path)
+    print(
+        f"{args.path}: version {snapshot.version}, {len(snapshot.setups)} setups,"
+        f" {len(snapshot.punchlines)} punchlines, {len(snapshot.decks)} decks,"
+        f" {args.path.stat().st_size:,} bytes"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import json
+import random
+import time
+from collections import deque
+from collections.abc import Iterator
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Any
+from uuid import uuid4
+
+from cardsagainst.lobby import LobbyMonitor
+from cardsagainst_backend.config import config
+from cardsagainst_backend.logs import (
+    command_var,
+    lobby_token_var,
+    player_uuid_var,
+    spans_logger,
+)
+
+current_trace: ContextVar[Trace | None] = ContextVar("current_trace", default=None)
+
+
+class Trace:
+    """Spans of one inbound command, from receive to the last written frame.
+
+    Every frame queued while the command is handled holds the trace open,
+    it is exported when the command and all of its frames are done.
+    """
+
+    def __init__(self, command: str) -> None:
+        self.id = uuid4().hex[:16]
+        self.command = command
+        self.lobby_token = lobby_token_var.get()
+        self.player_uuid = player_uuid_var.get()
+        self.started_at = time.time()
+        self._origin = time.perf_counter()
+        self.spans: list[tuple[str, float, float]] = []
+        self._holds = 1
+
+    def add_span(self, name: str, started_at: float, finished_at: float) -> None:
+        self.spans.append((name, started_at - self._origin, finished_at - started_at))
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, started_at, time.perf_counter())
+
+    def hold(self) -> bool:
+        """False once the trace is exported, late frames are not part of it"""
+        if not self._holds:
+            return False
+        self._holds += 1
+        return True
+
+    def release(self) -> None:
+        self._holds -= 1
+        if not self._holds:
+            tracer.export(self)
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "trace_id": self.id,
+            "command": self.command,
+            "lobby_token": self.lobby_token,
+            "player_uuid": self.player_uuid,
+            "started_at": self.started_at,
+            "duration": max(
+                (offset + duration for _, offset, duration in self.spans), default=0
+            ),
+            "spans": [
+                {"name": name, "offset": offset, "duration": duration}
+                for name, offset, duration in self.spans
+            ],
+        }
+
+
+class Tracer:
+    def __init__(self, sample_rate: float, ring_size: int) -> None:
+        self.sample_rate = sample_rate
+        self.ring: deque[dict[str, Any]] = deque(maxlen=ring_size)
+
+    @contextmanager
+    def trace(self, command: str) -> Iterator[Trace | None]:
+        if random.random() >= self.sample_rate:
+            yield None
+            return
+
+        trace = Trace(command)
+        token = current_trace.set(trace)
+        try:
+            with trace.span("handle_event"):
+                yield trace
+        finally:
+            current_trace.reset(token)
+            trace.release()
+
+    def export(self, trace: Trace) -> None:
+        data = trace.as_dict()
+        self.ring.append(data)
+        if config.trace_file:
+            spans_logger.info(json.dumps(data))
+
+    def find(self, trace_id: str) -> dict[str, Any] | None:
+        for data in self.ring:
+            if data["trace_id"] == trace_id:
+                return data
+        return None
+
+
+class TimerContext(LobbyMonitor):
+    """Detaches delayed transitions from the command that scheduled them.
+
+    Timer tasks copy the context of the command that created them. Each task
+    has its own copy, so the values set here stay inside the timer.
+    """
+
+    def timer_fired(self, name: str) -> None:
+        current_trace.set(None)
+        command_var.set(f"timer {name}")
+
+
+def span(name: str) -> AbstractContextManager[None]:
+    if trace := current_trace.get():
+        return trace.span(name)
+    return nullcontext()
+
+
+tracer = Tracer(
+    sample_rate=config.trace_sample_rate,
+    ring_size=config.trace_ring_size,
+)
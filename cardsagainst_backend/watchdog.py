@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import logging
+import sys
+import threading
+import time
+import traceback
+from dataclasses import dataclass, field
+from typing import Any
+
+from cardsagainst_backend import metrics
+from cardsagainst_backend.config import config
+from cardsagainst_backend.logs import command_var, lobby_token_var
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(order=True)
+class SlowCallback:
+    duration: float
+    seq: int
+    callback: str = field(compare=False)
+    command: str | None = field(compare=False)
+    lobby_token: str | None = field(compare=False)
+    stack: str | None = field(compare=False)
+    at: float = field(compare=False)
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "duration": self.duration,
+            "callback": self.callback,
+            "command": self.command,
+            "lobby_token": self.lobby_token,
+            "stack": self.stack,
+            "at": self.at,
+        }
+
+
+class SlowCallbackWatchdog:
+    """Times every event loop callback and task step.
+
+    `asyncio.Handle._run` is wrapped to measure each step, while a side
+    thread captures the loop thread stack once a step runs longer than
+    `threshold`, so the stack shows the blocking code itself. Works with
+    the stock asyncio loop, uvloop handles are not instrumented.
+    """
+
+    def __init__(self, threshold: float, top_size: int) -> None:
+        self.threshold = threshold
+        self.top_size = top_size
+        self.worst: list[SlowCallback] = []
+        self._seq = 0
+        self._recorded = 0
+        self._started_at: float | None = None
+        self._handle: asyncio.Handle | None = None
+        self._stack: str | None = None
+        # command and lobby token of the running step, taken with the stack
+        self._labels: tuple[str | None, str | None] | None = None
+        self._loop_thread_id = 0
+        self._original_run: Any = None
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def install(self) -> None:
+        self._loop_thread_id = threading.get_ident()
+        self._original_run = original_run = asyncio.Handle._run
+        watchdog = self
+
+        def _run(handle: asyncio.Handle) -> None:
+            watchdog._seq += 1
+            watchdog._stack = watchdog._labels = None
+            watchdog._handle = handle
+            watchdog._started_at = started_at = time.perf_counter()
+            try:
+                original_run(handle)
+            finally:
+                watchdog._started_at = watchdog._handle = None
+                duration = time.perf_counter() - started_at
+                if duration >= watchdog.threshold:
+                    watchdog.record(handle, duration)
+
+        asyncio.Handle._run = _run  # type: ignore[assignment]
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._watch, daemon=True)
+        self._thread.start()
+
+    def uninstall(self) -> None:
+        if self._original_run:
+            asyncio.Handle._run = self._original_run  # type: ignore[method-assign]
+            self._original_run = None
+        self._stopped.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _watch(self) -> None:
+        while not self._stopped.wait(self.threshold / 2):
+            seq, started_at, handle = self._seq, self._started_at, self._handle
+            if started_at is None or handle is None or self._stack is not None:
+                continue
+            if time.perf_counter() - started_at < self.threshold:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame else None
+            # A command resets its context variables before its step returns
+            context = handle._context  # type: ignore[attr-defined]
+            labels = (context.get(command_var), context.get(lobby_token_var))
+            # The step may have finished while the stack was taken
+            if seq == self._seq:
+                self._stack = stack
+                self._labels = labels
+
+    def record(self, handle: asyncio.Handle, duration: float) -> None:
+        context = handle._context  # type: ignore[attr-defined]
+        command, lobby_token = self._labels or (
+            context.get(command_var),
+            context.get(lobby_token_var),
+        )
+        self._recorded += 1
+        slow_callback = SlowCallback(
+            duration=duration,
+            seq=self._recorded,
+            callback=describe(handle),
+            command=command,
+            lobby_token=lobby_token,
+            stack=self._stack,
+            at=time.time(),
+        )
+        if len(self.worst) < self.top_size:
+            heapq.heappush(self.worst, slow_callback)
+        elif self.worst[0] < slow_callback:
+            heapq.heapreplace(self.worst, slow_callback)
+
+        label = command or "none"
+        metrics.slow_callbacks.inc(label)
+        metrics.slow_callback_seconds.observe(duration, label)
+        logger.warning(
+            "Slow callback %.3fs: %s, command=%s lobby_token=%s\n%s",
+            duration,
+            slow_callback.callback,
+            slow_callback.command,
+            slow_callback.lobby_token,
+            slow_callback.stack or "",
+        )
+
+    def worst_offenders(self) -> list[dict[str, Any]]:
+        return [
+            slow_callback.as_dict()
+            for slow_callback in sorted(self.worst, reverse=True)
+        ]
+
+
+def describe(handle: asyncio.Handle) -> str:
+    callback = handle._callback  # type: ignore[attr-defined]
+    if isinstance(task := getattr(callback, "__self__", None), asyncio.Task):
+        coro = getattr(task.get_coro(), "__qualname__", repr(task))
+        return f"task {task.get_name()} {coro}"
+    return getattr(callback, "__qualname__", repr(callback))
+
+
+watchdog = SlowCallbackWatchdog(
+    threshold=config.slow_callback_threshold,
+    top_size=config.slow_callback_top_size,
+)
@@ -0,0 +1,306 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import resource
+import time
+from collections import Counter, defaultdict
+from collections.abc import Coroutine
+from contextlib import suppress
+from dataclasses import dataclass, field
+from typing import Any
+
+import websockets
+
+
+@dataclass
+class Stats:
+    latencies: dict[str, list[float]] = field(default_factory=lambda: defaultdict(list))
+    commands: Counter[str] = field(default_factory=Counter)
+    events: Counter[str] = field(default_factory=Counter)
+    errors: int = 0
+    connections: int = 0
+    failed_connections: int = 0
+
+    def report(self, elapsed: float) -> dict[str, Any]:
+        return {
+            "elapsed": elapsed,
+            "commands_per_sec": sum(self.commands.values()) / elapsed,
+            "events_per_sec": sum(self.events.values()) / elapsed,
+            "errors": self.errors,
+            "connections": self.connections,
+            "failed_connections": self.failed_connections,
+            "commands": dict(self.commands),
+            "latency": {
+                name: percentiles(values) for name, values in self.latencies.items()
+            },
+        }
+
+
+def percentiles(values: list[float]) -> dict[str, float]:
+    ordered = sorted(values)
+
+    def at(share: float) -> float:
+        return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+    return {
+        "count": len(ordered),
+        "p50": at(0.50),
+        "p95": at(0.95),
+        "p99": at(0.99),
+        "max": ordered[-1],
+    }
+
+
+@dataclass
+class Server:
+    host: str
+    port: int
+
+    async def post_json(self, path: str, payload: dict[str, Any]) -> Any:
+        """Bare HTTP/1.1 request, so clients cost as little as possible."""
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        body = json.dumps(payload).encode()
+        writer.write(
+            (
+                f"POST {path} HTTP/1.1\r\n"
+                f"Host: {self.host}:{self.port}\r\n"
+                "Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                "Connection: close\r\n"
+                "\r\n"
+            ).encode()
+            + body
+        )
+        response = await reader.read()
+        writer.close()
+        await writer.wait_closed()
+
+        head, _, content = response.partition(b"\r\n\r\n")
+        status = int(head.split(b" ", 2)[1])
+        if status != 200:
+            raise RuntimeError(f"POST {path} failed with {status}: {content!r}")
+        return json.loads(content)
+
+    def websocket_url(self, player_token: str, lobby_token: str) -> str:
+        return (
+            f"ws://{self.host}:{self.port}/connect"
+            f"?playerToken={player_token}&lobbyToken={lobby_token}"
+        )
+
+
+@dataclass
+class BotSettings:
+    think_time: float = 0.5
+    # Disconnects per bot per second, the lead never disconnects
+    reconnect_rate: float = 0.0
+    reconnect_delay: float = 1.0
+    winning_score: int = 10
+    # Without autoplay the bot only tracks the game and sends what it is told
+    autoplay: bool = True
+
+
+class Bot:
+    """Scripted player that keeps the game going over the real protocol."""
+
+    def __init__(
+        self, name: str, server: Server, settings: BotSettings, stats: Stats
+    ) -> None:
+        self.name = name
+        self.server = server
+        self.settings = settings
+        self.stats = stats
+        self.player_token = ""
+        self.lobby_token = ""
+        self.uuid: str | None = None
+        self.owner_uuid: str | None = None
+        self.lead_uuid: str | None = None
+        self.hand: list[int] = []
+        self.ready: set[str] = set()
+        self.table: dict[int, int] = {}
+        self.welcomed = asyncio.Event()
+        self._websocket: Any = None
+        self._pending: dict[str, float] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._session_task: asyncio.Task | None = None
+
+    @property
+    def is_lead(self) -> bool:
+        return self.uuid is not None and self.uuid == self.lead_uuid
+
+    @property
+    def is_owner(self) -> bool:
+        return self.uuid is not None and self.uuid == self.owner_uuid
+
+    async def join(self, lobby_token: str | None = None) -> None:
+        path = f"/connect?lobbyToken={lobby_token}" if lobby_token else "/connect"
+        response = await self.server.post_json(path, {"name": self.name, "emoji": "🤖"})
+        self.player_token = response["playerToken"]
+        self.lobby_token = response["lobbyToken"]
+
+    async def run(self, deadline: float) -> None:
+        while (left := deadline - time.perf_counter()) > 0:
+            try:
+                await asyncio.wait_for(self._session(), timeout=left)
+            except TimeoutError:
+                return
+            except (OSError, websockets.WebSocketException):
+                self.stats.failed_connections += 1
+            await asyncio.sleep(self.settings.reconnect_delay)
+
+    def open(self) -> None:
+        """Stay connected in the background until `close`."""
+        self._session_task = asyncio.create_task(self._session())
+
+    async def close(self) -> None:
+        if task := self._session_task:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+            self._session_task = None
+
+    async def _session(self) -> None:
+        self._pending["welcome"] = time.perf_counter()
+        url = self.server.websocket_url(self.player_token, self.lobby_token)
+        async with websockets.connect(
+            url, ping_interval=None, max_size=None
+        ) as websocket:
+            self._websocket = websocket
+            self.stats.connections += 1
+            receive_task = asyncio.create_task(self._receive(websocket))
+            try:
+                while not receive_task.done():
+                    await asyncio.wait([receive_task], timeout=self._lifetime())
+                    if not self.is_lead:
+                        break
+            finally:
+                receive_task.cancel()
+                for task in self._tasks:
+                    task.cancel()
+                self._websocket = None
+                self.welcomed.clear()
+
+    def _lifetime(self) -> float | None:
+        if not self.settings.reconnect_rate:
+            return None
+        return random.expovariate(self.settings.reconnect_rate)
+
+    async def _receive(self, websocket: Any) -> None:
+        async for message in websocket:
+            received_at = time.perf_counter()
+            event = json.loads(message)
+            self.stats.events[event["type"]] += 1
+            self._handle(event["type"], event.get("data"), received_at)
+
+    async def send(self, command: str, data: dict[str, Any] | None = None) -> None:
+        if not self._websocket:
+            return
+        self._pending[command] = time.perf_counter()
+        self.stats.commands[command] += 1
+        await self._websocket.send(json.dumps({"id": 1, "type": command, "data": data}))
+
+    def _send_later(self, command: str, data: dict[str, Any] | None = None) -> None:
+        async def send_later() -> None:
+            await asyncio.sleep(random.uniform(0, 2 * self.settings.think_time))
+            await self.send(command, data)
+
+        self._spawn(send_later())
+
+    def _spawn(self, coroutine: Coroutine[Any, Any, None]) -> None:
+        task = asyncio.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _confirm(self, command: str, received_at: float) -> None:
+        if (sent_at := self._pending.pop(command, None)) is not None:
+            self.stats.latencies[command].append(received_at - sent_at)
+
+    def start_game(self) -> None:
+        self._spawn(
+            self.send(
+                "startGame",
+                {"turnDuration": None, "winningScore": self.settings.winning_score},
+            )
+        )
+
+    def _handle(self, event_type: str, data: Any, received_at: float) -> None:
+        match event_type:
+            case "welcome":
+                self._confirm("welcome", received_at)
+                self.uuid = data["selfUuid"]
+                self.owner_uuid = data["ownerUuid"]
+                self.lead_uuid = data["leadUuid"]
+                self.hand = [card["id"] for card in data["hand"]]
+                self.ready.clear()
+                self.table = {
+                    index: card_on_table["card"]["id"]
+                    for index, card_on_table in enumerate(data["table"])
+                    if card_on_table["card"]
+                }
+                self.welcomed.set()
+            case "ping":
+                self._spawn(self.send("pong"))
+            case "error":
+                self.stats.errors += 1
+            case "ownerChanged":
+                self.owner_uuid = data["uuid"]
+            case "gameStarted":
+                self._confirm("startGame", received_at)
+                self.hand = [card["id"] for card in data["hand"]]
+            case "handRefreshed":
+                self.hand = [card["id"] for card in data["hand"]]
+            case "turnStarted":
+                self.lead_uuid = data["leadUuid"]
+                if data["card"]:
+                    self.hand.append(data["card"]["id"])
+                self.ready.clear()
+                self.table.clear()
+            case "playerReady":
+                self.ready.add(data["uuid"])
+                if data["uuid"] == self.uuid:
+                    self._confirm("makeTurn", received_at)
+            case "tableCardOpened":
+                self.table[data["index"]] = data["card"]["id"]
+                if self.is_lead:
+                    self._confirm("openTableCard", received_at)
+            case "turnEnded":
+                self._confirm("pickTurnWinner", received_at)
+
+        if self.settings.autoplay:
+            self._play(event_type, data)
+
+    def _play(self, event_type: str, data: Any) -> None:
+        match event_type:
+            # Catch up with what was missed while disconnected
+            case "welcome" if data["state"] == "finished" and self.is_owner:
+                self._spawn(self._restart_game())
+            case "welcome" if data["state"] == "turns" and not data["selectedCard"]:
+                self._make_turn()
+            case "turnStarted":
+                self._make_turn()
+            case "allPlayersReady" if self.is_lead:
+                self._send_later("openTableCard", {"index": 0})
+            case "tableCardOpened" if self.is_lead:
+                if len(self.table) < len(self.ready):
+                    self._send_later("openTableCard", {"index": len(self.table)})
+                else:
+                    winner_id = random.choice(list(self.table.values()))
+                    self._send_later("pickTurnWinner", {"id": winner_id})
+            case "gameFinished" if self.is_owner:
+                self._spawn(self._restart_game())
+
+    def _make_turn(self) -> None:
+        if not self.is_lead and self.hand:
+            card_id = self.hand.pop(random.randrange(len(self.hand)))
+            self._send_later("makeTurn", {"id": card_id})
+
+    async def _restart_game(self) -> None:
+        await asyncio.sleep(random.uniform(0, 2 * self.settings.think_time))
+        self.start_game()
+
+
+def raise_open_files_limit() -> None:
+    """Every bot holds a socket, the default soft limit is often 1024."""
+    _, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
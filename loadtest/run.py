@@ -0,0 +1,123 @@
+"""Scripted bots playing against a running backend over websockets.
+
+python -m loadtest.server --port 8000
+python -m loadtest.run --port 8000 --lobbies 200 --players 6 --duration 300
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+from pathlib import Path
+
+from loadtest.bot import Bot, BotSettings, Server, Stats, raise_open_files_limit
+
+
+async def run_lobby(
+    index: int,
+    players_count: int,
+    server: Server,
+    settings: BotSettings,
+    stats: Stats,
+    deadline: float,
+) -> None:
+    owner = Bot(f"bot {index}-0", server, settings, stats)
+    await owner.join()
+    bots = [owner]
+    for number in range(1, players_count):
+        bot = Bot(f"bot {index}-{number}", server, settings, stats)
+        await bot.join(owner.lobby_token)
+        bots.append(bot)
+
+    tasks = [asyncio.create_task(bot.run(deadline)) for bot in bots]
+    await asyncio.wait_for(
+        asyncio.gather(*(bot.welcomed.wait() for bot in bots)), timeout=30
+    )
+    owner.start_game()
+    await asyncio.gather(*tasks)
+
+
+async def run(args: argparse.Namespace) -> Stats:
+    server = Server(args.host, args.port)
+    settings = BotSettings(
+        think_time=args.think_time,
+        reconnect_rate=args.reconnect_rate,
+        reconnect_delay=args.reconnect_delay,
+        winning_score=args.winning_score,
+    )
+    stats = Stats()
+    started_at = time.perf_counter()
+    deadline = started_at + args.ramp_up + args.duration
+
+    tasks = []
+    for index in range(args.lobbies):
+        tasks.append(
+            asyncio.create_task(
+                run_lobby(index, args.players, server, settings, stats, deadline)
+            )
+        )
+        await asyncio.sleep(args.ramp_up / args.lobbies)
+
+    for result in await asyncio.gather(*tasks, return_exceptions=True):
+        if isinstance(result, BaseException):
+            print(f"Lobby failed: {result!r}")
+    return stats
+
+
+def print_report(report: dict) -> None:
+    print(
+        f"{report['commands_per_sec']:,.1f} commands/sec, "
+        f"{report['events_per_sec']:,.1f} events/sec, "
+        f"{report['errors']} errors, "
+        f"{report['connections']} connections "
+        f"({report['failed_connections']} failed)"
+    )
+    print(
+        f"{'latency, ms':<16} {'count':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}"
+    )
+    for name, values in sorted(report["latency"].items()):
+        print(
+            f"{name:<16} {values['count']:>8}",
+            *(f"{values[key] * 1000:>8.1f}" for key in ("p50", "p95", "p99", "max")),
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--lobbies", type=int, default=10)
+    parser.add_argument("--players", type=int, default=6, help="Players per lobby")
+    parser.add_argument(
+        "--duration", type=float, default=60, help="Seconds after the ramp-up"
+    )
+    parser.add_argument(
+        "--ramp-up", type=float, default=10, help="Seconds to create all lobbies"
+    )
+    parser.add_argument(
+        "--think-time", type=float, default=0.5, help="Mean delay before a move"
+    )
+    parser.add_argument(
+        "--reconnect-rate",
+        type=float,
+        default=0.0,
+        help="Reconnects per bot per second",
+    )
+    parser.add_argument("--reconnect-delay", type=float, default=1.0)
+    parser.add_argument("--winning-score", type=int, default=10)
+    parser.add_argument("--output", type=Path, help="Save the report as JSON")
+    args = parser.parse_args()
+
+    raise_open_files_limit()
+    started_at = time.perf_counter()
+    stats = asyncio.run(run(args))
+    report = stats.report(time.perf_counter() - started_at)
+    print_report(report)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
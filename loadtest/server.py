@@ -0,0 +1,49 @@
+"""Backend for load tests, in-memory storage unless asked otherwise.
+
+python -m loadtest.server --port 8000
+python -m loadtest.server --port 8000 --storage database
+"""
+
+from __future__ import annotations
+
+import argparse
+
+import uvicorn
+
+from cardsagainst_backend.config import config
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--storage",
+        choices=("memory", "database"),
+        default="memory",
+        help="database uses db.url from the config",
+    )
+    parser.add_argument("--setups", type=int, default=500)
+    parser.add_argument("--punchlines", type=int, default=2000)
+    parser.add_argument("--decks", type=int, default=4)
+    args = parser.parse_args()
+
+    config.set("storage", args.storage)
+    config.set("memory_setups", args.setups)
+    config.set("memory_punchlines", args.punchlines)
+    config.set("memory_decks", args.decks)
+    if not config.get("ws_url"):
+        config.set("ws_url", f"ws://{args.host}:{args.port}/connect")
+
+    uvicorn.run(
+        "cardsagainst_backend.main:app",
+        host=args.host,
+        port=args.port,
+        log_level="warning",
+        # The default backlog drops connections when thousands of bots join
+        backlog=4096,
+    )
+
+
+if __name__ == "__main__":
+    main()
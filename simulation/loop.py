@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import asyncio
+import selectors
+import time
+from typing import Any
+
+
+class VirtualTimeSelector(selectors.DefaultSelector):  # type: ignore[misc, valid-type]
+    """Selector that skips waiting by moving the loop clock forward."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.loop: VirtualTimeLoop | None = None
+
+    def select(self, timeout: float | None = None) -> list[Any]:
+        # The loop's self-pipe is always registered, skip the syscall if
+        # nothing else is
+        events = super().select(0) if len(self.get_map()) > 1 else []
+        if timeout is None and not events:
+            raise RuntimeError("Nothing is scheduled, the simulation would hang")
+        if not events and timeout and self.loop:
+            self.loop.now += timeout
+        return events
+
+
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+    """Event loop where sleeps and timers take no wall time.
+
+    Only the clock is virtual, so code under simulation must not wait for
+    real I/O.
+    """
+
+    def __init__(self) -> None:
+        selector = VirtualTimeSelector()
+        super().__init__(selector)
+        selector.loop = self
+        self.now = 0.0
+
+    def time(self) -> float:
+        return self.now
+
+
+class ScaledTimeSelector(selectors.DefaultSelector):  # type: ignore[misc, valid-type]
+    def __init__(self, speed: float) -> None:
+        super().__init__()
+        self.speed = speed
+
+    def select(self, timeout: float | None = None) -> list[Any]:
+        return super().select(timeout / self.speed if timeout else timeout)
+
+
+class ScaledTimeLoop(asyncio.SelectorEventLoop):
+    """Event loop where the clock runs `speed` times faster than real time."""
+
+    def __init__(self, speed: float) -> None:
+        super().__init__(ScaledTimeSelector(speed))
+        self.speed = speed
+        self._started_at = time.monotonic()
+
+    def time(self) -> float:
+        return (time.monotonic() - self._started_at) * self.speed
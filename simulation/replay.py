@@ -0,0 +1,346 @@
+"""Replays a recorder log in process or against a local server.
+
+    python -m simulation.replay games.log --speed 10
+    python -m simulation.replay games.log --speed max --lobby 3fa2c1d0
+    python -m simulation.replay games.log --server 127.0.0.1:8000 --speed 1
+
+In process, the log is fed to the domain with the recorded seeds, so the
+same cards are dealt, and the lobbies' own timers run on a loop clock that
+is scaled (or virtual with `--speed max`) to match the recorded timeline.
+A local server only gets the traffic shape: commands are sent on time by
+bots, with card ids taken from what the server actually dealt. Its delays
+stay real, so above 1x expect commands rejected for the wrong state.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter, defaultdict, deque
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+from cardsagainst.deck import Deck, PunchlineCard, SetupCard
+from cardsagainst.exceptions import CardsAgainstError
+from cardsagainst.lobby import Gathering, Lobby, LobbyMonitor, LobbyObserver, Player
+from cardsagainst.settings import LobbySettings
+from cardsagainst_backend.config import config
+from cardsagainst_backend.integration import (
+    Event,
+    MakeTurnData,
+    OpenTableCardData,
+    PickTurnWinnerData,
+    StartGameData,
+)
+from loadtest.bot import Bot, BotSettings, Server, Stats, percentiles
+from loadtest.run import print_report
+from simulation.loop import ScaledTimeLoop, VirtualTimeLoop
+
+# [time, lobby_token, kind, *fields], as written by the recorder
+Entry = list[Any]
+
+
+def read_log(path: Path, lobby_token: str | None) -> Iterator[Entry]:
+    with path.open(encoding="utf-8") as file:
+        for line in file:
+            entry = json.loads(line)
+            if lobby_token is None or entry[1] == lobby_token:
+                yield entry
+
+
+class ReplayedLobby(LobbyMonitor):
+    def __init__(self, replay: EngineReplay) -> None:
+        self.replay = replay
+        self.lobby: Lobby | None = None
+        self.players: dict[str, Player] = {}
+        self.timers: deque[tuple[str, int]] = deque()
+        self.timers_fired = 0
+        self.start_game_event: tuple[Player, Event[StartGameData]] | None = None
+
+    def timer_fired(self, name: str) -> None:
+        if not self.timers or self.timers[0][0] != name:
+            self.replay.divergences[f"unexpected timer {name}"] += 1
+            return
+        _, seed = self.timers.popleft()
+        self.timers_fired += 1
+        random.seed(seed)
+
+    def join(self, uuid: str, name: str, emoji: str) -> None:
+        player = Player(name=name, emoji=emoji, token=uuid)
+        player.uuid = uuid
+        if not self.lobby:
+            self.lobby = Lobby(owner=player, state=Gathering())
+            self.lobby.monitor = self
+        self.lobby.add_player(player)
+        self.players[uuid] = player
+
+    def connect(self, seed: int, uuid: str) -> None:
+        random.seed(seed)
+        self.players[uuid].connect(LobbyObserver())
+
+    def disconnect(self, seed: int, uuid: str) -> None:
+        random.seed(seed)
+        self.players[uuid].disconnect()
+
+    def remove(self, seed: int, uuid: str) -> None:
+        assert self.lobby
+        random.seed(seed)
+        self.lobby.remove_player(self.players[uuid])
+
+    def command(self, seed: int, uuid: str, json_data: dict) -> None:
+        assert self.lobby
+        random.seed(seed)
+        player = self.players[uuid]
+        game = self.lobby.game
+        match json_data["type"]:
+            case "startGame":
+                # Starts once the decks entry says what was loaded
+                self.start_game_event = (
+                    player,
+                    Event[StartGameData].model_validate(json_data),
+                )
+            case "refreshHand":
+                player.refresh_hand()
+            case "makeTurn":
+                assert game
+                make_turn = Event[MakeTurnData].model_validate(json_data)
+                player.make_turn(game.punchlines.get_card_by_uuid(make_turn.data.id))
+            case "openTableCard":
+                open_card = Event[OpenTableCardData].model_validate(json_data)
+                player.open_table_card(self.lobby.table[open_card.data.index])
+            case "pickTurnWinner":
+                assert game
+                pick_winner = Event[PickTurnWinnerData].model_validate(json_data)
+                player.pick_turn_winner(
+                    game.punchlines.get_card_by_uuid(pick_winner.data.id)
+                )
+            case "continueGame":
+                player.continue_game()
+
+    def decks(self, seed: int, setup_ids: list[int], punchline_ids: list[int]) -> None:
+        assert self.start_game_event, "Decks are loaded by startGame"
+        player, event = self.start_game_event
+        self.start_game_event = None
+
+        setups = Deck(
+            cards=[
+                SetupCard(id=id_, text="", case="nom", starts_with_punchline=False)
+                for id_ in setup_ids
+            ]
+        )
+        punchlines = Deck(
+            cards=[PunchlineCard(id=id_, text=[]) for id_ in punchline_ids]
+        )
+        # Restore the order the decks were shuffled into when recorded
+        setups.cards[:] = [setups.mapping[id_] for id_ in setup_ids]
+        punchlines.cards[:] = [punchlines.mapping[id_] for id_ in punchline_ids]
+
+        random.seed(seed)
+        player.start_game(
+            LobbySettings(
+                turn_duration=event.data.turn_duration,
+                winning_score=event.data.winning_score or config.winning_score,
+            ),
+            setups,
+            punchlines,
+        )
+
+    async def wait_for_timer(self, number: int) -> None:
+        """Keep entries recorded after a timer from overtaking it."""
+        for _ in range(1000):
+            if self.timers_fired >= number:
+                return
+            await asyncio.sleep(0.01)
+        self.replay.divergences["late timer"] += 1
+
+
+class EngineReplay:
+    def __init__(self, entries: list[Entry]) -> None:
+        self.lobbies: dict[str, ReplayedLobby] = defaultdict(
+            lambda: ReplayedLobby(self)
+        )
+        self.applied: Counter[str] = Counter()
+        self.errors: Counter[str] = Counter()
+        self.divergences: Counter[str] = Counter()
+        self.durations: dict[str, list[float]] = defaultdict(list)
+        for _, lobby_token, kind, *fields in entries:
+            if kind == "timer":
+                seed, name = fields
+                self.lobbies[lobby_token].timers.append((name, seed))
+
+    def apply(self, entry: Entry) -> None:
+        _, lobby_token, kind, *fields = entry
+        if kind == "timer":
+            # Fired by the lobby itself, see `timer_fired`
+            return
+        name = fields[2]["type"] if kind == "command" else kind
+        started_at = time.perf_counter()
+        try:
+            getattr(self.lobbies[lobby_token], kind)(*fields)
+        except (CardsAgainstError, AssertionError, LookupError) as exception:
+            # Rejected like the server would, anything else is a replay bug
+            self.errors[f"{name}: {type(exception).__name__}"] += 1
+        self.durations[name].append(time.perf_counter() - started_at)
+        self.applied[name] += 1
+
+    def report(self) -> None:
+        for replayed in self.lobbies.values():
+            if replayed.timers:
+                self.divergences["timers not fired"] += len(replayed.timers)
+        print(
+            f"{'entry, ms':<20} {'count':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}"
+        )
+        for name, values in sorted(self.durations.items()):
+            result = percentiles(values)
+            print(
+                f"{name:<20} {result['count']:>8}",
+                *(
+                    f"{result[key] * 1000:>8.3f}"
+                    for key in ("p50", "p95", "p99", "max")
+                ),
+            )
+        for title, counter in (
+            ("Errors", self.errors),
+            ("Divergences", self.divergences),
+        ):
+            if counter:
+                print(
+                    f"{title}:", *(f"{k}: {v}" for k, v in counter.items()), sep="\n  "
+                )
+
+
+async def replay_engine(entries: list[Entry]) -> EngineReplay:
+    replay = EngineReplay(entries)
+    timers: Counter[str] = Counter()
+    loop = asyncio.get_running_loop()
+    started_at, first_at = loop.time(), entries[0][0]
+    for entry in entries:
+        # Loop time runs at the replay speed, so waits are in recorded seconds
+        if (delay := started_at + entry[0] - first_at - loop.time()) > 0:
+            await asyncio.sleep(delay)
+        if entry[2] == "timer":
+            timers[entry[1]] += 1
+            await replay.lobbies[entry[1]].wait_for_timer(timers[entry[1]])
+        replay.apply(entry)
+    # Let the timers scheduled by the last entries fire
+    for _ in range(120):
+        if not any(replayed.timers for replayed in replay.lobbies.values()):
+            break
+        await asyncio.sleep(1)
+    return replay
+
+
+class ServerReplay:
+    def __init__(self, server: Server) -> None:
+        self.server = server
+        self.stats = Stats()
+        self.bots: dict[str, Bot] = {}
+        self.lobby_tokens: dict[str, str] = {}
+        self.settings = BotSettings(autoplay=False)
+
+    async def apply(self, entry: Entry) -> None:
+        _, lobby_token, kind, *fields = entry
+        match kind:
+            case "join":
+                uuid, name, _ = fields
+                bot = self.bots[uuid] = Bot(
+                    name, self.server, self.settings, self.stats
+                )
+                await bot.join(self.lobby_tokens.get(lobby_token))
+                self.lobby_tokens.setdefault(lobby_token, bot.lobby_token)
+            case "connect":
+                bot = self.bots[fields[1]]
+                await bot.close()
+                bot.open()
+            case "disconnect":
+                await self.bots[fields[1]].close()
+            case "command":
+                _, uuid, json_data = fields
+                bot = self.bots[uuid]
+                if (data := self._remap(bot, json_data)) is not None:
+                    await bot.send(json_data["type"], data)
+
+    def _remap(self, bot: Bot, json_data: dict) -> dict | None:
+        """Recorded card ids mean nothing to the server, use dealt ones."""
+        data = json_data.get("data")
+        match json_data["type"]:
+            case "makeTurn":
+                if not bot.hand:
+                    return None
+                return {"id": bot.hand.pop(random.randrange(len(bot.hand)))}
+            case "pickTurnWinner":
+                if not bot.table:
+                    return None
+                return {"id": random.choice(list(bot.table.values()))}
+        return data
+
+    async def close(self) -> None:
+        await asyncio.gather(*(bot.close() for bot in self.bots.values()))
+
+
+async def replay_server(
+    entries: list[Entry], server: Server, speed: float | None
+) -> Stats:
+    replay = ServerReplay(server)
+    started_at, first_at = time.perf_counter(), entries[0][0]
+    for entry in entries:
+        if (
+            speed
+            and (
+                delay := (entry[0] - first_at) / speed
+                - (time.perf_counter() - started_at)
+            )
+            > 0
+        ):
+            await asyncio.sleep(delay)
+        try:
+            await replay.apply(entry)
+        except (OSError, RuntimeError) as exception:
+            replay.stats.errors += 1
+            print(f"{entry[2]} failed: {exception!r}")
+    await asyncio.sleep(1)
+    await replay.close()
+    return replay.stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("log", type=Path)
+    parser.add_argument("--lobby", help="Replay only this lobby token")
+    parser.add_argument(
+        "--speed", default="1", help="Times faster than recorded, or max"
+    )
+    parser.add_argument("--server", help="host:port of a server to replay against")
+    args = parser.parse_args()
+
+    entries = list(read_log(args.log, args.lobby))
+    if not entries:
+        parser.error("Nothing to replay")
+    speed = None if args.speed == "max" else float(args.speed)
+
+    started_at = time.perf_counter()
+    if args.server:
+        host, port = args.server.rsplit(":", 1)
+        stats = asyncio.run(replay_server(entries, Server(host, int(port)), speed))
+        print_report(stats.report(time.perf_counter() - started_at))
+        return
+
+    loop = VirtualTimeLoop() if speed is None else ScaledTimeLoop(speed)
+    try:
+        replay = loop.run_until_complete(replay_engine(entries))
+    finally:
+        loop.close()
+    print(
+        f"Replayed {len(entries):,} entries in {time.perf_counter() - started_at:.1f}s"
+    )
+    replay.report()
+
+
+if __name__ == "__main__":
+    main()
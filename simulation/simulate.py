@@ -0,0 +1,354 @@
+"""Headless soak test: many lobbies play random legal moves in virtual time.
+
+python -m simulation.simulate --lobbies 1000 --players 6 --turns 1000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gc
+import logging
+import random
+import resource
+import time
+from collections import Counter
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from cardsagainst.deck import Deck, PunchlineCard, SetupCard
+from cardsagainst.exceptions import CardsAgainstError
+from cardsagainst.lobby import (
+    Finished,
+    Gathering,
+    Judgement,
+    Lobby,
+    LobbyMonitor,
+    LobbyObserver,
+    Player,
+    State,
+    Turns,
+)
+from cardsagainst.settings import LobbySettings
+from simulation.loop import VirtualTimeLoop
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(kw_only=True)
+class SimulationSettings:
+    lobbies: int = 100
+    players: int = 6
+    turns: int = 100_000
+    setups: int = 100
+    punchlines: int = 500
+    winning_score: int = 10
+    turn_duration: int = 60
+    think_time: float = 5.0
+    refresh_rate: float = 0.02
+    # Mean virtual seconds between disconnects in one lobby, 0 disables churn
+    churn_interval: float = 600.0
+    reconnect_delay: float = 30.0
+    leave_rate: float = 0.3
+    report_interval: float = 3600.0
+
+
+class SimulatedPlayer(LobbyObserver):
+    """Makes a random legal move some think time after each event."""
+
+    def __init__(self, simulation: Simulation, player: Player) -> None:
+        self.simulation = simulation
+        self.player = player
+
+    @property
+    def lobby(self) -> Lobby:
+        return self.player.lobby
+
+    def _later(self, action: Callable[[], None]) -> None:
+        def act() -> None:
+            # Moves scheduled before a reconnect belong to the old connection
+            if self.player.observer is self:
+                action()
+
+        self.simulation.call_later(
+            random.expovariate(1 / self.simulation.settings.think_time), act
+        )
+
+    def welcome(self) -> None:
+        # Catch up after a reconnect
+        state = self.lobby.state
+        if isinstance(state, Turns):
+            self._later(self.make_turn)
+        elif isinstance(state, Judgement):
+            self._later(self.judge)
+        elif isinstance(state, Finished):
+            self._later(self.continue_game)
+
+    def turn_started(self, *args: object, **kwargs: object) -> None:
+        self._later(self.make_turn)
+
+    def all_players_ready(self) -> None:
+        self._later(self.judge)
+
+    def game_finished(self, winner: Player) -> None:
+        self._later(self.continue_game)
+
+    def make_turn(self) -> None:
+        player = self.player
+        if (
+            not isinstance(self.lobby.state, Turns)
+            or player is self.lobby.lead
+            or player.is_ready
+        ):
+            return
+        if player.score > 0 and random.random() < self.simulation.settings.refresh_rate:
+            player.refresh_hand()
+        player.make_turn(random.choice(player.hand))
+
+    def judge(self) -> None:
+        state = self.lobby.state
+        # The winner is picked already when the next turn is about to start
+        if (
+            not isinstance(state, Judgement)
+            or state.winner
+            or self.player is not self.lobby.lead
+        ):
+            return
+        for card_on_table in self.lobby.table:
+            self.player.open_table_card(card_on_table)
+        self.player.pick_turn_winner(random.choice(self.lobby.table).card)
+
+    def continue_game(self) -> None:
+        if isinstance(self.lobby.state, Finished) and self.player is self.lobby.owner:
+            self.player.continue_game()
+
+
+class SimulatedLobby(LobbyMonitor):
+    def __init__(self, simulation: Simulation, index: int) -> None:
+        self.simulation = simulation
+        self.index = index
+        self.changed_at = 0.0
+        self.next_player = 0
+        self.churning = False
+        settings = simulation.settings
+
+        owner = self._new_player()
+        self.lobby = Lobby(owner=owner, state=Gathering())
+        self.lobby.monitor = self
+        for player in [
+            owner,
+            *(self._new_player() for _ in range(settings.players - 1)),
+        ]:
+            self._join(player)
+
+        self.punchlines_count = settings.punchlines
+        owner.start_game(
+            LobbySettings(
+                turn_duration=settings.turn_duration,
+                winning_score=settings.winning_score,
+            ),
+            Deck(
+                cards=[
+                    SetupCard(
+                        id=i, text="Setup ____", case="nom", starts_with_punchline=False
+                    )
+                    for i in range(settings.setups)
+                ]
+            ),
+            Deck(
+                cards=[
+                    PunchlineCard(id=i, text=[("punchline", ["nom"])])
+                    for i in range(settings.punchlines)
+                ]
+            ),
+        )
+        self._schedule_churn()
+
+    def state_changed(self, old_state: State, new_state: State) -> None:
+        self.changed_at = self.simulation.loop.time()
+        self.simulation.transitions[type(new_state).__name__] += 1
+        if isinstance(new_state, Turns):
+            self.simulation.turn_done()
+
+    def _new_player(self) -> Player:
+        self.next_player += 1
+        return Player(
+            name=f"player {self.index}-{self.next_player}",
+            emoji="🤖",
+            token=f"{self.index}-{self.next_player}",
+        )
+
+    def _join(self, player: Player) -> None:
+        self.lobby.add_player(player)
+        player.connect(SimulatedPlayer(self.simulation, player))
+
+    def _schedule_churn(self) -> None:
+        if interval := self.simulation.settings.churn_interval:
+            self.simulation.call_later(random.expovariate(1 / interval), self._churn)
+
+    def _churn(self) -> None:
+        self._schedule_churn()
+        # Keep enough players connected for turns to end with cards on table
+        candidates = [p for p in self.lobby.players if p.is_connected]
+        if self.churning or len(candidates) < 3:
+            return
+
+        player = random.choice(candidates)
+        self.churning = True
+        player.disconnect()
+        self.simulation.disconnects += 1
+        self.simulation.call_later(
+            random.expovariate(1 / self.simulation.settings.reconnect_delay),
+            lambda: self._come_back(player),
+        )
+
+    def _come_back(self, player: Player) -> None:
+        self.churning = False
+        # The domain can't remove the lead yet, the lead always returns
+        if player is not self.lobby.lead and (
+            random.random() < self.simulation.settings.leave_rate
+        ):
+            self.lobby.remove_player(player)
+            self._join(self._new_player())
+            self.simulation.replacements += 1
+        else:
+            player.connect(SimulatedPlayer(self.simulation, player))
+
+    def deck_stats(self) -> tuple[int, int, int]:
+        """Punchlines in the deck, in the dump, and lost from circulation."""
+        assert self.lobby.game
+        punchlines = self.lobby.game.punchlines
+        in_play = sum(len(p.hand) for p in self.lobby.all_players) + len(
+            self.lobby.table
+        )
+        available, dumped = len(punchlines.cards), len(punchlines._dump)
+        return available, dumped, self.punchlines_count - available - dumped - in_play
+
+
+class Simulation:
+    def __init__(self, loop: VirtualTimeLoop, settings: SimulationSettings) -> None:
+        self.loop = loop
+        self.settings = settings
+        self.lobbies: list[SimulatedLobby] = []
+        self.turns = 0
+        self.transitions: Counter[str] = Counter()
+        self.disconnects = 0
+        self.replacements = 0
+        self.errors: Counter[str] = Counter()
+        self.done = asyncio.Event()
+        self.started_at = time.perf_counter()
+        self.baseline: dict[str, float] = {}
+        loop.set_exception_handler(self._exception_handler)
+
+    def call_later(self, delay: float, callback: Callable[[], None]) -> None:
+        def run() -> None:
+            try:
+                callback()
+            except (CardsAgainstError, AssertionError, LookupError) as exception:
+                # Moves a racing timer made illegal, anything else goes to
+                # the loop's exception handler
+                self.errors[type(exception).__name__] += 1
+
+        self.loop.call_later(delay, run)
+
+    def _exception_handler(
+        self, loop: asyncio.AbstractEventLoop, context: dict
+    ) -> None:
+        exception = context.get("exception")
+        self.errors[type(exception).__name__ if exception else "unknown"] += 1
+        if exception:
+            logger.error(context["message"], exc_info=exception)
+
+    def turn_done(self) -> None:
+        self.turns += 1
+        if self.turns >= self.settings.turns:
+            self.done.set()
+
+    async def run(self) -> None:
+        for index in range(self.settings.lobbies):
+            self.lobbies.append(SimulatedLobby(self, index))
+        self.baseline = self.sample()
+        print(self.format(self.baseline))
+
+        reporter = asyncio.create_task(self._report_periodically())
+        await self.done.wait()
+        reporter.cancel()
+        print(self.format(self.sample()))
+
+    async def _report_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.settings.report_interval)
+            print(self.format(self.sample()))
+
+    def sample(self) -> dict[str, float]:
+        now = self.loop.time()
+        available = dumped = lost = grave = stalled = 0
+        for simulated in self.lobbies:
+            deck = simulated.deck_stats()
+            available += deck[0]
+            dumped += deck[1]
+            lost += deck[2]
+            grave += len(simulated.lobby.grave)
+            stalled += now - simulated.changed_at > self.settings.report_interval
+        return {
+            "virtual_hours": now / 3600,
+            "wall_seconds": time.perf_counter() - self.started_at,
+            "turns": self.turns,
+            "games_finished": self.transitions["Finished"],
+            "disconnects": self.disconnects,
+            "replacements": self.replacements,
+            "errors": sum(self.errors.values()),
+            "stalled_lobbies": stalled,
+            "tasks": len(asyncio.all_tasks(self.loop)),
+            "timers": len(self.loop._scheduled),  # type: ignore[attr-defined]
+            "gc_objects": len(gc.get_objects()),
+            "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            "grave_players": grave,
+            "punchlines_available": available,
+            "punchlines_dumped": dumped,
+            "punchlines_lost": lost,
+        }
+
+    def format(self, sample: dict[str, float]) -> str:
+        growth = sample["gc_objects"] - self.baseline.get(
+            "gc_objects", sample["gc_objects"]
+        )
+        turns_per_sec = sample["turns"] / max(sample["wall_seconds"], 1e-9)
+        errors = ", ".join(f"{name}={count}" for name, count in self.errors.items())
+        return (
+            f"{sample['virtual_hours']:8.1f}h virtual {sample['wall_seconds']:7.1f}s wall "
+            f"turns={sample['turns']:,} ({turns_per_sec:,.0f}/s) "
+            f"games={sample['games_finished']:,} "
+            f"churn={sample['disconnects']:,}/{sample['replacements']:,} "
+            f"tasks={sample['tasks']:,} timers={sample['timers']:,} "
+            f"objects={sample['gc_objects']:,} ({growth:+,}) "
+            f"rss={sample['max_rss_mb']:,.0f}MB "
+            f"grave={sample['grave_players']:,} "
+            f"punchlines={sample['punchlines_available']:,}"
+            f"/{sample['punchlines_dumped']:,}/lost {sample['punchlines_lost']:,} "
+            f"stalled={sample['stalled_lobbies']:,} errors={sample['errors']:,}"
+            + (f" [{errors}]" if errors else "")
+        )
+
+
+def main() -> None:
+    defaults = SimulationSettings()
+    parser = argparse.ArgumentParser(description=__doc__)
+    for name, value in vars(defaults).items():
+        parser.add_argument(
+            f"--{name.replace('_', '-')}", type=type(value), default=value
+        )
+    parser.add_argument("--seed", type=int, default=None)
+    args = vars(parser.parse_args())
+
+    random.seed(args.pop("seed"))
+    loop = VirtualTimeLoop()
+    simulation = Simulation(loop, SimulationSettings(**args))
+    try:
+        loop.run_until_complete(simulation.run())
+    finally:
+        loop.close()
+
+
+if __name__ == "__main__":
+    main()
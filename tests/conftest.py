@@ -1,7 +1,6 @@
 from unittest.mock import Mock
 
 import pytest
-from cardsagainst_backend.config import config
 
 from cardsagainst.lobby import (
     Deck,
@@ -13,6 +12,7 @@ from cardsagainst.lobby import (
     PunchlineCard,
     SetupCard,
 )
+from cardsagainst_backend.config import config
 
 
 @pytest.fixture(scope="session", autouse=True)
@@ -0,0 +1,106 @@
+import json
+import time
+from collections.abc import AsyncIterator, Iterator
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from cardsagainst.lobby import Lobby
+from cardsagainst_backend.admin import router
+from cardsagainst_backend.config import config
+from cardsagainst_backend.dependencies import game_stats_dao_dependency
+from cardsagainst_backend.integration import lobbies
+from cardsagainst_backend.memory_dao import MemoryGameStatsDAO
+
+
+@pytest.fixture
+def admin_token() -> Iterator[str]:
+    config.set("admin_token", "secret")
+    yield "secret"
+    config.set("admin_token", "")
+
+
+@pytest.fixture
+def game_stats_dao() -> MemoryGameStatsDAO:
+    dao = MemoryGameStatsDAO()
+    dao.rows = [
+        {"kind": "turn_ended", "created_at": time.time(), "turn_count": number}
+        for number in range(5)
+    ]
+    return dao
+
+
+@pytest.fixture
+async def client(
+    admin_token: str, game_stats_dao: MemoryGameStatsDAO
+) -> AsyncIterator[AsyncClient]:
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[game_stats_dao_dependency] = lambda: game_stats_dao
+    async with AsyncClient(
+        transport=ASGITransport(app=app),
+        base_url="http://test",
+        headers={"Authorization": f"Bearer {admin_token}"},
+    ) as client:
+        yield client
+
+
+@pytest.fixture
+def quiet_lobby(lobby: Lobby) -> Iterator[str]:
+    lobbies["quiet"] = lobby
+    yield "quiet"
+    del lobbies["quiet"]
+
+
+@pytest.mark.parametrize("mode", ["sample", "cprofile", "pstats"])
+async def test_profile_lobby_without_commands(
+    client: AsyncClient, quiet_lobby: str, mode: str
+) -> None:
+    response = await client.post(
+        "/admin/profile",
+        params={"seconds": 0.02, "mode": mode, "lobbyToken": quiet_lobby},
+    )
+    assert response.status_code == 409
+
+
+async def test_profile_unknown_lobby(client: AsyncClient) -> None:
+    response = await client.post(
+        "/admin/profile", params={"seconds": 0.02, "lobbyToken": "nope"}
+    )
+    assert response.status_code == 404
+
+
+async def test_profile_loop(client: AsyncClient) -> None:
+    response = await client.post(
+        "/admin/profile", params={"seconds": 0.02, "mode": "cprofile"}
+    )
+    assert response.status_code == 200
+    assert "function calls" in response.text
+
+
+@pytest.fixture
+def small_pages() -> Iterator[None]:
+    page_size = config.stats_export_page_size
+    config.set("stats_export_page_size", 2)
+    yield
+    config.set("stats_export_page_size", page_size)
+
+
+@pytest.mark.parametrize(
+    ("params", "ids"),
+    [
+        ({"afterId": 1}, [2, 3, 4, 5]),
+        ({"afterId": 1, "limit": 3}, [2, 3, 4]),
+        ({"afterId": 4}, [5]),
+        ({"afterId": 5}, []),
+    ],
+)
+async def test_export_after_id_across_pages(
+    client: AsyncClient, small_pages: None, params: dict, ids: list[int]
+) -> None:
+    response = await client.get("/admin/stats/export", params=params)
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["id"] for row in rows] == ids
+    assert [row["turn_count"] for row in rows] == [i - 1 for i in ids]
@@ -0,0 +1,91 @@
+import gc
+
+import pytest
+
+from cardsagainst.deck import PunchlineCard, SetupCard
+from cardsagainst.game import Game
+from cardsagainst.settings import LobbySettings
+from cardsagainst_backend import metrics
+from cardsagainst_backend.catalog import (
+    Catalog,
+    Catalogs,
+    DeckTooSmallError,
+    UnknownDeckError,
+)
+from cardsagainst_backend.memory_dao import MemoryCardsDAO
+
+SETUPS = [SetupCard(id=1, text="", case="nom", starts_with_punchline=False)]
+
+
+@pytest.fixture
+def catalogs() -> Catalogs:
+    return Catalogs()
+
+
+def start_game(catalogs: Catalogs) -> Game:
+    catalog = catalogs.current
+    setups, punchlines = catalog.deal()
+    game = Game(
+        punchlines=punchlines, setups=setups, settings=LobbySettings(winning_score=3)
+    )
+    catalogs.attach(game, catalog)
+    return game
+
+
+async def test_load_is_stable() -> None:
+    cards_dao = MemoryCardsDAO(5, 10)
+    first = await Catalog.load(cards_dao)
+    second = await Catalog.load(cards_dao)
+    assert first.version == second.version
+    assert [card.id for card in first.setups] == list(range(5))
+    assert first.version != (await Catalog.load(MemoryCardsDAO(5, 11))).version
+
+
+async def test_deal_decks() -> None:
+    catalog = await Catalog.load(MemoryCardsDAO(6, 12, decks_count=3))
+    setups, punchlines = catalog.deal(["deck-0", "deck-2"])
+    assert sorted(card.id for card in setups.cards) == [0, 2, 3, 5]
+    assert sorted(punchlines.mapping) == [0, 2, 3, 5, 6, 8, 9, 11]
+    # Shuffling one game's deck leaves the shared view alone
+    assert catalog.deal(["deck-2", "deck-0"])[1].mapping is punchlines.mapping
+    assert len(catalog.deal()[0].cards) == 6
+    with pytest.raises(UnknownDeckError):
+        catalog.deal(["deck-0", "deck-9"])
+
+
+def test_deal_too_small() -> None:
+    punchlines = [PunchlineCard(id=i, text=[("a", ["nom"])]) for i in range(4)]
+    # Punchlines imported into a deck of their own
+    catalog = Catalog("v1", SETUPS, punchlines, {"pack": ([], [0, 1])})
+    with pytest.raises(DeckTooSmallError):
+        catalog.deal(["pack"])
+    assert catalog.deal(punchlines_needed=4)
+    with pytest.raises(DeckTooSmallError):
+        catalog.deal(punchlines_needed=5)
+
+
+def test_games_keep_their_version(catalogs: Catalogs) -> None:
+    live = metrics.catalog_versions.values.get((), 0)
+    catalogs.swap(Catalog("v1", SETUPS, []))
+    old_game = start_game(catalogs)
+    catalogs.swap(Catalog("v2", SETUPS, []))
+    new_game = start_game(catalogs)
+    assert catalogs.as_dict() == {
+        "current": "v2",
+        "decks": [],
+        "games": {"v1": 1, "v2": 1},
+    }
+    assert metrics.catalog_versions.values[()] == live + 2
+
+    del old_game
+    gc.collect()
+    assert catalogs.as_dict() == {"current": "v2", "decks": [], "games": {"v2": 1}}
+    assert metrics.catalog_versions.values[()] == live + 1
+    assert new_game
+
+
+def test_swap_same_version(catalogs: Catalogs) -> None:
+    first = Catalog("v1", SETUPS, [])
+    catalogs.swap(first)
+    catalogs.swap(Catalog("v1", SETUPS, []))
+    assert catalogs.current is first
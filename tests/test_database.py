@@ -1,13 +1,22 @@
-from typing import AsyncGenerator
+import datetime
+from collections.abc import AsyncGenerator
 
 import pytest
 from sqlalchemy import insert, select
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
-from cardsagainst_backend.dao import CardsDAO
-from cardsagainst_backend.db import create_engine, create_tables_if_not_exist
 from cardsagainst.deck import PunchlineCard, SetupCard
-from cardsagainst_backend.models import Punchline, Setup, metadata
+from cardsagainst_backend.dao import CardsDAO, ExportFilters, GameStatsDAO
+from cardsagainst_backend.db import create_engine
+from cardsagainst_backend.migrations import migrate
+from cardsagainst_backend.models import (
+    CardDeck,
+    DeckPunchline,
+    DeckSetup,
+    Punchline,
+    Setup,
+    metadata,
+)
 
 
 @pytest.fixture
@@ -15,7 +24,7 @@ async def async_session() -> async_sessionmaker:
     engine = create_engine()
     async with engine.begin() as conn:
         await conn.run_sync(metadata.drop_all)
-    await create_tables_if_not_exist(engine)
+    await migrate(engine)
     return async_sessionmaker(engine)
 
 
@@ -60,11 +69,66 @@ async def test_insert_setup_card(session: AsyncSession) -> None:
 
 @pytest.mark.usefixtures("setup_card")
 async def test_get_setups(cards_dao: CardsDAO) -> None:
-    deck = await cards_dao.get_setups("123")
+    deck = await cards_dao.get_setups()
     assert isinstance(deck.get_card(), SetupCard)
 
 
 @pytest.mark.usefixtures("punchline_card")
 async def test_get_punchlines(cards_dao: CardsDAO) -> None:
-    deck = await cards_dao.get_punchlines("123")
+    deck = await cards_dao.get_punchlines()
     assert isinstance(deck.get_card(), PunchlineCard)
+
+
+@pytest.mark.usefixtures("setup_card", "punchline_card")
+async def test_get_decks(session: AsyncSession, cards_dao: CardsDAO) -> None:
+    await session.execute(insert(CardDeck).values(id="one", name="One"))
+    await session.execute(insert(CardDeck).values(id="two", name="Two"))
+    await session.execute(insert(DeckSetup).values(deck_id="one", setup_id=1))
+    await session.execute(insert(DeckPunchline).values(deck_id="two", punchline_id=1))
+    await session.commit()
+
+    assert await cards_dao.get_decks() == {"one": ([1], []), "two": ([], [1])}
+    assert len((await cards_dao.get_setups("one")).cards) == 1
+    assert not (await cards_dao.get_setups("two")).cards
+    assert len((await cards_dao.get_punchlines("two")).cards) == 1
+
+
+async def test_export_game_events(async_session: async_sessionmaker) -> None:
+    game_stats_dao = GameStatsDAO(async_session)
+    for index in range(5):
+        game_stats_dao.add(
+            {
+                "game_id": "game",
+                "kind": "started" if index % 2 else "turn_ended",
+                "created_at": 1_700_000_000 + index * 3600,
+                "players": 3,
+                "turn_count": index,
+                "winning_score": 10,
+                "turn_duration": 60,
+                "winner_score": None,
+                "duration": None,
+            }
+        )
+    await game_stats_dao.flush()
+
+    pages = [
+        [row["id"] for row in rows]
+        async for rows in game_stats_dao.export(
+            True, ExportFilters(), after_id=1, page_size=2
+        )
+    ]
+    assert pages == [[2, 3], [4, 5]]
+
+    filters = ExportFilters(
+        since=datetime.datetime(2023, 11, 14, 23, tzinfo=datetime.UTC),
+        kind="turn_ended",
+    )
+    rows = [row async for rows in game_stats_dao.export(True, filters) for row in rows]
+    assert [row["turn_count"] for row in rows] == [2, 4]
+
+    stats = [
+        row
+        async for rows in game_stats_dao.export(False, ExportFilters(), limit=1)
+        for row in rows
+    ]
+    assert stats == [{"id": 1, "winning_score": 10, "turn_duration": 60}]
@@ -0,0 +1,110 @@
+import asyncio
+import json
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from cardsagainst_backend.memory_dao import MemoryGameStatsDAO
+
+
+class FlakyGameStatsDAO(MemoryGameStatsDAO):
+    """Fails inserts while `failing`, or on the insert numbered `fail_on`"""
+
+    def __init__(self, spill_file: Path) -> None:
+        super().__init__()
+        self.spill_file = str(spill_file)
+        self.batch_size = 2
+        self.failing = False
+        self.fail_on: int | None = None
+        self.inserts = 0
+        self.blocked: asyncio.Event | None = None
+
+    async def _insert(self, rows: list[dict[str, Any]]) -> None:
+        self.inserts += 1
+        if self.blocked:
+            await self.blocked.wait()
+        if self.failing or self.inserts == self.fail_on:
+            raise ConnectionError("database is down")
+        await super()._insert(rows)
+
+
+def row(number: int) -> dict[str, Any]:
+    return {"kind": "finished", "number": number}
+
+
+def spilled(path: Path) -> list[int]:
+    return [json.loads(line)["number"] for line in path.read_text().splitlines()]
+
+
+@pytest.fixture
+def spill_file(tmp_path: Path) -> Path:
+    return tmp_path / "spill.jsonl"
+
+
+@pytest.fixture
+def dao(spill_file: Path) -> FlakyGameStatsDAO:
+    return FlakyGameStatsDAO(spill_file)
+
+
+async def test_flush_full_batch(dao: FlakyGameStatsDAO) -> None:
+    dao.add(row(1))
+    await asyncio.sleep(0)
+    assert dao.rows == []
+    dao.add(row(2))
+    dao.add(row(3))
+    await asyncio.sleep(0)
+    assert dao.rows == [row(1), row(2), row(3)]
+
+
+async def test_spill_and_retry(dao: FlakyGameStatsDAO, spill_file: Path) -> None:
+    dao.failing = True
+    for number in range(1, 4):
+        dao.add(row(number))
+        await dao.flush()
+    assert spilled(spill_file) == [1, 2, 3]
+
+    dao.failing = False
+    dao.add(row(4))
+    await dao.flush()
+    # New rows first, then the spill a batch per insert
+    assert [record["number"] for record in dao.rows] == [4, 1, 2, 3]
+    assert dao.inserts == 6
+    assert not spill_file.exists()
+
+
+async def test_compact_partly_retried_spill(
+    dao: FlakyGameStatsDAO, spill_file: Path
+) -> None:
+    spill_file.write_text("".join(json.dumps(row(n)) + "\n" for n in range(1, 6)))
+    dao.fail_on = 2
+    await dao.flush()
+    assert [record["number"] for record in dao.rows] == [1, 2]
+    assert spilled(spill_file) == [1, 2, 3, 4, 5]
+
+    dao.failing = True
+    await dao.close()
+    assert spilled(spill_file) == [3, 4, 5]
+
+
+async def test_cancelled_insert_spills(
+    dao: FlakyGameStatsDAO, spill_file: Path
+) -> None:
+    dao.blocked = asyncio.Event()
+    dao.add(row(1))
+    flush = asyncio.create_task(dao.flush())
+    await asyncio.sleep(0)
+    flush.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await flush
+    assert spilled(spill_file) == [1]
+
+
+async def test_close_stops_run(dao: FlakyGameStatsDAO) -> None:
+    dao.flush_interval = 60
+    run = asyncio.create_task(dao.run())
+    dao.add(row(1))
+    await asyncio.sleep(0)
+    await dao.close()
+    await asyncio.wait_for(run, 1)
+    assert dao.rows == [row(1)]
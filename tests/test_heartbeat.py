@@ -0,0 +1,38 @@
+from unittest.mock import Mock
+
+from cardsagainst_backend.heartbeat import Heartbeat
+
+
+def remote_player() -> Mock:
+    player = Mock(spec=["missed_beats", "ping", "expire"])
+    player.missed_beats = 0
+    return player
+
+
+def test_beat_expires_after_missed_limit() -> None:
+    heartbeat = Heartbeat(interval=10, missed_limit=2)
+    silent, answering = remote_player(), remote_player()
+    heartbeat.watch(silent)
+    heartbeat.watch(answering)
+
+    for _ in range(3):
+        heartbeat.beat()
+        # Any inbound message resets the count
+        answering.missed_beats = 0
+
+    assert silent.ping.call_count == 2
+    silent.expire.assert_called_once_with()
+    assert answering.ping.call_count == 3
+    answering.expire.assert_not_called()
+
+    heartbeat.beat()
+    assert silent.ping.call_count == 2
+
+
+def test_disabled() -> None:
+    heartbeat = Heartbeat(interval=0, missed_limit=2)
+    player = remote_player()
+    heartbeat.watch(player)
+    heartbeat.beat()
+    assert not heartbeat.enabled
+    player.ping.assert_not_called()
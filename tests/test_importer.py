@@ -0,0 +1,81 @@
+import json
+from pathlib import Path
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from cardsagainst_backend.db import create_engine
+from cardsagainst_backend.importer import CardImportError, import_cards
+from cardsagainst_backend.migrations import migrate
+from cardsagainst_backend.models import DeckPunchline, Punchline, Setup, metadata
+
+
+@pytest.fixture
+async def engine() -> AsyncEngine:
+    engine = create_engine()
+    async with engine.begin() as conn:
+        await conn.run_sync(metadata.drop_all)
+    await migrate(engine)
+    return engine
+
+
+@pytest.fixture
+def setups_csv(tmp_path: Path) -> Path:
+    path = tmp_path / "setups.csv"
+    path.write_text(
+        "id,text,variant,starts_with_punchline\n"
+        "5,Что ____?,nom,false\n"
+        ",____ всегда,acc,1\n"
+    )
+    return path
+
+
+async def test_import_setups(engine: AsyncEngine, setups_csv: Path) -> None:
+    assert await import_cards(engine, "setups", setups_csv) == 2
+    async with engine.connect() as conn:
+        rows = (await conn.execute(select(Setup.id, Setup.variant))).all()
+    assert sorted(rows) == [(5, "nom"), (6, "acc")]
+
+
+async def test_import_upsert(engine: AsyncEngine, setups_csv: Path) -> None:
+    await import_cards(engine, "setups", setups_csv)
+    setups_csv.write_text(
+        "id,text,variant,starts_with_punchline\n5,Где ____?,prep,false\n"
+    )
+    await import_cards(engine, "setups", setups_csv, upsert=True)
+    async with engine.connect() as conn:
+        text = await conn.scalar(select(Setup.text).where(Setup.id == 5))
+    assert text == "Где ____?"
+
+
+async def test_import_punchlines_into_deck(engine: AsyncEngine, tmp_path: Path) -> None:
+    path = tmp_path / "pack.ndjson"
+    path.write_text(
+        json.dumps({"variants": [["пиво", ["nom", "acc"]], ["пива", ["gen"]]]})
+        + "\n\n"
+        + json.dumps({"id": 10, "variants": [["кот", ["nom"]]]})
+        + "\n"
+    )
+    assert await import_cards(engine, "punchlines", path, deck="pack") == 2
+    async with engine.connect() as conn:
+        variants = await conn.scalar(
+            select(Punchline.variants).where(Punchline.id == 10)
+        )
+        deck = (await conn.execute(select(DeckPunchline.punchline_id))).scalars()
+        assert variants == [["кот", ["nom"]]]
+        assert sorted(deck) == [10, 11]
+
+
+@pytest.mark.parametrize(
+    "row", ["1,Что?,nominative,false", "1,Что?,nom,maybe", "1,,nom,false"]
+)
+async def test_import_invalid_row(
+    engine: AsyncEngine, setups_csv: Path, row: str
+) -> None:
+    with setups_csv.open("a") as file:
+        file.write(row + "\n")
+    with pytest.raises(CardImportError, match="row 3"):
+        await import_cards(engine, "setups", setups_csv, batch_size=1)
+    async with engine.connect() as conn:
+        assert not (await conn.execute(select(Setup))).all()
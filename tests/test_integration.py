@@ -0,0 +1,139 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+
+from cardsagainst.lobby import (
+    Deck,
+    Finished,
+    Gathering,
+    Judgement,
+    Lobby,
+    LobbySettings,
+    Player,
+    PunchlineCard,
+    SetupCard,
+)
+from cardsagainst_backend import metrics
+from cardsagainst_backend.accounting import LobbyStats
+from cardsagainst_backend.catalog import Catalog, catalogs
+from cardsagainst_backend.integration import (
+    RemotePlayer,
+    lobbies,
+    lobby_stats,
+    remove_player,
+)
+from cardsagainst_backend.memory_dao import MemoryCardsDAO
+from simulation.loop import VirtualTimeLoop
+
+
+@pytest.fixture
+async def catalog(monkeypatch: pytest.MonkeyPatch) -> Catalog:
+    # 2 decks of 5 punchlines, too few for two hands of 10
+    catalog = await Catalog.load(MemoryCardsDAO(4, 10, 2))
+    monkeypatch.setattr(catalogs, "_current", catalog)
+    return catalog
+
+
+@pytest.fixture
+def websocket() -> AsyncMock:
+    return AsyncMock()
+
+
+@pytest.fixture
+def remote_egor(
+    websocket: AsyncMock,
+    catalog: Catalog,
+    lobby: Lobby,
+    egor: Player,
+    egor_joined: None,
+    anton_joined: None,
+) -> RemotePlayer:
+    remote_player = RemotePlayer(
+        websocket=websocket,
+        lobby=lobby,
+        lobby_token="lobby-token",
+        player=egor,
+        stats=LobbyStats(),
+    )
+    egor.connect(remote_player)
+    return remote_player
+
+
+def start_game(deck_ids: list[str]) -> dict:
+    return {"id": 1, "type": "startGame", "data": {"deckIds": deck_ids}}
+
+
+async def test_start_game_unknown_deck(
+    remote_egor: RemotePlayer, websocket: AsyncMock
+) -> None:
+    await remote_egor.handle_event(start_game(["deck-0", "nope"]))
+
+    websocket.send_json.assert_awaited_once_with(
+        {"type": "error", "data": {"status": 404, "message": "Deck not found: nope"}}
+    )
+    assert isinstance(remote_egor.lobby.state, Gathering)
+
+
+async def test_start_game_deck_too_small(
+    remote_egor: RemotePlayer, websocket: AsyncMock
+) -> None:
+    await remote_egor.handle_event(start_game(["deck-0"]))
+
+    websocket.send_json.assert_awaited_once_with(
+        {
+            "type": "error",
+            "data": {
+                "status": 400,
+                "message": "Not enough cards: setups=2 punchlines=5",
+            },
+        }
+    )
+    assert isinstance(remote_egor.lobby.state, Gathering)
+
+
+def test_lobbies_gauge_after_delete(
+    lobby: Lobby,
+    egor_connected: None,
+    anton_connected: None,
+    yura_connected: None,
+    setup_deck: Deck[SetupCard],
+    punchline_deck: Deck[PunchlineCard],
+    lobby_settings: LobbySettings,
+) -> None:
+    before = dict(metrics.lobbies.values)
+    # Registered the way the join endpoint does it
+    lobby.monitor = lobby_stats["counted"] = LobbyStats()
+    lobbies["counted"] = lobby
+    metrics.lobbies.inc(type(lobby.state).__name__)
+    lobby_settings.finish_delay = 5
+
+    async def leave_before_finish() -> None:
+        assert lobby.owner
+        lobby.owner.start_game(lobby_settings, setup_deck, punchline_deck)
+        for player in lobby.players:
+            player.make_turn(player.hand[0])
+        lead = lobby.lead
+        assert lead
+        for card_on_table in list(lobby.table):
+            lead.open_table_card(card_on_table)
+        lead.pick_turn_winner(lobby.table[0].card)
+        assert isinstance(lobby.state, Judgement)
+        for player in lobby.all_players:
+            remove_player(lobby, player, "counted")
+        # The finish timer still fires for the deleted lobby
+        await asyncio.sleep(10)
+
+    loop = VirtualTimeLoop()
+    try:
+        loop.run_until_complete(leave_before_finish())
+    finally:
+        loop.close()
+
+    assert "counted" not in lobbies
+    assert isinstance(lobby.state, Finished)
+    assert {
+        labels: value
+        for labels, value in metrics.lobbies.values.items()
+        if value or labels in before
+    } == before
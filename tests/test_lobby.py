@@ -1,6 +1,6 @@
 import asyncio
 from unittest.mock import ANY, Mock, call
-from dataclasses import replace
+
 import pytest
 
 from cardsagainst.lobby import (
@@ -8,17 +8,18 @@ from cardsagainst.lobby import (
     Deck,
     Judgement,
     Lobby,
+    LobbyMonitor,
     LobbyObserver,
     LobbySettings,
     NotAllCardsOpenedError,
     Player,
+    PlayerAlreadyReadyError,
     PlayerNotLeadError,
     PlayerNotOwnerError,
     PunchlineCard,
+    ScoreTooLowError,
     SetupCard,
     Turns,
-    PlayerAlreadyReadyError,
-    ScoreTooLowError,
 )
 
 
@@ -491,3 +492,37 @@ async def test_owner_is_unset_if_all_players_left(
     assert not lobby.owner
     lobby.connect(egor)
     assert egor is lobby.owner
+
+
+@pytest.mark.usefixtures(
+    "egor_connected", "yura_connected", "anton_connected", "game_started"
+)
+def test_not_ready_player_disconnected(
+    lobby: Lobby, anton: Player, yura: Player
+) -> None:
+    yura.make_turn(yura.hand[0])
+    anton.disconnect()
+    assert isinstance(lobby.state, Judgement)
+
+
+@pytest.mark.usefixtures(
+    "egor_connected", "yura_connected", "anton_connected", "game_started"
+)
+def test_disconnect_before_any_turn_made(
+    lobby: Lobby, anton: Player, yura: Player
+) -> None:
+    anton.disconnect()
+    assert isinstance(lobby.state, Turns)
+    yura.disconnect()
+    assert isinstance(lobby.state, Turns)
+
+
+@pytest.mark.usefixtures("egor_connected", "yura_connected", "game_started")
+async def test_timer_fired(lobby: Lobby, egor: Player, yura: Player) -> None:
+    lobby.monitor = monitor = Mock(LobbyMonitor)
+    card_on_table = yura.make_turn(yura.hand[0])
+    egor.open_table_card(card_on_table)
+    egor.pick_turn_winner(card_on_table.card)
+    await asyncio.sleep(0.01)
+
+    monitor.timer_fired.assert_called_once_with("finish_game")
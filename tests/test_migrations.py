@@ -0,0 +1,79 @@
+import pytest
+from sqlalchemy import Connection, event, inspect, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from cardsagainst_backend.db import create_engine
+from cardsagainst_backend.migrations import MIGRATIONS, get_version, migrate
+from cardsagainst_backend.models import metadata
+
+
+@pytest.fixture
+async def engine() -> AsyncEngine:
+    engine = create_engine()
+    async with engine.begin() as conn:
+        await conn.run_sync(metadata.drop_all)
+    return engine
+
+
+async def indexes(engine: AsyncEngine, table: str) -> list[str]:
+    async with engine.connect() as conn:
+        return await conn.run_sync(
+            lambda conn: [
+                name
+                for index in inspect(conn).get_indexes(table)
+                if (name := index["name"])
+            ]
+        )
+
+
+async def test_migrate_empty(engine: AsyncEngine) -> None:
+    assert await migrate(engine) == len(MIGRATIONS)
+    assert await get_version(engine) == len(MIGRATIONS)
+    assert await indexes(engine, "changelog") == ["ix_changelog_version"]
+
+
+async def test_migrate_current(engine: AsyncEngine) -> None:
+    await migrate(engine)
+    statements: list[str] = []
+    event.listen(
+        engine.sync_engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement),
+    )
+    assert await migrate(engine) == 0
+    assert len(statements) == 1
+
+
+async def test_migrate_tables_from_create_all(engine: AsyncEngine) -> None:
+    # Databases from before migrations have the tables without indexes
+    async with engine.begin() as conn:
+        await conn.run_sync(metadata.create_all)
+        await conn.execute(text("DROP TABLE schema_version"))
+        await conn.execute(text("DROP INDEX ix_changelog_version"))
+    assert await migrate(engine) == len(MIGRATIONS)
+    assert await indexes(engine, "changelog") == ["ix_changelog_version"]
+
+
+async def test_migrations_match_models(engine: AsyncEngine) -> None:
+    # A model change without a migration for it fails here
+    await migrate(engine)
+
+    def schema(conn: Connection) -> dict[str, tuple[list[str], list[str]]]:
+        inspector = inspect(conn)
+        return {
+            table: (
+                sorted(column["name"] for column in inspector.get_columns(table)),
+                sorted(str(index["name"]) for index in inspector.get_indexes(table)),
+            )
+            for table in inspector.get_table_names()
+        }
+
+    async with engine.connect() as conn:
+        migrated = await conn.run_sync(schema)
+    assert migrated == {
+        table.name: (
+            sorted(column.name for column in table.columns),
+            sorted(str(index.name) for index in table.indexes),
+        )
+        for table in metadata.tables.values()
+    }
@@ -0,0 +1,59 @@
+import asyncio
+import gc
+import weakref
+from functools import partial
+from unittest.mock import Mock
+
+from cardsagainst_backend.removals import PendingRemovals
+
+
+async def test_reap_in_deadline_order() -> None:
+    removals = PendingRemovals(delay=10)
+    removed: list[str] = []
+    for token in ("a", "b", "c"):
+        removals.schedule(token, partial(removed.append, token))
+    removals.cancel("b")
+    # Rescheduling moves the deadline, the old entry is skipped
+    removals.schedule("a", lambda: removed.append("a again"))
+
+    now = asyncio.get_running_loop().time()
+    removals.reap(now)
+    assert removed == []
+    removals.reap(now + 20)
+    assert removed == ["c", "a again"]
+    assert len(removals) == 0
+    assert "a" not in removals
+
+
+async def test_cancel_drops_callback() -> None:
+    removals = PendingRemovals(delay=10)
+    callback = Mock()
+    ref = weakref.ref(callback)
+    removals.schedule("a", callback)
+    removals.cancel("a")
+    del callback
+    gc.collect()
+    assert ref() is None
+
+
+async def test_cancel_compacts_heap() -> None:
+    removals = PendingRemovals(delay=10)
+    for number in range(100):
+        removals.schedule(str(number), Mock())
+    for number in range(99):
+        removals.cancel(str(number))
+    # Stale entries are bounded by the live ones, not by every cancel
+    assert len(removals._heap) <= 2 * len(removals) + 64 < 100
+    assert [removal.token for removal in removals._heap if removal.callback] == ["99"]
+
+
+async def test_run_wakes_up_for_earlier_deadline() -> None:
+    removals = PendingRemovals(delay=60)
+    run = asyncio.create_task(removals.run())
+    await asyncio.sleep(0)
+    removals.delay = 0.01
+    callback = Mock()
+    removals.schedule("a", callback)
+    await asyncio.sleep(0.05)
+    run.cancel()
+    callback.assert_called_once_with()
@@ -0,0 +1,112 @@
+import asyncio
+from pathlib import Path
+from typing import Any
+
+from cardsagainst.deck import Deck, PunchlineCard, SetupCard
+from cardsagainst.lobby import Finished, Gathering, Lobby, LobbyObserver, Player
+from cardsagainst.settings import LobbySettings
+from cardsagainst_backend.recorder import Recorder
+from simulation.loop import VirtualTimeLoop
+from simulation.replay import read_log, replay_engine
+
+
+class RecordedLobby:
+    """Drives a lobby and records it the way the integration does"""
+
+    def __init__(self, recorder: Recorder) -> None:
+        self.recorder = recorder
+        self.lobby: Lobby | None = None
+
+    def join(self, name: str) -> Player:
+        player = Player(name=name, emoji="🍎", token=name)
+        self.recorder.record("lobby", "join", player.uuid, name, "🍎")
+        if not self.lobby:
+            self.lobby = Lobby(owner=player, state=Gathering())
+            self.lobby.monitor = self.recorder.monitor("lobby")
+        self.lobby.add_player(player)
+        self.recorder.seed("lobby", "connect", player.uuid)
+        player.connect(LobbyObserver())
+        return player
+
+    def command(self, player: Player, type_: str, data: dict[str, Any]) -> None:
+        """Records a command, seeding `random` for the transition that follows"""
+        json_data = {"id": 1, "type": type_, "data": data}
+        self.recorder.seed("lobby", "command", player.uuid, json_data)
+
+    def start_game(self, player: Player) -> None:
+        self.command(player, "startGame", {"winningScore": 1})
+        setups = Deck(
+            cards=[
+                SetupCard(id=i, text="", case="nom", starts_with_punchline=False)
+                for i in range(5)
+            ]
+        )
+        punchlines = Deck(cards=[PunchlineCard(id=i, text=[]) for i in range(40)])
+        self.recorder.seed(
+            "lobby",
+            "decks",
+            [card.id for card in setups.cards],
+            [card.id for card in punchlines.cards],
+        )
+        player.start_game(LobbySettings(winning_score=1), setups, punchlines)
+
+
+async def play(recorded: RecordedLobby) -> Lobby:
+    owner = recorded.join("egor")
+    recorded.join("anton")
+    recorded.join("yura")
+    recorded.start_game(owner)
+    lobby = recorded.lobby
+    assert lobby and lobby.lead
+    for player in lobby.players:
+        card = player.hand[0]
+        recorded.command(player, "makeTurn", {"id": card.id})
+        player.make_turn(card)
+    lead = lobby.lead
+    for index, card_on_table in enumerate(list(lobby.table)):
+        recorded.command(lead, "openTableCard", {"index": index})
+        lead.open_table_card(card_on_table)
+    winner = lobby.table[0].card
+    recorded.command(lead, "pickTurnWinner", {"id": winner.id})
+    lead.pick_turn_winner(winner)
+    while not isinstance(lobby.state, Finished):
+        await asyncio.sleep(1)
+    return lobby
+
+
+def final_state(lobby: Lobby) -> dict[str, Any]:
+    return {
+        "state": type(lobby.state).__name__,
+        "turn_count": lobby.turn_count,
+        "players": {
+            player.uuid: (player.score, sorted(card.id for card in player.hand))
+            for player in lobby.all_players
+        },
+    }
+
+
+def test_replay_reaches_recorded_state(tmp_path: Path) -> None:
+    path = tmp_path / "games.log"
+    recorder = Recorder(str(path), flush_interval=1)
+    loop = VirtualTimeLoop()
+    try:
+        recorded = loop.run_until_complete(play(RecordedLobby(recorder)))
+    finally:
+        loop.close()
+    recorder.close()
+
+    entries = list(read_log(path, None))
+    loop = VirtualTimeLoop()
+    try:
+        replay = loop.run_until_complete(replay_engine(entries))
+    finally:
+        loop.close()
+
+    assert not replay.errors
+    assert not replay.divergences
+    replayed = replay.lobbies["lobby"].lobby
+    assert replayed
+    state = final_state(recorded)
+    assert state["state"] == "Finished"
+    assert sorted(score for score, _ in state["players"].values()) == [0, 0, 1]
+    assert final_state(replayed) == state
@@ -0,0 +1,71 @@
+from pathlib import Path
+
+import pytest
+
+from cardsagainst.deck import PunchlineCard, SetupCard
+from cardsagainst_backend.catalog import Catalog
+from cardsagainst_backend.snapshot import (
+    Snapshot,
+    SnapshotError,
+    write_snapshot,
+)
+
+
+@pytest.fixture
+def setups() -> list[SetupCard]:
+    return [
+        SetupCard(id=1, text="Что ____?", case="nom", starts_with_punchline=False),
+        SetupCard(id=7, text="____ всегда", case="acc", starts_with_punchline=True),
+    ]
+
+
+@pytest.fixture
+def punchlines() -> list[PunchlineCard]:
+    return [
+        PunchlineCard(id=3, text=[("пиво", ["nom", "acc"]), ("пива", ["gen"])]),
+        PunchlineCard(id=5, text=[("кот", ["nom", "acc"])]),
+        PunchlineCard(id=9, text=[]),
+    ]
+
+
+@pytest.fixture
+def snapshot_path(
+    tmp_path: Path, setups: list[SetupCard], punchlines: list[PunchlineCard]
+) -> Path:
+    path = tmp_path / "catalog.bin"
+    write_snapshot(
+        path, "2024-06", setups, punchlines, {"one": ([7], [3, 9]), "two": ([1], [])}
+    )
+    return path
+
+
+def test_snapshot_roundtrip(
+    snapshot_path: Path, setups: list[SetupCard], punchlines: list[PunchlineCard]
+) -> None:
+    snapshot = Snapshot(snapshot_path)
+    assert snapshot.version == "2024-06"
+    assert snapshot.setups == setups
+    assert snapshot.punchlines == punchlines
+    assert snapshot.decks == {"one": ([7], [3, 9]), "two": ([1], [])}
+
+
+def test_snapshot_shares_case_lists(snapshot_path: Path) -> None:
+    snapshot = Snapshot(snapshot_path)
+    first, second, _ = snapshot.punchlines
+    assert first.text[0][1] is second.text[0][1]
+
+
+async def test_snapshot_catalog(snapshot_path: Path) -> None:
+    catalog = await Catalog.load_snapshot(str(snapshot_path))
+    assert catalog.version == "2024-06"
+    setups, punchlines = catalog.deal(["one"])
+    assert [card.id for card in setups.cards] == [7]
+    assert sorted(punchlines.mapping) == [3, 9]
+
+
+@pytest.mark.parametrize("content", [b"", b"CACS", b"not a snapshot at all"])
+def test_invalid_snapshot(tmp_path: Path, content: bytes) -> None:
+    path = tmp_path / "catalog.bin"
+    path.write_bytes(content)
+    with pytest.raises(SnapshotError):
+        Snapshot(path)
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from cardsagainst.lobby import (
+    Deck,
+    Judgement,
+    Lobby,
+    LobbyMonitor,
+    LobbyMonitors,
+    LobbySettings,
+    Player,
+    PunchlineCard,
+    SetupCard,
+    State,
+)
+from cardsagainst_backend.logs import command_var
+from cardsagainst_backend.tracing import TimerContext, Trace, current_trace, tracer
+from simulation.loop import VirtualTimeLoop
+
+
+class FrameProbe(LobbyMonitor):
+    """Queues a frame on every transition, the way a connected player does"""
+
+    def __init__(self) -> None:
+        self.transitions: list[tuple[type[State], bool, str | None]] = []
+
+    def state_changed(self, old_state: State, new_state: State) -> None:
+        trace = current_trace.get()
+        self.transitions.append((type(new_state), trace is not None, command_var.get()))
+        if trace and trace.hold():
+            trace.release()
+
+
+@pytest.fixture
+def sampled(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(tracer, "sample_rate", 1)
+    monkeypatch.setattr(tracer, "ring", tracer.ring.__class__(maxlen=10))
+
+
+def test_timer_leaves_command_trace(
+    sampled: None,
+    lobby: Lobby,
+    egor: Player,
+    egor_connected: None,
+    anton_connected: None,
+    setup_deck: Deck[SetupCard],
+    punchline_deck: Deck[PunchlineCard],
+    lobby_settings: LobbySettings,
+) -> None:
+    probe = FrameProbe()
+    lobby.monitor = LobbyMonitors(TimerContext(), probe)
+    lobby_settings.turn_duration = 1
+
+    async def start_game() -> Trace | None:
+        with tracer.trace("startGame") as trace:
+            egor.start_game(lobby_settings, setup_deck, punchline_deck)
+        await asyncio.sleep(2)
+        return trace
+
+    # The turn timer fires without waiting for a real second
+    loop = VirtualTimeLoop()
+    try:
+        trace = loop.run_until_complete(start_game())
+    finally:
+        loop.close()
+
+    assert trace
+    assert [data["trace_id"] for data in tracer.ring] == [trace.id]
+    assert (Judgement, False, "timer end_turn") in probe.transitions
+
+
+def test_hold_after_export(sampled: None) -> None:
+    with tracer.trace("startGame") as trace:
+        assert trace and trace.hold()
+    trace.release()
+    assert not trace.hold()
+    assert len(tracer.ring) == 1
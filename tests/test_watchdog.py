@@ -0,0 +1,38 @@
+import asyncio
+import time
+
+from cardsagainst_backend.logs import command_var, lobby_token_var
+from cardsagainst_backend.watchdog import SlowCallbackWatchdog
+
+
+def handle_command() -> None:
+    # A synchronous handler that holds the loop
+    time.sleep(0.2)
+
+
+async def blocking_command() -> None:
+    lobby_token_var.set("lobby")
+    token = command_var.set("startGame")
+    try:
+        handle_command()
+    finally:
+        command_var.reset(token)
+
+
+async def test_records_blocking_command() -> None:
+    watchdog = SlowCallbackWatchdog(threshold=0.05, top_size=5)
+    watchdog.install()
+    try:
+        await asyncio.create_task(blocking_command())
+    finally:
+        watchdog.uninstall()
+
+    [slow_callback] = [
+        slow_callback
+        for slow_callback in watchdog.worst
+        if "blocking_command" in slow_callback.callback
+    ]
+    assert slow_callback.command == "startGame"
+    assert slow_callback.lobby_token == "lobby"
+    assert slow_callback.duration >= 0.2
+    assert slow_callback.stack and "handle_command" in slow_callback.stack